@@ -0,0 +1,170 @@
+import glob
+import os
+import re
+import sqlite3
+import time
+from datetime import date
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+# Meses cerrados que se conservan en la base principal antes de pasar al archivo
+ARCHIVE_AFTER_MONTHS = 6
+# Ventas por transacción al archivar (el bloqueo de escritura se suelta entre lotes)
+ARCHIVE_BATCH = 2000
+# Pausa entre lotes para que las cajas tomen el bloqueo de escritura
+ARCHIVE_PAUSE = 0.01
+
+# Nombre del archivo de un mes: ventas-AAAA-MM.db
+_MONTH_FILE = re.compile(r"ventas-(\d{4}-\d{2})\.db$")
+
+# Columnas copiadas; las tablas del archivo tienen el mismo esquema para poder hacer ATTACH y unir
+SALE_COLUMNS = ("id", "fecha", "total", "ref")
+LINE_COLUMNS = ("id", "venta_id", "producto_id", "cantidad", "precio_unitario", "subtotal", "costo")
+
+# Ventas que alguna tienda vecina todavía no recibió: la exportación solo lee la base principal,
+# así que se archivan recién cuando ya salieron hacia todas (sin vecinas no se retiene ninguna)
+_UNSENT = """SELECT fila_id FROM main.replica_cambios WHERE tabla = 'ventas'
+             AND seq > (SELECT MIN(enviado) FROM main.replica_pares)"""
+
+
+class ArchivedMonth(NamedTuple):
+    """Resultado de archivar un mes"""
+    mes: str  # AAAA-MM
+    ventas: int
+    lineas: int
+
+
+def archive_dir(db_name: str) -> str:
+    """Carpeta de archivos mensuales junto a la base"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), "archivo")
+
+
+def month_bounds(mes: str) -> Sequence[str]:
+    """Primer día del mes y del mes siguiente ('2024-01' -> ('2024-01-01', '2024-02-01'))"""
+    year, month = (int(part) for part in mes.split("-"))
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, 1).isoformat(), following.isoformat()
+
+
+def cutoff_month(today: Optional[date] = None, keep: int = ARCHIVE_AFTER_MONTHS) -> str:
+    """Primer mes que se conserva en la base principal (los anteriores se archivan)"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - keep
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class SalesArchive:
+    """Historial de ventas cerradas en un archivo SQLite por mes, con las mismas tablas que la base"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, mes: str) -> str:
+        return os.path.join(self.directory, f"ventas-{mes}.db")
+
+    def months(self) -> List[str]:
+        """Meses archivados (AAAA-MM), en orden"""
+        found = (_MONTH_FILE.search(path) for path in glob.glob(os.path.join(self.directory, "ventas-*.db")))
+        return sorted(match.group(1) for match in found if match)
+
+    @staticmethod
+    def attach(conn: sqlite3.Connection, path: str, schema: str = "archivo") -> None:
+        """Adjunta un archivo mensual a la conexión y crea sus tablas si es nuevo"""
+        conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {schema}.ventas
+                     (id INTEGER PRIMARY KEY,
+                     fecha TEXT NOT NULL,
+                     total INTEGER NOT NULL,
+                     ref TEXT)''')
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {schema}.venta_lineas
+                     (id INTEGER PRIMARY KEY,
+                     venta_id INTEGER NOT NULL,
+                     producto_id INTEGER NOT NULL,
+                     cantidad INTEGER NOT NULL,
+                     precio_unitario INTEGER NOT NULL,
+                     subtotal INTEGER NOT NULL,
+                     costo INTEGER NOT NULL DEFAULT 0)''')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_venta_lineas_venta ON venta_lineas(venta_id)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_ventas_fecha ON ventas(fecha)")
+
+    def pending_months(self, conn: sqlite3.Connection, cutoff: str) -> List[str]:
+        """Meses anteriores a `cutoff` que todavía tienen ventas en la base principal"""
+        cursor = conn.execute("SELECT DISTINCT substr(fecha, 1, 7) FROM ventas WHERE fecha < ? ORDER BY 1",
+                              (month_bounds(cutoff)[0],))
+        return [row[0] for row in cursor.fetchall()]
+
+    def archive_month(self, conn: sqlite3.Connection, mes: str, batch: int = ARCHIVE_BATCH,
+                      pause: float = ARCHIVE_PAUSE) -> ArchivedMonth:
+        """Pasa las ventas de un mes cerrado al archivo, por lotes.
+
+        Cada lote se copia primero (INSERT OR IGNORE, confirmado en el archivo) y después se borra
+        de la base principal en su propia transacción: un corte entre ambos pasos se repara solo
+        en el siguiente intento. Los resúmenes diarios y por producto no cambian. Las ventas que
+        falta exportar a alguna tienda vecina quedan en la base hasta un intento posterior.
+        """
+        desde, hasta = month_bounds(mes)
+        os.makedirs(self.directory, exist_ok=True)
+        sales = lines = 0
+        sale_columns, line_columns = ", ".join(SALE_COLUMNS), ", ".join(LINE_COLUMNS)
+        self.attach(conn, self.path(mes))
+        try:
+            while True:
+                ids = [row[0] for row in conn.execute(
+                    f"""SELECT id FROM main.ventas WHERE fecha >= ? AND fecha < ? AND id NOT IN ({_UNSENT})
+                    ORDER BY id LIMIT ?""", (desde, hasta, batch))]
+                if not ids:
+                    break
+                first, last = ids[0], ids[-1]
+                conn.execute("BEGIN")
+                try:
+                    conn.execute(f'''INSERT OR IGNORE INTO archivo.ventas ({sale_columns})
+                                 SELECT {sale_columns} FROM main.ventas
+                                 WHERE id BETWEEN ? AND ? AND fecha >= ? AND fecha < ?
+                                 AND id NOT IN ({_UNSENT})''', (first, last, desde, hasta))
+                    conn.execute(f'''INSERT OR IGNORE INTO archivo.venta_lineas ({line_columns})
+                                 SELECT {", ".join("l." + c for c in LINE_COLUMNS)}
+                                 FROM main.venta_lineas l JOIN archivo.ventas v ON v.id = l.venta_id
+                                 WHERE v.id BETWEEN ? AND ?''', (first, last))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = conn.execute('''DELETE FROM main.venta_lineas WHERE venta_id IN
+                                          (SELECT id FROM archivo.ventas WHERE id BETWEEN ? AND ?)''', (first, last))
+                    lines += cursor.rowcount
+                    cursor = conn.execute('''DELETE FROM main.ventas WHERE id IN
+                                          (SELECT id FROM archivo.ventas WHERE id BETWEEN ? AND ?)''', (first, last))
+                    sales += cursor.rowcount
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                time.sleep(pause)
+        finally:
+            conn.execute("DETACH DATABASE archivo")
+        return ArchivedMonth(mes, sales, lines)
+
+    def iter_sale_lines(self, desde: str, hasta: str, referencia: str) -> Iterator[tuple]:
+        """Líneas archivadas entre dos días (inclusive), con las columnas del reporte de ventas.
+
+        (id de línea, producto_id, cantidad, subtotal, costo, día relativo a `referencia`)
+        """
+        conn = sqlite3.connect(":memory:", isolation_level=None)
+        try:
+            for mes in self.months():
+                inicio, fin = month_bounds(mes)
+                if fin <= desde or inicio > hasta:
+                    continue
+                self.attach(conn, self.path(mes))
+                try:
+                    yield from conn.execute(
+                        """SELECT l.id, l.producto_id, l.cantidad, l.subtotal, l.costo,
+                                  julianday(substr(v.fecha, 1, 10)) - julianday(?)
+                           FROM archivo.ventas v JOIN archivo.venta_lineas l ON l.venta_id = v.id
+                           WHERE v.fecha >= ? AND v.fecha < date(?, '+1 day')""",
+                        (referencia, desde, hasta))
+                finally:
+                    conn.execute("DETACH DATABASE archivo")
+        finally:
+            conn.close()
@@ -0,0 +1,124 @@
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from money import Cents
+
+# (producto_id, código de barras, nombre, precio en centavos)
+BarcodeEntry = Tuple[int, str, str, Cents]
+
+# Separación máxima entre teclas de una misma ráfaga del lector (ms)
+BURST_GAP_MS = 50
+# Una entrada sin Enter más vieja que esto se descarta (tecleo interrumpido)
+STALE_INPUT_MS = 2000
+# Ventana en la que los escaneos se agrupan en una sola actualización del carrito (ms)
+COALESCE_MS = 60
+
+
+class BarcodeIndex:
+    """Tabla en memoria código de barras -> (producto_id, nombre, precio)"""
+
+    def __init__(self):
+        self._by_code: Dict[str, Tuple[int, str, Cents]] = {}
+        self._by_product: Dict[int, str] = {}
+
+    def load(self, entries: Iterable[BarcodeEntry]) -> None:
+        """Reemplaza el índice completo"""
+        self._by_code.clear()
+        self._by_product.clear()
+        self.update((), entries)
+
+    def update(self, product_ids: Iterable[int], entries: Iterable[BarcodeEntry]) -> None:
+        """Aplica cambios: quita los códigos de los productos modificados y agrega sus entradas vigentes"""
+        for product_id in product_ids:
+            code = self._by_product.pop(product_id, None)
+            if code is not None and self._by_code.get(code, (None,))[0] == product_id:
+                del self._by_code[code]
+        for product_id, code, nombre, precio in entries:
+            previous = self._by_product.pop(product_id, None)
+            if previous is not None and previous != code:
+                self._by_code.pop(previous, None)
+            owner = self._by_code.get(code)
+            if owner is not None and owner[0] != product_id:
+                self._by_product.pop(owner[0], None)
+            self._by_code[code] = (product_id, nombre, precio)
+            self._by_product[product_id] = code
+
+    def lookup(self, code: str) -> Optional[Tuple[int, str, Cents]]:
+        return self._by_code.get(code)
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+
+class ScannerInput:
+    """Arma códigos a partir de teclas sueltas y distingue ráfagas del lector del tecleo manual"""
+
+    def __init__(self, min_length: int = 3):
+        self.min_length = min_length
+        self._chars: List[str] = []
+        self._last_ms: Optional[int] = None
+        self._gaps: List[int] = []
+
+    def feed(self, char: str, time_ms: int) -> bool:
+        """Agrega una tecla; devuelve True si llegó dentro de una ráfaga del lector"""
+        if self._last_ms is not None and time_ms - self._last_ms > STALE_INPUT_MS:
+            self.reset()
+        gap = None if self._last_ms is None else time_ms - self._last_ms
+        if gap is not None:
+            self._gaps.append(gap)
+        self._chars.append(char)
+        self._last_ms = time_ms
+        return gap is not None and gap <= BURST_GAP_MS
+
+    def backspace(self) -> None:
+        if self._chars:
+            self._chars.pop()
+
+    def finish(self) -> Tuple[Optional[str], bool]:
+        """Al recibir Enter: devuelve (código o None si es muy corto, si llegó como ráfaga del lector)"""
+        code = "".join(self._chars).strip()
+        burst = bool(self._gaps) and max(self._gaps) <= BURST_GAP_MS
+        self.reset()
+        return (code if len(code) >= self.min_length else None), burst
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chars)
+
+    def reset(self) -> None:
+        self._chars = []
+        self._gaps = []
+        self._last_ms = None
+
+
+class ScanBatcher:
+    """Agrupa los escaneos que llegan dentro de COALESCE_MS y los entrega juntos como {código: veces}"""
+
+    def __init__(self, root, on_flush: Callable[[Counter], None], window_ms: int = COALESCE_MS):
+        self.root = root
+        self.on_flush = on_flush
+        self.window_ms = window_ms
+        self._pending: Counter = Counter()
+        self._scheduled = False
+        self.scans = 0
+        self.flushes = 0
+
+    def add(self, code: str) -> None:
+        self._pending[code] += 1
+        self.scans += 1
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after(self.window_ms, self.flush)
+
+    def flush(self) -> None:
+        self._scheduled = False
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, Counter()
+        self.flushes += 1
+        self.on_flush(pending)
+
+
+def event_time_ms(event) -> int:
+    """Marca de tiempo del evento de teclado (o del reloj si el sistema no la informa)"""
+    return getattr(event, "time", 0) or int(time.monotonic() * 1000)
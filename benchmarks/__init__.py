@@ -0,0 +1,6 @@
+"""Benchmarks y generador de carga para las rutas críticas de DatabaseManager.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks micro --skus 1000 100000 --salida micro.json
+    python -m benchmarks carga --skus 100000 --cajas 8 --ventas 200 --salida carga.json
+"""
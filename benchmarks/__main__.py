@@ -0,0 +1,60 @@
+import argparse
+import json
+import sys
+from benchmarks.load import run_load
+from benchmarks.micro import run_micro
+from benchmarks.money import run_money
+from benchmarks.stats import environment
+
+
+def main(argv=None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--salida", help="Archivo JSON de resultados (por defecto, salida estándar)")
+    common.add_argument("--dir", help="Directorio para las bases temporales")
+    common.add_argument("--semilla", type=int, default=0)
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmarks de DatabaseManager con salida JSON")
+    sub = parser.add_subparsers(dest="escenario", required=True)
+
+    micro = sub.add_parser("micro", parents=[common], help="Microbenchmarks por método")
+    micro.add_argument("--skus", type=int, nargs="+", default=[1000, 100000, 1000000])
+    micro.add_argument("--carritos", type=int, nargs="+", default=[1, 10, 100, 500],
+                       help="Líneas por carrito para process_sale y get_current_sales")
+    micro.add_argument("--iter", type=int, default=200, help="Repeticiones por medición")
+
+    load = sub.add_parser("carga", parents=[common], help="Varias cajas cobrando a la vez en procesos separados")
+    load.add_argument("--skus", type=int, default=100000)
+    load.add_argument("--cajas", type=int, nargs="+", default=[1, 2, 4, 8])
+    load.add_argument("--ventas", type=int, default=200, help="Ventas por caja")
+    load.add_argument("--lineas", type=int, nargs=2, default=[1, 20], metavar=("MIN", "MAX"))
+    money = sub.add_parser("dinero", parents=[common],
+                           help="Agregaciones e IVA con importes REAL frente a centavos enteros")
+    money.add_argument("--filas", type=int, nargs="+", default=[100000, 1000000])
+    money.add_argument("--iter", type=int, default=20, help="Repeticiones por medición")
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.escenario == "micro":
+        for skus in args.skus:
+            print(f"micro: {skus} SKUs...", file=sys.stderr)
+            results.extend(run_micro(skus, args.carritos, args.iter, args.semilla, args.dir))
+    elif args.escenario == "dinero":
+        for rows in args.filas:
+            print(f"dinero: {rows} filas...", file=sys.stderr)
+            results.extend(run_money(rows, args.iter, args.semilla, args.dir))
+    else:
+        for registers in args.cajas:
+            print(f"carga: {registers} cajas...", file=sys.stderr)
+            results.append(run_load(args.skus, registers, args.ventas, tuple(args.lineas), args.semilla, args.dir))
+
+    report = json.dumps({"entorno": environment(), "escenario": args.escenario, "resultados": results}, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
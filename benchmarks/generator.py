@@ -0,0 +1,48 @@
+import random
+from typing import Iterator, List, Sequence, Tuple
+from database import DatabaseManager
+from money import Cents, to_cents
+
+WORDS = (
+    "arroz", "leche", "cafe", "azucar", "harina", "aceite", "jabon", "galletas", "jugo", "atun",
+    "pasta", "queso", "pan", "huevos", "sal", "te", "cereal", "yogur", "mantequilla", "salsa",
+)
+SIZES = ("250g", "500g", "1kg", "2kg", "1L", "2L", "x6", "x12")
+
+# Stock inicial alto para que las ventas de los benchmarks nunca se queden sin existencias
+INITIAL_STOCK = 1_000_000
+
+
+def product_name(index: int, rng: random.Random) -> str:
+    """Nombre único y realista para la búsqueda: 'cafe leche 500g #000123'"""
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(SIZES)} #{index:07d}"
+
+
+def generate_catalog(skus: int, seed: int = 0) -> Iterator[Tuple[str, int, Cents, float]]:
+    """Genera filas (nombre, cantidad, precio en centavos, margen) reproducibles"""
+    rng = random.Random(seed)
+    for index in range(skus):
+        # Mismos valores aleatorios que con precios float: los catálogos siguen siendo comparables
+        nombre = product_name(index, rng)
+        precio = to_cents(round(rng.uniform(0.5, 500.0), 2))
+        yield nombre, INITIAL_STOCK, precio, round(rng.uniform(5, 60), 1)
+
+
+def generate_cart(product_ids: Sequence[int], lines: int, rng: random.Random,
+                  max_quantity: int = 5) -> List[Tuple[int, int]]:
+    """Carrito de `lines` productos distintos con cantidades de 1 a max_quantity"""
+    return [(product_id, rng.randint(1, max_quantity))
+            for product_id in rng.sample(product_ids, min(lines, len(product_ids)))]
+
+
+def populate(db: DatabaseManager, skus: int, seed: int = 0, batch_size: int = 10000) -> List[int]:
+    """Carga un catálogo sintético por lotes y devuelve los IDs de producto"""
+    batch = []
+    for row in generate_catalog(skus, seed):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.bulk_upsert_products(batch)
+            batch = []
+    if batch:
+        db.bulk_upsert_products(batch)
+    return [row[0] for row in db.query("SELECT id FROM productos ORDER BY id")]
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+from checkout import InsufficientStockError
+from database import DatabaseManager
+from benchmarks.generator import generate_cart, populate
+from benchmarks.stats import summarize
+
+# Espera por el bloqueo de escritura a partir de la cual se cuenta como contención (segundos)
+LOCK_WAIT_THRESHOLD = 0.001
+
+
+def _register(db_path: str, ids: Sequence[int], sales: int, lines: Tuple[int, int], seed: int,
+              start, results) -> None:
+    """Una caja: arma carritos y cobra `sales` veces contra el archivo compartido"""
+    rng = random.Random(seed)
+    db = DatabaseManager(db_path)
+    latencies: List[float] = []
+    lock_waits: List[float] = []
+    errors = {"busy": 0, "sin_stock": 0}
+    start.wait()
+    began = time.perf_counter()
+    for _ in range(sales):
+        cart = generate_cart(ids, rng.randint(*lines), rng)
+        t0 = time.perf_counter()
+        try:
+            # ventas_actuales es compartida entre cajas: carrito y cobro en la misma transacción
+            with db.transaction():
+                waited = time.perf_counter() - t0
+                for product_id, cantidad in cart:
+                    db.add_to_current_sales(product_id, cantidad)
+                db.process_sale()
+        except sqlite3.OperationalError:
+            errors["busy"] += 1
+            continue
+        except InsufficientStockError:
+            errors["sin_stock"] += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+        if waited >= LOCK_WAIT_THRESHOLD:
+            lock_waits.append(waited)
+    results.put((latencies, lock_waits, errors, time.perf_counter() - began))
+    db.close()
+
+
+def run_load(skus: int, registers: int, sales: int, lines: Tuple[int, int], seed: int = 0,
+             directory: str = None) -> Dict[str, Any]:
+    """Simula `registers` cajas en procesos separados cobrando a la vez sobre un mismo archivo"""
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        db_path = os.path.join(tmp, "load.db")
+        db = DatabaseManager(db_path)
+        ids = populate(db, skus, seed)
+        db.close()
+
+        context = multiprocessing.get_context("spawn")
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=_register, args=(db_path, ids, sales, lines, seed + n + 1, start, results))
+            for n in range(registers)
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(0.5)  # que todas las cajas abran su conexión antes de largar
+        began = time.perf_counter()
+        start.set()
+        collected = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - began
+        for process in processes:
+            process.join()
+
+    latencies = [value for result in collected for value in result[0]]
+    lock_waits = sorted(value for result in collected for value in result[1])
+    return {
+        "escenario": "carga",
+        "skus": skus,
+        "cajas": registers,
+        "ventas_por_caja": sales,
+        "lineas": list(lines),
+        "process_sale": summarize(latencies, elapsed),
+        "esperas_bloqueo": {
+            "n": len(lock_waits),
+            "umbral_ms": LOCK_WAIT_THRESHOLD * 1000,
+            "total_ms": round(sum(lock_waits) * 1000, 3),
+            "max_ms": round(lock_waits[-1] * 1000, 3) if lock_waits else 0.0,
+        },
+        "errores": {key: sum(result[2][key] for result in collected) for key in ("busy", "sin_stock")},
+    }
@@ -0,0 +1,71 @@
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Sequence
+from database import DatabaseManager
+from benchmarks.generator import generate_cart, populate, product_name
+from benchmarks.stats import summarize
+
+
+def _measure(operation: Callable[[], Any], iterations: int, setup: Callable[[], Any] = None) -> Dict[str, float]:
+    """Mide `operation` iterations veces; `setup` corre antes de cada una fuera del tiempo medido"""
+    latencies: List[float] = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, sum(latencies))
+
+
+def _fill_cart(db: DatabaseManager, cart) -> None:
+    with db.transaction():
+        db.clear_current_sales()
+        for product_id, cantidad in cart:
+            db.add_to_current_sales(product_id, cantidad)
+
+
+def run_micro(skus: int, cart_sizes: Sequence[int], iterations: int, seed: int = 0,
+              directory: str = None) -> List[Dict[str, Any]]:
+    """Microbenchmarks de los métodos críticos sobre un catálogo de `skus` productos"""
+    rng = random.Random(seed)
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        ids = populate(db, skus, seed)
+        results.append({"metodo": "bulk_upsert_products", "skus": skus,
+                        "segundos": round(time.perf_counter() - start, 3)})
+
+        def record(metodo: str, stats: Dict[str, float], **extra) -> None:
+            results.append({"metodo": metodo, "skus": skus, **extra, **stats})
+
+        existing = iter([row[1] for row in db.get_products_by_ids(rng.sample(ids, min(iterations, len(ids))))])
+        new_names = iter(range(skus, skus + iterations))
+        record("add_or_update_product",
+               _measure(lambda: db.add_or_update_product(next(existing), 1, 1000, 20.0), min(iterations, len(ids))),
+               caso="existente")
+        record("add_or_update_product",
+               _measure(lambda: db.add_or_update_product(product_name(next(new_names), rng), 10, 1000, 20.0),
+                        iterations),
+               caso="nuevo")
+
+        db.clear_current_sales()
+        record("add_to_current_sales",
+               _measure(lambda: db.add_to_current_sales(rng.choice(ids), 1), iterations))
+
+        for lines in cart_sizes:
+            rounds = max(3, iterations // max(1, lines // 10))
+            record("process_sale", _measure(db.process_sale, rounds,
+                                            setup=lambda: _fill_cart(db, generate_cart(ids, lines, rng))),
+                   lineas=lines)
+            _fill_cart(db, generate_cart(ids, lines, rng))
+            record("get_current_sales", _measure(db.get_current_sales, iterations), lineas=lines)
+        db.clear_current_sales()
+
+        # Lectura completa del catálogo: pocas repeticiones en catálogos grandes
+        record("get_all_products", _measure(db.get_all_products, max(3, min(iterations, 1_000_000 // skus))))
+        db.close()
+    return results
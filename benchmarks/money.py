@@ -0,0 +1,89 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Any, Callable, Dict, List, Sequence
+from money import Money
+from benchmarks.stats import summarize
+
+# Días distintos en las tablas de prueba (agrupación tipo resumen diario)
+DAYS = 365
+
+# Money es más lento que Decimal por operación (~2.6x en IVA por línea), pero el cobro calcula
+# el IVA una vez sobre el total de la venta y el recibo una vez por venta: lo que importa es
+# que un carrito grande quede muy por debajo del commit de SQLite (milisegundos) que ya paga
+CART_LINES = 200
+CHECKOUT_IVA_BUDGET_MS = 1.0  # para el IVA de CART_LINES líneas
+
+
+def _measure(operation: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, sum(latencies))
+
+
+def _fill(conn: sqlite3.Connection, rows: int, rng: random.Random) -> List[int]:
+    """Crea las mismas líneas de venta con importes REAL (antes) e INTEGER en centavos (ahora)"""
+    cents = [rng.randint(1, 500_000) for _ in range(rows)]
+    days = [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}" for i in range(DAYS)]
+    conn.execute("CREATE TABLE lineas_real (dia TEXT NOT NULL, subtotal REAL NOT NULL)")
+    conn.execute("CREATE TABLE lineas_centavos (dia TEXT NOT NULL, subtotal INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO lineas_real VALUES (?, ?)",
+                     ((days[i % DAYS], c / 100) for i, c in enumerate(cents)))
+    conn.executemany("INSERT INTO lineas_centavos VALUES (?, ?)",
+                     ((days[i % DAYS], c) for i, c in enumerate(cents)))
+    conn.commit()
+    return cents
+
+
+def run_money(rows: int, iterations: int, seed: int = 0, directory: str = None) -> List[Dict[str, Any]]:
+    """Compara agregaciones e IVA con importes float (REAL) y en centavos enteros"""
+    rng = random.Random(seed)
+    results: List[Dict[str, Any]] = []
+
+    def record(operacion: str, formato: str, stats: Dict[str, float], **extra) -> None:
+        results.append({"operacion": operacion, "formato": formato, "filas": rows, **extra, **stats})
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "dinero.db"))
+        cents = _fill(conn, rows, rng)
+        exact = sum(cents)
+
+        for formato, table in (("real", "lineas_real"), ("centavos", "lineas_centavos")):
+            total = conn.execute(f"SELECT SUM(subtotal) FROM {table}").fetchone()[0]
+            # Deriva acumulada respecto del total exacto, en centavos
+            drift = abs(total * 100 - exact) if formato == "real" else abs(total - exact)
+            record("SUM", formato, _measure(lambda: conn.execute(f"SELECT SUM(subtotal) FROM {table}").fetchone(),
+                                             iterations), deriva_centavos=drift)
+            record("GROUP BY dia", formato,
+                   _measure(lambda: conn.execute(f"SELECT dia, SUM(subtotal) FROM {table} GROUP BY dia").fetchall(),
+                            iterations))
+        conn.close()
+
+    # IVA por línea en Python: float, Money (redondeo bancario exacto) y Decimal
+    sample: Sequence[int] = cents[:min(rows, 100_000)]
+    floats = [c / 100 for c in sample]
+    moneys = [Money(c) for c in sample]
+    decimals = [Decimal(c) / 100 for c in sample]
+    rate, decimal_rate, cent = 0.19, Decimal("0.19"), Decimal("0.01")
+    rounds = max(3, iterations // 10)
+    record("IVA por línea", "float", _measure(lambda: [round(v * rate, 2) for v in floats], rounds),
+           lineas=len(sample))
+    record("IVA por línea", "centavos", _measure(lambda: [m.percent(rate) for m in moneys], rounds),
+           lineas=len(sample))
+    record("IVA por línea", "decimal",
+           _measure(lambda: [(v * decimal_rate).quantize(cent, ROUND_HALF_EVEN) for v in decimals], rounds),
+           lineas=len(sample))
+    cart = moneys[:CART_LINES]
+    stats = _measure(lambda: [m.percent(rate) for m in cart], max(iterations, 100))
+    record("IVA por carrito", "centavos", stats, lineas=len(cart), presupuesto_ms=CHECKOUT_IVA_BUDGET_MS,
+           dentro_presupuesto=stats["p99_ms"] <= CHECKOUT_IVA_BUDGET_MS)
+    record("suma en Python", "float", _measure(lambda: sum(floats), rounds), lineas=len(sample))
+    record("suma en Python", "centavos", _measure(lambda: sum(sample), rounds), lineas=len(sample))
+    record("suma en Python", "decimal", _measure(lambda: sum(decimals), rounds), lineas=len(sample))
+    return results
@@ -0,0 +1,44 @@
+import math
+import platform
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, Sequence
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Percentil por rango más cercano sobre valores ya ordenados"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(latencies: Sequence[float], elapsed: float) -> Dict[str, float]:
+    """Resumen de latencias (segundos) en milisegundos y operaciones por segundo"""
+    values = sorted(latencies)
+    return {
+        "n": len(values),
+        "throughput_per_s": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 4),
+        "mean_ms": round(sum(values) / len(values) * 1000, 4) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 4) if values else 0.0,
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Datos de la corrida para poder comparar resultados en el tiempo"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+    }
@@ -0,0 +1,292 @@
+import json
+import sqlite3
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import costing
+import ledger
+from money import Money
+
+# Operaciones masivas sobre un conjunto filtrado de productos
+PRICE_PERCENT = "precio_porcentaje"  # valor: variación en % (10 sube un 10%, -5 rebaja un 5%)
+PRICE_AMOUNT = "precio_importe"  # valor: centavos que se suman (o restan) al precio
+MARGIN = "margen"  # valor: margen nuevo en %; el precio se recalcula desde el costo
+STOCK = "stock"  # valor: unidades que entran (o salen) de cada producto
+OPERATIONS = (PRICE_PERCENT, PRICE_AMOUNT, MARGIN, STOCK)
+
+# Filas de ejemplo que devuelve la vista previa
+PREVIEW_ROWS = 200
+# Operaciones que se conservan para deshacer
+HISTORY = 50
+
+# Costo vigente por unidad: promedio del stock o, sin stock valuado, el derivado del precio y el margen
+_CURRENT_COST = """CASE WHEN p.cantidad > 0 AND p.valor_stock > 0 THEN (p.valor_stock + p.cantidad / 2) / p.cantidad
+                        ELSE costo_unitario(p.precio, p.margen_ganancia) END"""
+
+# Valores nuevos (precio, margen, cantidad) de cada operación sobre la fila p
+_EXPRESSIONS: Dict[str, Tuple[str, str, str]] = {
+    PRICE_PERCENT: ("con_margen(p.precio, :valor)", "p.margen_ganancia", "p.cantidad"),
+    PRICE_AMOUNT: ("p.precio + :valor", "p.margen_ganancia", "p.cantidad"),
+    MARGIN: (f"con_margen({_CURRENT_COST}, :valor)", "CAST(:valor AS REAL)", "p.cantidad"),
+    # Las salidas no dejan negativo el stock (uno ya negativo no baja más)
+    STOCK: ("p.precio", "p.margen_ganancia", "MAX(p.cantidad + :valor, MIN(p.cantidad, 0))"),
+}
+
+_LABELS = {
+    PRICE_PERCENT: "Precio {valor:+g}%",
+    PRICE_AMOUNT: "Precio {importe}",
+    MARGIN: "Margen {valor:g}%",
+    STOCK: "Stock {valor:+d}",
+}
+
+
+class ProductFilter(NamedTuple):
+    """Productos alcanzados: todos los criterios indicados deben cumplirse (ninguno: todos)"""
+    nombre: Optional[str] = None  # subcadena o patrón con * (sin distinguir mayúsculas; _ vale por un carácter)
+    ids: Optional[Sequence[int]] = None
+    stock_min: Optional[int] = None
+    stock_max: Optional[int] = None
+
+
+class BulkChange(NamedTuple):
+    """Valores de un producto antes y después de la operación"""
+    producto_id: int
+    nombre: str
+    precio_antes: int
+    precio_despues: int
+    margen_antes: float
+    margen_despues: float
+    cantidad_antes: int
+    cantidad_despues: int
+
+
+class BulkPreview(NamedTuple):
+    """Resultado de la vista previa (no modifica nada)"""
+    productos: int  # productos que cambian
+    invalidos: int  # productos que quedarían con precio <= 0
+    filas: List[BulkChange]  # las primeras PREVIEW_ROWS
+
+
+class BulkResult(NamedTuple):
+    """Resultado de aplicar o deshacer una operación"""
+    operacion_id: int
+    productos: int
+    omitidos: int  # al deshacer: productos que cambiaron después y se dejan como están
+
+
+class BulkOperation(NamedTuple):
+    """Operación registrada en el historial"""
+    id: int
+    fecha: str
+    tipo: str
+    valor: float
+    descripcion: str
+    productos: int
+    deshecha: Optional[str]  # fecha en que se deshizo
+
+
+def _register_functions(conn: sqlite3.Connection) -> None:
+    # Mismo redondeo (bancario) que la edición de un producto
+    conn.create_function("costo_unitario", 2, costing.unit_cost, deterministic=True)
+    conn.create_function("con_margen", 2, costing.sale_price, deterministic=True)
+
+
+def _like_pattern(nombre: str) -> str:
+    """Patrón LIKE de una subcadena o de un patrón con * (o %) como comodín"""
+    # Sin ESCAPE: con él, LIKE deja de usar el índice trigram y recorre toda la tabla
+    if "*" in nombre or "%" in nombre:
+        return nombre.replace("*", "%")
+    return f"%{nombre}%"
+
+
+def _where(filtro: Sequence) -> Tuple[str, Dict[str, Any]]:
+    """Condición sobre productos p y sus parámetros; cada criterio usa su índice"""
+    filtro = ProductFilter(*filtro)  # también llega como lista desde pos_server
+    conditions, params = [], {}
+    if filtro.nombre:
+        # El índice trigram resuelve LIKE sin recorrer productos
+        conditions.append("p.id IN (SELECT rowid FROM productos_fts WHERE nombre LIKE :patron)")
+        params["patron"] = _like_pattern(filtro.nombre)
+    if filtro.ids is not None:
+        conditions.append("p.id IN (SELECT value FROM json_each(:ids))")
+        params["ids"] = json.dumps(list(filtro.ids))
+    if filtro.stock_min is not None:
+        conditions.append("p.cantidad >= :stock_min")
+        params["stock_min"] = filtro.stock_min
+    if filtro.stock_max is not None:
+        conditions.append("p.cantidad <= :stock_max")
+        params["stock_max"] = filtro.stock_max
+    return " AND ".join(conditions) or "1", params
+
+
+def _validate(tipo: str, valor: float) -> None:
+    if tipo not in OPERATIONS:
+        raise ValueError(f"Operación desconocida: {tipo}")
+    if tipo in (PRICE_AMOUNT, STOCK) and not isinstance(valor, int):
+        raise ValueError("El valor debe ser un número entero (centavos o unidades)")
+    if tipo == PRICE_PERCENT and valor <= -100:
+        raise ValueError("La rebaja no puede ser del 100% o más")
+    if tipo == MARGIN and valor <= 0:
+        raise ValueError("El margen debe ser positivo")
+    if not valor and tipo != MARGIN:
+        raise ValueError("El valor no puede ser cero")
+
+
+def _changes(tipo: str, valor: float, filtro: Sequence) -> Tuple[str, Dict[str, Any]]:
+    """SELECT (producto_id, nombre, antes y después) de los productos filtrados que cambian"""
+    precio, margen, cantidad = _EXPRESSIONS[tipo]
+    where, params = _where(filtro)
+    params["valor"] = valor
+    sql = f"""SELECT * FROM (SELECT p.id AS producto_id, p.nombre,
+                                    p.precio AS precio_antes, {precio} AS precio_despues,
+                                    p.margen_ganancia AS margen_antes, {margen} AS margen_despues,
+                                    p.cantidad AS cantidad_antes, {cantidad} AS cantidad_despues
+                             FROM productos p WHERE {where})
+              WHERE precio_despues IS NOT precio_antes OR margen_despues IS NOT margen_antes
+                    OR cantidad_despues IS NOT cantidad_antes"""
+    return sql, params
+
+
+def describe(tipo: str, valor: float, filtro: Sequence) -> str:
+    """Descripción legible de la operación y su filtro (para el historial)"""
+    filtro = ProductFilter(*filtro)
+    parts = [_LABELS[tipo].format(valor=valor, importe=f"{'+' if valor >= 0 else ''}{Money(int(valor))}")]
+    if filtro.nombre:
+        parts.append(f"nombre «{filtro.nombre}»")
+    if filtro.ids is not None:
+        parts.append(f"{len(filtro.ids)} productos elegidos")
+    if filtro.stock_min is not None or filtro.stock_max is not None:
+        low = "" if filtro.stock_min is None else filtro.stock_min
+        high = "" if filtro.stock_max is None else filtro.stock_max
+        parts.append(f"stock {low}..{high}")
+    return " | ".join(parts)
+
+
+def preview(cursor: sqlite3.Cursor, tipo: str, valor: float, filtro: Sequence,
+            limit: int = PREVIEW_ROWS) -> BulkPreview:
+    """Calcula con las mismas expresiones que apply() qué productos cambian y cómo, sin escribir"""
+    _validate(tipo, valor)
+    _register_functions(cursor.connection)
+    sql, params = _changes(tipo, valor, filtro)
+    cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(precio_despues <= 0), 0) FROM ({sql})", params)
+    productos, invalidos = cursor.fetchone()
+    cursor.execute(f"{sql} ORDER BY producto_id LIMIT :limite", {**params, "limite": limit})
+    return BulkPreview(productos, invalidos, [BulkChange(*row) for row in cursor.fetchall()])
+
+
+def apply(cursor: sqlite3.Cursor, tipo: str, valor: float, filtro: Sequence, method: str) -> BulkResult:
+    """Aplica la operación a los productos filtrados; debe llamarse dentro de una transacción.
+
+    Los valores previos y nuevos se guardan primero en el historial con un INSERT ... SELECT
+    y desde ahí se actualizan los productos con una sola sentencia. Las entradas de stock se
+    registran como compras al costo del precio y el margen; las salidas consumen los lotes.
+    """
+    _validate(tipo, valor)
+    _register_functions(cursor.connection)
+    cursor.execute("INSERT INTO operaciones_masivas (fecha, tipo, valor, descripcion) VALUES (?, ?, ?, ?)",
+                   (ledger.timestamp(), tipo, valor, describe(tipo, valor, filtro)))
+    operacion_id = cursor.lastrowid
+    sql, params = _changes(tipo, valor, filtro)
+    cursor.execute(f"""INSERT INTO operaciones_masivas_filas
+                        (operacion_id, producto_id, precio_antes, precio_despues, margen_antes, margen_despues,
+                         cantidad_antes, cantidad_despues)
+                    SELECT :operacion, producto_id, precio_antes, precio_despues, margen_antes, margen_despues,
+                           cantidad_antes, cantidad_despues FROM ({sql})""", {**params, "operacion": operacion_id})
+    productos = cursor.rowcount
+    if not productos:
+        raise ValueError("Ningún producto cambia con esta operación")
+    cursor.execute("SELECT COUNT(*) FROM operaciones_masivas_filas WHERE operacion_id = ? AND precio_despues <= 0",
+                   (operacion_id,))
+    if invalidos := cursor.fetchone()[0]:
+        raise ValueError(f"{invalidos} productos quedarían con precio cero o negativo")
+
+    if tipo == STOCK:
+        _move_stock(cursor, operacion_id, method, undo=False)
+    else:
+        cursor.execute('''UPDATE productos SET (precio, margen_ganancia) =
+                           (SELECT f.precio_despues, f.margen_despues FROM operaciones_masivas_filas f
+                            WHERE f.operacion_id = ? AND f.producto_id = productos.id)
+                       WHERE id IN (SELECT producto_id FROM operaciones_masivas_filas WHERE operacion_id = ?)''',
+                       (operacion_id, operacion_id))
+    cursor.execute("UPDATE operaciones_masivas SET productos = ? WHERE id = ?", (productos, operacion_id))
+    # El historial guarda las últimas HISTORY operaciones
+    cursor.execute("DELETE FROM operaciones_masivas_filas WHERE operacion_id <= ?", (operacion_id - HISTORY,))
+    cursor.execute("DELETE FROM operaciones_masivas WHERE id <= ?", (operacion_id - HISTORY,))
+    return BulkResult(operacion_id, productos, 0)
+
+
+def undo(cursor: sqlite3.Cursor, operacion_id: Optional[int], method: str) -> BulkResult:
+    """Deshace una operación (por defecto, la última sin deshacer); debe llamarse dentro de una transacción.
+
+    Los precios y márgenes vuelven a su valor previo solo en los productos que no se modificaron
+    después; el stock se corrige con el movimiento inverso para no pisar las ventas posteriores.
+    """
+    if operacion_id is None:
+        cursor.execute("SELECT id, tipo, productos, deshecha FROM operaciones_masivas "
+                       "WHERE deshecha IS NULL ORDER BY id DESC LIMIT 1")
+    else:
+        cursor.execute("SELECT id, tipo, productos, deshecha FROM operaciones_masivas WHERE id = ?", (operacion_id,))
+    if not (operacion := cursor.fetchone()):
+        raise ValueError("No hay operaciones para deshacer")
+    operacion_id, tipo, productos, deshecha = operacion
+    if deshecha is not None:
+        raise ValueError(f"La operación {operacion_id} ya se deshizo")
+
+    if tipo == STOCK:
+        restored = _move_stock(cursor, operacion_id, method, undo=True)
+    else:
+        cursor.execute('''UPDATE productos SET (precio, margen_ganancia) =
+                           (SELECT f.precio_antes, f.margen_antes FROM operaciones_masivas_filas f
+                            WHERE f.operacion_id = ? AND f.producto_id = productos.id)
+                       WHERE id IN (SELECT f.producto_id FROM operaciones_masivas_filas f
+                                    JOIN productos p ON p.id = f.producto_id
+                                    WHERE f.operacion_id = ? AND p.precio = f.precio_despues
+                                          AND p.margen_ganancia = f.margen_despues)''',
+                       (operacion_id, operacion_id))
+        restored = cursor.rowcount
+    cursor.execute("UPDATE operaciones_masivas SET deshecha = ? WHERE id = ?", (ledger.timestamp(), operacion_id))
+    return BulkResult(operacion_id, restored, productos - restored)
+
+
+def _move_stock(cursor: sqlite3.Cursor, operacion_id: int, method: str, undo: bool) -> int:
+    """Mueve el stock de una operación (o su inverso); devuelve los productos movidos.
+
+    Las entradas se registran como compras: al aplicar, al costo del precio y el margen; al
+    deshacer una salida, al costo con que salió. Las salidas consumen los lotes según el método.
+    """
+    sign = -1 if undo else 1
+    cursor.execute('''SELECT f.producto_id, p.nombre, (f.cantidad_despues - f.cantidad_antes) * ?,
+                             p.cantidad, p.precio, p.margen_ganancia, f.costo
+                      FROM operaciones_masivas_filas f JOIN productos p ON p.id = f.producto_id
+                      WHERE f.operacion_id = ?''', (sign, operacion_id))
+    entries, exits = [], []
+    for producto_id, nombre, unidades, cantidad, precio, margen, costo in cursor.fetchall():
+        if unidades > 0:
+            costo_unitario = (costo + unidades // 2) // unidades if undo else costing.unit_cost(precio, margen)
+            entries.append((producto_id, nombre, unidades, costo_unitario))
+        elif undo:
+            # Lo vendido desde entonces ya salió: se retira solo lo que queda
+            if (unidades := min(-unidades, max(cantidad, 0))) > 0:
+                exits.append((producto_id, unidades))
+        else:
+            exits.append((producto_id, -unidades))
+
+    if entries:
+        cursor.executemany("UPDATE productos SET cantidad = cantidad + ? WHERE id = ?",
+                           ((unidades, producto_id) for producto_id, _n, unidades, _c in entries))
+        ledger.record_stock_entries(cursor, [(nombre, unidades, costo) for _id, nombre, unidades, costo in entries])
+    if exits:
+        costing.withdraw_units(cursor, exits, method)
+        if not undo:
+            # Costo con que salió cada producto, para devolverlo a ese costo si se deshace
+            cursor.execute(f'''UPDATE operaciones_masivas_filas SET costo =
+                                (SELECT s.costo FROM {costing.OUTFLOW} s
+                                 WHERE s.producto_id = operaciones_masivas_filas.producto_id)
+                            WHERE operacion_id = ? AND producto_id IN (SELECT producto_id FROM {costing.OUTFLOW})''',
+                           (operacion_id,))
+    return len(entries) + len(exits)
+
+
+def history(cursor: sqlite3.Cursor, limit: int = HISTORY) -> List[BulkOperation]:
+    """Operaciones registradas, las más recientes primero"""
+    cursor.execute('''SELECT id, fecha, tipo, valor, descripcion, productos, deshecha
+                   FROM operaciones_masivas ORDER BY id DESC LIMIT ?''', (limit,))
+    return [BulkOperation(*row) for row in cursor.fetchall()]
@@ -0,0 +1,167 @@
+import tkinter as tk
+from tkinter import messagebox
+import ttkbootstrap as tb
+from typing import Callable, Iterable, Optional, Tuple
+from bulk_ops import MARGIN, PRICE_AMOUNT, PRICE_PERCENT, STOCK, BulkPreview, BulkResult, ProductFilter
+from money import Money
+
+# Operaciones tal como se muestran en el diálogo
+OPERATION_LABELS = {
+    PRICE_PERCENT: "Precio: variación en %",
+    PRICE_AMOUNT: "Precio: sumar importe ($)",
+    MARGIN: "Margen: nuevo % (precio desde el costo)",
+    STOCK: "Stock: sumar unidades",
+}
+
+
+class BulkOperationWindow(tb.Toplevel):
+    """Cambios de precio, margen y stock sobre un conjunto filtrado de productos, con vista previa y deshacer"""
+
+    def __init__(self, parent, db, worker, selected_ids: Iterable[int] = (),
+                 on_applied: Optional[Callable[[], None]] = None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.on_applied = on_applied
+        self.title("Operaciones masivas")
+        self.geometry("900x500")
+
+        filters = tb.Labelframe(self, text="Productos", padding=10)
+        filters.pack(fill=tk.X, padx=10, pady=(10, 5))
+        self.entries = {}
+        for key, text, width in (("nombre", "Nombre (* comodín):", 18), ("ids", "IDs:", 18),
+                                 ("stock_min", "Stock desde:", 6), ("stock_max", "hasta:", 6)):
+            tb.Label(filters, text=text).pack(side=tk.LEFT, padx=(5, 2))
+            self.entries[key] = tb.Entry(filters, width=width)
+            self.entries[key].pack(side=tk.LEFT, padx=(0, 5))
+        # Con varios productos elegidos en la lista, la operación parte de ellos
+        self.entries["ids"].insert(0, ", ".join(str(product_id) for product_id in selected_ids))
+
+        controls = tb.Frame(self, padding=(10, 5))
+        controls.pack(fill=tk.X)
+        self.operation = tb.Combobox(controls, values=list(OPERATION_LABELS.values()), state="readonly", width=36)
+        self.operation.set(OPERATION_LABELS[PRICE_PERCENT])
+        self.operation.pack(side=tk.LEFT, padx=5)
+        tb.Label(controls, text="Valor:").pack(side=tk.LEFT, padx=(10, 2))
+        self.value_entry = tb.Entry(controls, width=10)
+        self.value_entry.pack(side=tk.LEFT, padx=5)
+        tb.Button(controls, text="Vista previa", bootstyle="info-outline", command=self.preview).pack(
+            side=tk.LEFT, padx=5)
+        tb.Button(controls, text="Aplicar", bootstyle="success", command=self.apply).pack(side=tk.LEFT, padx=5)
+        tb.Button(controls, text="Deshacer última", bootstyle="warning-outline", command=self.undo).pack(
+            side=tk.RIGHT, padx=5)
+
+        self.summary_label = tb.Label(self, text="", font=("Helvetica", 10, "bold"))
+        self.summary_label.pack(fill=tk.X, padx=15)
+
+        columns = [
+            ("nombre", "Producto", 220),
+            ("precio", "Precio", 160),
+            ("margen", "Margen", 120),
+            ("cantidad", "Cantidad", 120),
+        ]
+        self.tree = tb.Treeview(
+            self, columns=[c for c, _t, _w in columns], show="headings", bootstyle="primary"
+        )
+        for col, text, width in columns:
+            self.tree.heading(col, text=text)
+            self.tree.column(col, anchor="center", width=width)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    def _read(self) -> Tuple[str, float, ProductFilter]:
+        """Operación, valor y filtro del formulario; ValueError si algún dato es inválido"""
+        label = self.operation.get()
+        tipo = next(tipo for tipo, text in OPERATION_LABELS.items() if text == label)
+        text = self.value_entry.get().strip()
+        if not text:
+            raise ValueError("Indique el valor de la operación")
+        if tipo == PRICE_AMOUNT:
+            valor = Money.parse(text).cents
+        elif tipo == STOCK:
+            valor = int(text)
+        else:
+            valor = float(text)
+
+        def optional_int(key: str) -> Optional[int]:
+            value = self.entries[key].get().strip()
+            return int(value) if value else None
+
+        ids_text = self.entries["ids"].get().replace(",", " ").split()
+        filtro = ProductFilter(
+            nombre=self.entries["nombre"].get().strip() or None,
+            ids=[int(product_id) for product_id in ids_text] or None,
+            stock_min=optional_int("stock_min"),
+            stock_max=optional_int("stock_max"),
+        )
+        return tipo, valor, filtro
+
+    def preview(self) -> None:
+        """Calcula en segundo plano qué productos cambian, sin modificar nada"""
+        try:
+            tipo, valor, filtro = self._read()
+        except ValueError as e:
+            messagebox.showerror("Error", f"Dato inválido: {e}")
+            return
+        self.summary_label.config(text="Calculando...")
+        self.worker.submit(self.db.preview_bulk, tipo, valor, filtro, on_done=self._show_preview,
+                           on_error=self._failed, key="bulk-preview")
+
+    def apply(self) -> None:
+        """Aplica la operación en una transacción tras confirmarla"""
+        try:
+            tipo, valor, filtro = self._read()
+        except ValueError as e:
+            messagebox.showerror("Error", f"Dato inválido: {e}")
+            return
+        alcance = "todos los productos" if filtro == ProductFilter() else "los productos filtrados"
+        if not messagebox.askyesno("Confirmar", f"¿Aplicar «{self.operation.get()}: {self.value_entry.get()}» "
+                                                f"a {alcance}?"):
+            return
+        self.worker.submit(self.db.apply_bulk, tipo, valor, filtro,
+                           on_done=lambda result: self._done(result, "modificados"), on_error=self._failed)
+
+    def undo(self) -> None:
+        """Deshace la última operación masiva que no se haya deshecho"""
+        if not messagebox.askyesno("Confirmar", "¿Deshacer la última operación masiva?"):
+            return
+        self.worker.submit(self.db.undo_bulk, on_done=lambda result: self._done(result, "restaurados"),
+                           on_error=self._failed)
+
+    def _show_preview(self, result: BulkPreview) -> None:
+        if not self.winfo_exists():
+            return
+        text = f"{result.productos} productos cambian"
+        if len(result.filas) < result.productos:
+            text += f" (se muestran los primeros {len(result.filas)})"
+        if result.invalidos:
+            text += f"  |  {result.invalidos} quedarían con precio cero o negativo: no se puede aplicar"
+        self.summary_label.config(text=text)
+        self.tree.delete(*self.tree.get_children())
+        for change in result.filas:
+            self.tree.insert("", tk.END, iid=str(change.producto_id), values=(
+                change.nombre,
+                _before_after(f"${Money(change.precio_antes)}", f"${Money(change.precio_despues)}"),
+                _before_after(f"{change.margen_antes:g}%", f"{change.margen_despues:g}%"),
+                _before_after(change.cantidad_antes, change.cantidad_despues),
+            ))
+
+    def _done(self, result: BulkResult, action: str) -> None:
+        # Una sola sincronización de la vista para toda la operación
+        if self.on_applied:
+            self.on_applied()
+        if not self.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        text = f"Operación {result.operacion_id}: {result.productos} productos {action}"
+        if result.omitidos:
+            text += f"  |  {result.omitidos} sin cambios (se modificaron después)"
+        self.summary_label.config(text=text)
+
+    def _failed(self, error: BaseException) -> None:
+        if self.winfo_exists():
+            self.summary_label.config(text="")
+        messagebox.showerror("Error", str(error))
+
+
+def _before_after(before, after) -> str:
+    return str(before) if before == after else f"{before} → {after}"
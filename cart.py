@@ -0,0 +1,296 @@
+import json
+import os
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+from money import Cents, Money, to_cents
+
+# Registros del diario a partir de los cuales se compacta al quedar sin carritos pendientes
+JOURNAL_COMPACT_RECORDS = 5000
+
+
+class CartLine:
+    """Línea del carrito con el precio (centavos) tomado al escanear"""
+
+    __slots__ = ("producto_id", "nombre", "cantidad", "precio_unitario")
+
+    def __init__(self, producto_id: int, nombre: str, cantidad: int, precio_unitario: Cents):
+        self.producto_id = producto_id
+        self.nombre = nombre
+        self.cantidad = cantidad
+        self.precio_unitario = precio_unitario
+
+    @property
+    def subtotal(self) -> Cents:
+        return self.cantidad * self.precio_unitario
+
+    def values(self) -> Tuple[str, int, str, str]:
+        """Valores para la tabla de productos en venta"""
+        return self.nombre, self.cantidad, str(Money(self.precio_unitario)), str(Money(self.subtotal))
+
+
+class Cart:
+    """Carrito de un cliente: una línea por producto y total acumulado"""
+
+    __slots__ = ("session", "lines", "total", "pending_ref", "pending_lines")
+
+    def __init__(self, session: int):
+        self.session = session
+        self.lines: Dict[int, CartLine] = {}
+        self.total: Cents = 0
+        self.pending_ref: Optional[str] = None  # referencia del último cobro iniciado
+        self.pending_lines: List[Tuple[int, int, Cents]] = []  # líneas enviadas con esa referencia
+
+    def add(self, producto_id: int, nombre: str, precio: Cents, cantidad: int) -> CartLine:
+        line = self.lines.get(producto_id)
+        if line is None:
+            line = self.lines[producto_id] = CartLine(producto_id, nombre, 0, precio)
+        line.cantidad += cantidad
+        self.total += cantidad * line.precio_unitario
+        return line
+
+    def remove(self, producto_id: int) -> None:
+        line = self.lines.pop(producto_id, None)
+        if line is not None:
+            self.total -= line.subtotal
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.total = 0
+        self.drop_checkout()
+
+    def drop_checkout(self) -> None:
+        self.pending_ref = None
+        self.pending_lines = []
+
+    def subtract(self, lines: List[Tuple[int, int, Cents]]) -> None:
+        """Descuenta las unidades cobradas; lo agregado después del cobro queda en el carrito"""
+        for producto_id, cantidad, _precio in lines:
+            line = self.lines.get(producto_id)
+            if line is None:
+                continue
+            cantidad = min(cantidad, line.cantidad)
+            line.cantidad -= cantidad
+            self.total -= cantidad * line.precio_unitario
+            if not line.cantidad:
+                del self.lines[producto_id]
+
+    def checkout_lines(self) -> List[Tuple[int, int, Cents]]:
+        """Líneas (producto_id, cantidad, precio_unitario) para DatabaseManager.process_cart"""
+        return [(line.producto_id, line.cantidad, line.precio_unitario) for line in self.lines.values()]
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __iter__(self) -> Iterator[CartLine]:
+        return iter(self.lines.values())
+
+
+class CartManager:
+    """Carritos en memoria por sesión con un diario de solo anexado para recuperarlos tras un cierre"""
+
+    def __init__(self, journal_path: Optional[str] = None, fsync: bool = False):
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self.carts: Dict[int, Cart] = {}
+        self.current: Optional[int] = None
+        # Cobros enviados a la base sin respuesta todavía: {sesión: el carrito cambió mientras tanto}
+        self._in_flight: Dict[int, bool] = {}
+        self._records = 0
+        self._journal = None
+        if journal_path and os.path.exists(journal_path):
+            self._replay()
+        if journal_path:
+            self._journal = open(journal_path, "a", encoding="utf-8", buffering=1)
+        if not self.carts:
+            self.new_session()
+        elif self.current not in self.carts:
+            self.current = min(self.carts)
+
+    # Diario
+
+    def _write(self, record: dict) -> None:
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._records += 1
+        if self.fsync:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def _replay(self) -> None:
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # última línea incompleta tras un cierre abrupto
+                self._records += 1
+                self._apply(record)
+
+    def _apply(self, record: dict) -> None:
+        op, session = record["op"], record["s"]
+        if op == "new":
+            self.carts[session] = Cart(session)
+            self.current = session
+            return
+        cart = self.carts.get(session)
+        if cart is None:
+            return
+        if op == "add":
+            precio = record["p"]
+            if isinstance(precio, float):
+                precio = to_cents(precio)  # diarios escritos antes de los importes en centavos
+            cart.add(record["id"], record["n"], precio, record["q"])
+        elif op == "remove":
+            cart.remove(record["id"])
+        elif op == "clear":
+            cart.clear()
+        elif op == "checkout":
+            cart.pending_ref = record["ref"]
+            # Diarios anteriores sin "l": el cobro abarcaba el carrito entero
+            lines = record.get("l")
+            cart.pending_lines = ([tuple(line) for line in lines] if lines is not None
+                                  else cart.checkout_lines())
+        elif op == "drop":
+            cart.drop_checkout()
+        elif op == "sold":
+            if cart.pending_ref == record["ref"]:
+                cart.subtract(cart.pending_lines)
+                cart.drop_checkout()
+        elif op == "close":
+            del self.carts[session]
+        elif op == "select":
+            self.current = session
+
+    def _compact(self) -> None:
+        """Reescribe el diario con el estado actual si creció demasiado"""
+        if self._journal is None or self._records < JOURNAL_COMPACT_RECORDS:
+            return
+        records = []
+        for cart in self.carts.values():
+            records.append({"op": "new", "s": cart.session})
+            records.extend({"op": "add", "s": cart.session, "id": line.producto_id, "n": line.nombre,
+                            "p": line.precio_unitario, "q": line.cantidad} for line in cart)
+            if cart.pending_ref:
+                records.append({"op": "checkout", "s": cart.session, "ref": cart.pending_ref,
+                                "l": cart.pending_lines})
+        if self.current is not None:
+            records.append({"op": "select", "s": self.current})
+        self._journal.close()
+        temp = f"{self.journal_path}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.journal_path)
+        self._records = len(records)
+        self._journal = open(self.journal_path, "a", encoding="utf-8", buffering=1)
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # Sesiones
+
+    @property
+    def cart(self) -> Cart:
+        """Carrito de la sesión activa"""
+        return self.carts[self.current]
+
+    def new_session(self) -> int:
+        """Abre un carrito nuevo y lo deja activo (el anterior queda en espera)"""
+        session = max(self.carts, default=0) + 1
+        self._write({"op": "new", "s": session})
+        self._apply({"op": "new", "s": session})
+        return session
+
+    def select(self, session: int) -> None:
+        if session in self.carts and session != self.current:
+            self._write({"op": "select", "s": session})
+            self.current = session
+
+    def close_session(self, session: int) -> None:
+        """Descarta un carrito; siempre queda al menos uno abierto"""
+        self._write({"op": "close", "s": session})
+        self._apply({"op": "close", "s": session})
+        if not self.carts:
+            self.new_session()
+        elif self.current not in self.carts:
+            self.select(min(self.carts))
+
+    # Líneas
+
+    def add(self, producto_id: int, nombre: str, precio: Cents, cantidad: int = 1,
+            session: Optional[int] = None) -> CartLine:
+        """Agrega unidades con el precio vigente al escanear (si la línea ya existe, conserva su precio)"""
+        session = self.current if session is None else session
+        self._write({"op": "add", "s": session, "id": producto_id, "n": nombre, "p": precio, "q": cantidad})
+        self._edited(session)
+        return self.carts[session].add(producto_id, nombre, precio, cantidad)
+
+    def remove(self, producto_id: int, session: Optional[int] = None) -> None:
+        session = self.current if session is None else session
+        self._write({"op": "remove", "s": session, "id": producto_id})
+        self._edited(session)
+        self.carts[session].remove(producto_id)
+
+    def clear(self, session: Optional[int] = None) -> None:
+        session = self.current if session is None else session
+        self._write({"op": "clear", "s": session})
+        self.carts[session].clear()
+
+    def _edited(self, session: int) -> None:
+        """Un carrito distinto es otro cobro, salvo si el anterior todavía no tiene respuesta"""
+        if session in self._in_flight:
+            self._in_flight[session] = True
+        elif self.carts[session].pending_ref:
+            self._drop_checkout(session)
+
+    def _drop_checkout(self, session: int) -> None:
+        self._write({"op": "drop", "s": session})
+        self.carts[session].drop_checkout()
+
+    # Cobro
+
+    def begin_checkout(self, session: Optional[int] = None) -> str:
+        """Anota en el diario la referencia y las líneas del cobro antes de enviarlo a la base.
+
+        Mientras el carrito no cambie, un reintento (p. ej. tras perder la respuesta) reusa la
+        misma referencia y la base no registra la venta dos veces. Las líneas a enviar son
+        las de `Cart.pending_lines`.
+        """
+        session = self.current if session is None else session
+        cart = self.carts[session]
+        self._in_flight[session] = False
+        if cart.pending_ref:
+            return cart.pending_ref
+        ref = uuid.uuid4().hex
+        lines = cart.checkout_lines()
+        self._write({"op": "checkout", "s": session, "ref": ref, "l": lines})
+        cart.pending_ref, cart.pending_lines = ref, lines
+        return ref
+
+    def is_checking_out(self, session: int) -> bool:
+        """Hay un cobro de la sesión enviado a la base y sin respuesta"""
+        return session in self._in_flight
+
+    def complete_checkout(self, session: int, ref: Optional[str] = None) -> None:
+        """El cobro quedó confirmado en la base: descuenta sus líneas (lo agregado después queda)"""
+        self._in_flight.pop(session, None)
+        cart = self.carts.get(session)
+        if cart is None or not cart.pending_ref or ref not in (None, cart.pending_ref):
+            return
+        self._write({"op": "sold", "s": session, "ref": cart.pending_ref})
+        self._apply({"op": "sold", "s": session, "ref": cart.pending_ref})
+        if not any(self.carts[s].lines for s in self.carts):
+            self._compact()
+
+    def fail_checkout(self, session: int) -> None:
+        """El cobro no se confirmó: si el carrito cambió mientras tanto, el próximo lleva otra referencia"""
+        if self._in_flight.pop(session, False) and session in self.carts:
+            self._drop_checkout(session)
+
+    def pending_checkouts(self) -> Dict[int, str]:
+        """Cobros iniciados antes de un cierre abrupto: {sesión: referencia}"""
+        return {cart.session: cart.pending_ref for cart in self.carts.values() if cart.pending_ref and cart.lines}
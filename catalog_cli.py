@@ -0,0 +1,34 @@
+import argparse
+import sys
+from catalog_io import export_catalog, import_catalog
+from constants import DB_NAME
+from database import DatabaseManager
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Importa o exporta el catálogo de productos (CSV/JSONL)")
+    parser.add_argument("accion", choices=("importar", "exportar"))
+    parser.add_argument("archivo", help="Ruta del archivo .csv o .jsonl")
+    parser.add_argument("--db", default=DB_NAME, help="Base de datos de inventario")
+    parser.add_argument("--formato", choices=("csv", "jsonl"), help="Formato (por defecto según la extensión)")
+    parser.add_argument("--lote", type=int, default=5000, help="Filas por transacción")
+    args = parser.parse_args(argv)
+
+    def progress(count: int) -> None:
+        print(f"\r{count} filas", end="", file=sys.stderr, flush=True)
+
+    db = DatabaseManager(args.db)
+    try:
+        action = import_catalog if args.accion == "importar" else export_catalog
+        count = action(db, args.archivo, args.formato, args.lote, progress)
+    except (OSError, ValueError) as e:
+        print(f"\nError: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(f"\n{args.accion.capitalize()}: {count} productos", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
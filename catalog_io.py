@@ -0,0 +1,111 @@
+import csv
+import json
+import os
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from database import DatabaseManager
+from money import Cents, Money, to_cents
+
+# El archivo lleva el precio en pesos ("12.50"); en la base se guarda en centavos
+CATALOG_FIELDS = ("nombre", "cantidad", "precio", "margen_ganancia")
+CatalogRow = Tuple[str, int, Cents, float]
+ProgressCallback = Callable[[int], None]
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """Determina el formato (csv/jsonl) a partir de la extensión del archivo"""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt in ("json", "ndjson"):
+        fmt = "jsonl"
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Formato de catálogo no soportado: {fmt or path}")
+    return fmt
+
+
+def _parse_row(record: dict, line: int) -> CatalogRow:
+    """Valida y convierte un registro del catálogo"""
+    try:
+        nombre = str(record["nombre"]).strip()
+        cantidad = int(record["cantidad"])
+        precio = to_cents(record["precio"])
+        margen_ganancia = float(record["margen_ganancia"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Línea {line}: registro inválido ({e})") from e
+    if not nombre:
+        raise ValueError(f"Línea {line}: el nombre es obligatorio")
+    if cantidad < 0 or precio <= 0 or margen_ganancia <= -100:
+        raise ValueError(f"Línea {line}: valores fuera de rango")
+    return nombre, cantidad, precio, margen_ganancia
+
+
+def read_csv(path: str) -> Iterator[CatalogRow]:
+    """Lee un catálogo CSV fila por fila"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield _parse_row(record, reader.line_num)
+
+
+def read_jsonl(path: str) -> Iterator[CatalogRow]:
+    """Lee un catálogo JSON Lines (un objeto por línea)"""
+    with open(path, encoding="utf-8") as f:
+        for line, text in enumerate(f, start=1):
+            if text.strip():
+                yield _parse_row(json.loads(text), line)
+
+
+def read_catalog(path: str, fmt: Optional[str] = None) -> Iterator[CatalogRow]:
+    """Lee un catálogo en cualquiera de los formatos soportados"""
+    reader = read_csv if detect_format(path, fmt) == "csv" else read_jsonl
+    return reader(path)
+
+
+def _chunks(rows: Iterable[CatalogRow], size: int) -> Iterator[List[CatalogRow]]:
+    """Agrupa un iterable en listas de tamaño fijo"""
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def import_catalog(
+    db: DatabaseManager,
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = 5000,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Importa un catálogo por lotes; cada lote es una transacción"""
+    imported = 0
+    for chunk in _chunks(read_catalog(path, fmt), batch_size):
+        imported += db.bulk_upsert_products(chunk)
+        if progress:
+            progress(imported)
+    return imported
+
+
+def export_catalog(
+    db: DatabaseManager,
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = 5000,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Exporta el catálogo completo sin cargarlo en memoria"""
+    fmt = detect_format(path, fmt)
+    exported = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(CATALOG_FIELDS)
+        for _id, nombre, cantidad, precio, margen_ganancia in db.iter_products(batch_size):
+            if writer:
+                writer.writerow((nombre, cantidad, Money(precio), margen_ganancia))
+            else:
+                row = (nombre, cantidad, float(Money(precio)), margen_ganancia)
+                f.write(json.dumps(dict(zip(CATALOG_FIELDS, row)), ensure_ascii=False) + "\n")
+            exported += 1
+            if progress and exported % batch_size == 0:
+                progress(exported)
+    if progress:
+        progress(exported)
+    return exported
@@ -0,0 +1,141 @@
+import random
+import sqlite3
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+import costing
+import ledger
+from connection import ConnectionManager
+from ledger import SaleRecord
+from money import Cents, Money
+
+# (producto_id, nombre, cantidad pedida, stock disponible)
+Shortage = Tuple[int, str, int, int]
+# (producto_id, cantidad, precio unitario en centavos tomado al escanear)
+CartLineRow = Tuple[int, int, Cents]
+
+
+class InsufficientStockError(ValueError):
+    """Error de venta que reporta todas las líneas sin stock suficiente"""
+
+    def __init__(self, shortages: List[Shortage]):
+        self.shortages = shortages
+        detalle = "\n".join(
+            f"- {nombre or f'ID {producto_id}'}: pedido {pedido}, disponible {stock}"
+            for producto_id, nombre, pedido, stock in shortages
+        )
+        super().__init__(f"Stock insuficiente para:\n{detalle}")
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    """Indica si el error corresponde a SQLITE_BUSY/SQLITE_LOCKED"""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED):
+        return True
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class CheckoutEngine:
+    """Confirma la venta actual con sentencias por conjuntos bajo BEGIN IMMEDIATE"""
+
+    def __init__(self, connections: ConnectionManager, max_retries: int = 8, base_delay: float = 0.01,
+                 costing_method: Callable[[], str] = lambda: costing.AVERAGE):
+        self._connections = connections
+        self.costing_method = costing_method
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+    def checkout(self) -> Cents:
+        """Valida y descuenta todas las líneas; reintenta con backoff si la base está ocupada"""
+        return self._with_retry(self._checkout_once)
+
+    def checkout_lines(self, lines: Iterable[CartLineRow], ref: Optional[str] = None) -> Cents:
+        """Cobra un carrito en memoria (producto_id, cantidad, precio_unitario) en una transacción.
+
+        Con `ref`, un cobro ya confirmado con esa referencia no se repite y devuelve su total.
+        """
+        lines = list(lines)
+        return self._with_retry(lambda: self._checkout_lines_once(lines, ref)[1])
+
+    def checkout_record(self, lines: Iterable[CartLineRow], ref: Optional[str] = None) -> Optional[SaleRecord]:
+        """Como checkout_lines, pero devuelve la venta confirmada en forma compacta (None si no hay líneas).
+
+        Las líneas se leen del libro dentro de la misma transacción, por su índice de venta:
+        el registro es exactamente lo confirmado, también al repetir un cobro con `ref`.
+        """
+        lines = list(lines)
+
+        def once() -> Optional[SaleRecord]:
+            with self._connections.transaction(immediate=True) as conn:
+                venta_id, _total = self._checkout_lines_once(lines, ref)
+                if venta_id is None:
+                    return None
+                return ledger.sale_records(conn.cursor(), "v.id = ?", (venta_id,))[0]
+
+        return self._with_retry(once)
+
+    def _with_retry(self, operation: Callable[[], Any]) -> Any:
+        # Dentro de una transacción externa no se puede reintentar: el error se propaga
+        if self._connections.in_transaction():
+            return operation()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == self.max_retries:
+                    raise
+                time.sleep(self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+        raise AssertionError("unreachable")
+
+    def _checkout_once(self) -> Cents:
+        """Ejecuta la venta del carrito guardado en ventas_actuales"""
+        with self._connections.transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM ventas_actuales)")
+            if not cursor.fetchone()[0]:
+                return 0
+            _venta_id, total_venta = self._commit_cart(cursor, "ventas_actuales")
+            cursor.execute("DELETE FROM ventas_actuales")
+            return total_venta
+
+    def _checkout_lines_once(self, lines: List[CartLineRow], ref: Optional[str]) -> Tuple[Optional[int], Cents]:
+        """Carga las líneas en una tabla temporal y ejecuta la venta sobre ella; devuelve (venta_id, total)"""
+        with self._connections.transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            if ref is not None:
+                cursor.execute("SELECT id, total FROM ventas WHERE ref = ?", (ref,))
+                if done := cursor.fetchone():
+                    return done
+            if not lines:
+                return None, 0
+            cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS carrito_checkout
+                           (producto_id INTEGER NOT NULL,
+                           cantidad INTEGER NOT NULL,
+                           precio_unitario INTEGER NOT NULL,
+                           subtotal INTEGER NOT NULL)''')
+            cursor.execute("DELETE FROM temp.carrito_checkout")
+            cursor.executemany("INSERT INTO temp.carrito_checkout VALUES (?, ?, ?, ?)",
+                               # Money rechaza precios que no estén en centavos enteros
+                               ((producto_id, cantidad, precio, (Money(precio) * cantidad).cents)
+                                for producto_id, cantidad, precio in lines))
+            sale = self._commit_cart(cursor, "temp.carrito_checkout", ref)
+            cursor.execute("DELETE FROM temp.carrito_checkout")
+            return sale
+
+    def _commit_cart(self, cursor: sqlite3.Cursor, source: str, ref: Optional[str] = None) -> Tuple[int, Cents]:
+        """Valida stock, descuenta y registra la venta de las líneas de `source` en un número constante de sentencias"""
+        # 1. Todas las líneas con stock insuficiente (o producto inexistente) de una vez
+        cursor.execute(f"""SELECT v.producto_id, p.nombre, SUM(v.cantidad), COALESCE(p.cantidad, 0)
+                        FROM {source} v
+                        LEFT JOIN productos p ON p.id = v.producto_id
+                        GROUP BY v.producto_id
+                        HAVING p.id IS NULL OR p.cantidad < SUM(v.cantidad)""")
+        if shortages := cursor.fetchall():
+            raise InsufficientStockError(shortages)
+
+        # 2. Descuento de stock, consumo de lotes y costo de lo vendido de todas las líneas
+        costing.withdraw(cursor, source, self.costing_method())
+
+        # 3. Venta y líneas (con su costo) al libro y resúmenes
+        return ledger.record_sale_from_cart(cursor, source=source, ref=ref)
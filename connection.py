@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+# Lo único que puede ejecutar una conexión de solo lectura (ver ConnectionManager.restrict_to_reads)
+_READ_ACTIONS = frozenset({sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                           sqlite3.SQLITE_RECURSIVE})
+# PRAGMA que se pueden consultar (sin asignarles valor)
+_READ_PRAGMAS = frozenset({"data_version", "query_only", "user_version"})
+
+
+def _authorize_read(action: int, arg1: Optional[str], arg2: Optional[str], _db: Optional[str],
+                    _trigger: Optional[str]) -> int:
+    """Autorizador de SQLite: niega escrituras, DDL, ATTACH, transacciones y PRAGMA que modifican"""
+    if action in _READ_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 in _READ_PRAGMAS and arg2 is None:
+        return sqlite3.SQLITE_OK
+    # Las tablas virtuales (json_each, productos_fts) declaran su esquema al abrirse y de nuevo tras
+    # cada cambio de esquema, y SQLite lo autoriza como UPDATE de sqlite_master. Una sentencia
+    # UPDATE sobre sqlite_master igual falla: requiere PRAGMA writable_schema, que queda negado arriba
+    if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+class ConnectionManager:
+    """Administra conexiones persistentes y afinadas (una por hilo) a SQLite"""
+
+    def __init__(
+        self,
+        db_name: str,
+        timeout: float = 5.0,
+        cache_size_kb: int = 64000,
+        mmap_size: int = 256 * 1024 * 1024,
+        cached_statements: int = 256,
+        factory: type = sqlite3.Connection,
+    ):
+        self.db_name = db_name
+        self.timeout = timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        """Abre una conexión nueva con los PRAGMA de rendimiento"""
+        # isolation_level=None: las transacciones se abren explícitamente en transaction()
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.timeout,
+            isolation_level=None,
+            cached_statements=self.cached_statements,
+            # Cada conexión la usa un solo hilo; esto solo permite cerrarlas desde close()
+            check_same_thread=False,
+            factory=self.factory,
+        )
+        # Solo tiene efecto en una base nueva (antes de WAL y de crear tablas); las existentes
+        # las convierte una vez el mantenimiento (maintenance.compact)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Obtiene la conexión del hilo actual, abriéndola la primera vez"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            self._local.depth = 0
+        return conn
+
+    def restrict_to_reads(self) -> None:
+        """Deja la conexión del hilo actual en solo lectura para siempre.
+
+        PRAGMA query_only se puede desactivar con otra sentencia; el autorizador no, y rechaza
+        al preparar cualquier sentencia que no sea una lectura.
+        """
+        conn = self.connection()
+        conn.execute("PRAGMA query_only = ON")
+        conn.set_authorizer(_authorize_read)
+
+    @contextmanager
+    def transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """Abre una transacción; las transacciones anidadas usan SAVEPOINT"""
+        conn = self.connection()
+        depth = self._local.depth
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        else:
+            conn.execute(f"SAVEPOINT sp_{depth}")
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO sp_{depth}")
+                conn.execute(f"RELEASE sp_{depth}")
+            raise
+        self._local.depth = depth
+        if depth == 0:
+            conn.execute("COMMIT")
+        else:
+            conn.execute(f"RELEASE sp_{depth}")
+
+    def in_transaction(self) -> bool:
+        """Indica si el hilo actual tiene una transacción abierta"""
+        return getattr(self._local, "depth", 0) > 0
+
+    def close(self) -> None:
+        """Cierra todas las conexiones abiertas por cualquier hilo"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
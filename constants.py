@@ -1,3 +1,5 @@
 # Constantes compartidas
 DB_NAME = "inventario.db"
-IVA_PERCENT = 0.19
\ No newline at end of file
+IVA_PERCENT = 0.19
+# Diario de los carritos en memoria (recuperación tras un cierre abrupto)
+CART_JOURNAL = "carritos.journal"
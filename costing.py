@@ -0,0 +1,108 @@
+import sqlite3
+from typing import Iterable, Tuple
+from money import Cents, Money
+
+# Métodos de costeo de lo vendido: promedio ponderado móvil o primeras entradas, primeras salidas
+AVERAGE = "promedio"
+FIFO = "fifo"
+COSTING_METHODS = (AVERAGE, FIFO)
+
+# Tabla temporal con el costo de las unidades que salen en la operación en curso
+OUTFLOW = "temp.salida_costos"
+
+
+def unit_cost(precio: Cents, margen_ganancia: float) -> Cents:
+    """Costo unitario en centavos a partir del precio de venta y el margen"""
+    return Money(precio).without_margin(margen_ganancia).cents
+
+
+def sale_price(costo: Cents, margen_ganancia: float) -> Cents:
+    """Precio de venta en centavos a partir del costo y el margen (inverso de unit_cost)"""
+    return Money(costo).with_margin(margen_ganancia).cents
+
+
+def receive(cursor: sqlite3.Cursor, first_entry_id: int) -> None:
+    """Abre un lote por cada entrada de stock con id > first_entry_id y suma su costo al valor del stock"""
+    cursor.execute('''INSERT INTO lotes_stock (producto_id, entrada_id, fecha, cantidad, restante, costo_unitario)
+                   SELECT producto_id, id, fecha, cantidad, cantidad, costo_unitario FROM entradas_stock
+                   WHERE id > ? AND cantidad > 0''', (first_entry_id,))
+    cursor.execute('''UPDATE productos SET valor_stock = valor_stock + e.costo
+                   FROM (SELECT producto_id, SUM(costo_total) AS costo FROM entradas_stock NOT INDEXED
+                         WHERE id > ? GROUP BY producto_id) AS e
+                   WHERE productos.id = e.producto_id''', (first_entry_id,))
+
+
+def withdraw(cursor: sqlite3.Cursor, source: str, method: str) -> Cents:
+    """Saca del stock las unidades de `source` (producto_id, cantidad) y deja su costo en OUTFLOW.
+
+    Descuenta cantidad y valor_stock y consume los lotes más antiguos en ambos métodos, para que
+    se pueda cambiar de método sin reconstruir el historial. El costo es el promedio ponderado
+    vigente (valor_stock / cantidad) o, en FIFO, el de los lotes consumidos. Devuelve el costo total.
+    """
+    if method not in COSTING_METHODS:
+        raise ValueError(f"Método de costeo desconocido: {method}")
+    cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS salida_lotes
+                   (lote_id INTEGER PRIMARY KEY,
+                   producto_id INTEGER NOT NULL,
+                   usado INTEGER NOT NULL,
+                   costo_unitario INTEGER NOT NULL)''')
+    cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS salida_costos
+                   (producto_id INTEGER PRIMARY KEY,
+                   cantidad INTEGER NOT NULL,
+                   costo INTEGER NOT NULL)''')
+    cursor.execute("DELETE FROM temp.salida_lotes")
+    cursor.execute(f"DELETE FROM {OUTFLOW}")
+
+    # Unidades tomadas de cada lote abierto: lo pedido menos lo que cubren los lotes anteriores
+    cursor.execute(f'''WITH pedido AS (SELECT producto_id, SUM(cantidad) AS cantidad
+                                       FROM {source} GROUP BY producto_id),
+                        capas AS (SELECT l.id, l.producto_id, l.restante, l.costo_unitario, p.cantidad AS pedido,
+                                         SUM(l.restante) OVER (PARTITION BY l.producto_id ORDER BY l.id)
+                                             - l.restante AS previo
+                                  FROM pedido p JOIN lotes_stock l
+                                      ON l.producto_id = p.producto_id AND l.restante > 0)
+                    INSERT INTO temp.salida_lotes (lote_id, producto_id, usado, costo_unitario)
+                    SELECT id, producto_id, MIN(restante, pedido - previo), costo_unitario
+                    FROM capas WHERE previo < pedido''')
+
+    # Promedio redondeado al centavo; en FIFO, las unidades sin lote (si las hubiera) van al promedio
+    cursor.execute(f'''INSERT INTO {OUTFLOW} (producto_id, cantidad, costo)
+                    SELECT p.id, v.cantidad,
+                           CASE WHEN p.cantidad <= 0 THEN 0
+                                WHEN ? = '{FIFO}' THEN COALESCE(l.costo, 0)
+                                    + (p.valor_stock * (v.cantidad - COALESCE(l.unidades, 0)) + p.cantidad / 2)
+                                      / p.cantidad
+                                ELSE (p.valor_stock * v.cantidad + p.cantidad / 2) / p.cantidad END
+                    FROM (SELECT producto_id, SUM(cantidad) AS cantidad FROM {source} GROUP BY producto_id) AS v
+                    JOIN productos p ON p.id = v.producto_id
+                    LEFT JOIN (SELECT producto_id, SUM(usado) AS unidades, SUM(usado * costo_unitario) AS costo
+                               FROM temp.salida_lotes GROUP BY producto_id) AS l
+                        ON l.producto_id = v.producto_id''', (method,))
+
+    # Búsquedas por rowid desde las tablas temporales (UPDATE ... FROM recorrería la tabla destino)
+    cursor.execute('''UPDATE lotes_stock SET restante = restante -
+                       (SELECT s.usado FROM temp.salida_lotes s WHERE s.lote_id = lotes_stock.id)
+                   WHERE id IN (SELECT lote_id FROM temp.salida_lotes)''')
+    cursor.execute(f'''UPDATE productos SET (cantidad, valor_stock) =
+                        (SELECT productos.cantidad - s.cantidad, productos.valor_stock - s.costo
+                         FROM {OUTFLOW} s WHERE s.producto_id = productos.id)
+                    WHERE id IN (SELECT producto_id FROM {OUTFLOW})''')
+    cursor.execute(f"SELECT COALESCE(SUM(costo), 0) FROM {OUTFLOW}")
+    return cursor.fetchone()[0]
+
+
+def withdraw_units(cursor: sqlite3.Cursor, lines: Iterable[Tuple[int, int]], method: str) -> Cents:
+    """Saca unidades (producto_id, cantidad) sin venta, p. ej. al corregir el stock; devuelve su costo"""
+    cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS ajuste_stock
+                   (producto_id INTEGER NOT NULL,
+                   cantidad INTEGER NOT NULL)''')
+    cursor.execute("DELETE FROM temp.ajuste_stock")
+    cursor.executemany("INSERT INTO temp.ajuste_stock VALUES (?, ?)", lines)
+    return withdraw(cursor, "temp.ajuste_stock", method)
+
+
+def revalue_from_lots(cursor: sqlite3.Cursor) -> None:
+    """Valor del stock igual a la suma de los lotes abiertos (al pasar a FIFO)"""
+    cursor.execute('''UPDATE productos SET valor_stock = COALESCE(
+                       (SELECT SUM(restante * costo_unitario) FROM lotes_stock
+                        WHERE producto_id = productos.id AND restante > 0), 0)''')
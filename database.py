@@ -1,163 +1,586 @@
+import json
 import sqlite3
-from typing import List, Tuple, Optional
-from constants import DB_NAME, IVA_PERCENT
+from contextlib import contextmanager
+from difflib import SequenceMatcher
+from typing import Iterable, Iterator, List, NamedTuple, Set, Tuple, Optional
+import bulk_ops
+from bulk_ops import BulkOperation, BulkPreview, BulkResult, ProductFilter
+from checkout import CheckoutEngine
+import costing
+import ledger
+import migrations
+import replication
+import stock_alerts
+from connection import ConnectionManager
+from constants import DB_NAME
+from instrumentation import Diagnostics, Instrumentation
+from ledger import SaleRecord
+from money import Cents
+from replication import Bundle, ImportResult
+from settings import SettingsCache
+from stock_alerts import COVER_DAYS, VELOCITY_DAYS, LowStockItem, ReorderSuggestion
+
+# Columnas por las que se puede ordenar la vista de productos (todas indexadas)
+PRODUCT_SORT_KEYS = {
+    "id": "id",
+    "nombre": "nombre",
+    "cantidad": "cantidad",
+    "precio": "precio",
+    "ganancia": "margen_ganancia",
+}
+
+# Candidatos por resultado que se traen del índice FTS antes de ordenarlos
+SEARCH_CANDIDATES = 4
+
+# Métodos de control que no se miden a sí mismos
+INSTRUMENTATION_METHODS = ("enable_instrumentation", "disable_instrumentation", "get_diagnostics", "close")
+
+
+class ChangeSet(NamedTuple):
+    """Cambios ocurridos desde un token de versión"""
+    token: int
+    reset: bool  # el token es más antiguo que el registro: recargar todo
+    productos: Set[int]
+    ventas: Set[int]  # producto_id de las líneas del carrito modificadas
+    productos_delta: int  # altas menos bajas de productos
+
+
+class Totals(NamedTuple):
+    """Acumulados del sistema en centavos"""
+    ventas: Cents
+    gastado: Cents  # compras (entradas de stock)
+    costo_ventas: Cents  # costo de lo vendido, guardado por línea de venta
+    inventario: Cents  # valor del stock actual
+
+
+def _fts_phrase(text: str) -> str:
+    """Frase FTS5 (subcadena exacta con el tokenizador trigram)"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _fts_fuzzy(query: str) -> str:
+    """Consulta FTS5 tolerante a un error de tipeo: alguna de las mitades debe coincidir"""
+    if len(query) >= 6:
+        middle = len(query) // 2
+        parts = [query[:middle], query[middle:]]
+    else:
+        parts = [query[i:i + 3] for i in range(len(query) - 2)]
+    return " OR ".join(_fts_phrase(part) for part in parts)
+
+
+def _similarity(query: str, nombre: str) -> float:
+    """Similitud entre la búsqueda y el nombre, sin distinguir mayúsculas"""
+    return SequenceMatcher(None, query.lower(), nombre.lower()).ratio()
+
 
 class DatabaseManager:
     """Manejador de operaciones de base de datos"""
     def __init__(self, db_name: str = DB_NAME):
         self.db_name = db_name
+        self.instrumentation = Instrumentation()
+        self._connections = ConnectionManager(db_name, factory=self.instrumentation.connection_factory())
+        self._checkout = CheckoutEngine(self._connections, costing_method=lambda: self.settings.costing_method)
+        self.settings = SettingsCache(self._connections)
         self._initialize_db()
-    
+
     def _initialize_db(self) -> None:
-        """Inicializa las tablas de la base de datos"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            # Tabla productos con margen_ganancia
-            cursor.execute('''CREATE TABLE IF NOT EXISTS productos
-                           (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                           nombre TEXT NOT NULL UNIQUE,
-                           cantidad INTEGER NOT NULL,
-                           precio REAL NOT NULL,
-                           margen_ganancia REAL NOT NULL)''')
-            
-            # Tabla totales (requerida para los cálculos)
-            cursor.execute('''CREATE TABLE IF NOT EXISTS totales
-                           (id INTEGER PRIMARY KEY,
-                           total_ventas REAL DEFAULT 0,
-                           total_gastado REAL DEFAULT 0)''')
-            cursor.execute("INSERT OR IGNORE INTO totales (id) VALUES (1)")
-            
-            # Tabla de configuración para IVA
-            cursor.execute('''CREATE TABLE IF NOT EXISTS configuraciones
-                           (clave TEXT PRIMARY KEY,
-                           valor TEXT)''')
-            cursor.execute("INSERT OR IGNORE INTO configuraciones VALUES ('iva_percent', ?)", (str(IVA_PERCENT),))
-            
-            # Tabla ventas_actuales
-            cursor.execute('''CREATE TABLE IF NOT EXISTS ventas_actuales
-                           (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                           producto_id INTEGER NOT NULL,
-                           cantidad INTEGER NOT NULL,
-                           precio_unitario REAL NOT NULL,
-                           subtotal REAL NOT NULL,
-                           FOREIGN KEY(producto_id) REFERENCES productos(id))''')
-    
-    def _get_connection(self) -> sqlite3.Connection:
-        """Obtiene una conexión a la base de datos"""
-        return sqlite3.connect(self.db_name)
-    
-    def add_or_update_product(self, nombre: str, cantidad: int, precio: float, margen_ganancia: float) -> int:
-        """Agrega o actualiza un producto en el inventario"""
-        with self._get_connection() as conn:
+        """Aplica las migraciones pendientes.
+
+        Con el esquema al día solo se lee user_version: el arranque habitual no ejecuta DDL
+        ni toma el bloqueo de escritura. El registro de cambios lo recorta el mantenimiento.
+        """
+        migrations.migrate(self._connections)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Obtiene la conexión persistente del hilo actual"""
+        return self._connections.connection()
+
+    @contextmanager
+    def transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """Agrupa varias operaciones en una sola transacción con un único commit"""
+        with self._connections.transaction(immediate) as conn:
+            yield conn
+
+    def close(self) -> None:
+        """Cierra las conexiones abiertas"""
+        self._connections.close()
+
+    def enable_instrumentation(self, slow_threshold: Optional[float] = None) -> None:
+        """Mide cada método público y cada sentencia SQL (histogramas y registro de consultas lentas)"""
+        if slow_threshold is not None:
+            self.instrumentation.slow_threshold = slow_threshold
+        self.instrumentation.enable(self, exclude=INSTRUMENTATION_METHODS)
+
+    def disable_instrumentation(self) -> None:
+        """Deja de medir; los contadores acumulados se conservan"""
+        self.instrumentation.disable()
+
+    def get_diagnostics(self) -> Diagnostics:
+        """Obtiene contadores, histogramas y consultas lentas acumulados"""
+        return self.instrumentation.snapshot()
+
+    def add_or_update_product(self, nombre: str, cantidad: int, precio: Cents, margen_ganancia: float) -> int:
+        """Agrega o actualiza un producto en el inventario (precio en centavos)"""
+        # Calcular costo basado en margen de ganancia (valida también el margen y que el precio sea en centavos)
+        costo = costing.unit_cost(precio, margen_ganancia)
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, cantidad FROM productos WHERE nombre = ?", (nombre,))
             producto = cursor.fetchone()
-            
+
             if producto:
                 product_id, old_cantidad = producto
                 nueva_cantidad = old_cantidad + cantidad
-                cursor.execute("UPDATE productos SET cantidad = ?, precio = ?, margen_ganancia = ? WHERE id = ?", 
+                cursor.execute("UPDATE productos SET cantidad = ?, precio = ?, margen_ganancia = ? WHERE id = ?",
                              (nueva_cantidad, precio, margen_ganancia, product_id))
             else:
-                cursor.execute("INSERT INTO productos (nombre, cantidad, precio, margen_ganancia) VALUES (?, ?, ?, ?)", 
-                             (nombre, cantidad, precio, margen_ganancia))
+                cursor.execute("""INSERT INTO productos (nombre, cantidad, precio, margen_ganancia, uid)
+                               VALUES (?, ?, ?, ?, lower(hex(randomblob(16))))""",
+                               (nombre, cantidad, precio, margen_ganancia))
                 product_id = cursor.lastrowid
-            
-            # Calcular costo basado en margen de ganancia y actualizar total_gastado
-            costo = precio / (1 + margen_ganancia/100)
-            total_gastado = cantidad * costo
-            cursor.execute("UPDATE totales SET total_gastado = total_gastado + ?", (total_gastado,))
+
+            ledger.record_stock_entries(cursor, [(nombre, cantidad, costo)])
+            return product_id
+
+    def update_product(self, product_id: int, nombre: str, cantidad: int, precio: Cents, margen_ganancia: float) -> None:
+        """Edita un producto; solo la diferencia de cantidad mueve stock y costo.
+
+        Más unidades entran como una compra al costo del precio y margen nuevos; menos unidades
+        salen de los lotes (a su costo según el método) sin registrarse como venta.
+        """
+        costo = costing.unit_cost(precio, margen_ganancia)
+        try:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT cantidad FROM productos WHERE id = ?", (product_id,))
+                if not (producto := cursor.fetchone()):
+                    raise ValueError("Producto no encontrado")
+                cursor.execute("UPDATE productos SET nombre = ?, precio = ?, margen_ganancia = ? WHERE id = ?",
+                               (nombre, precio, margen_ganancia, product_id))
+                diferencia = cantidad - producto[0]
+                if diferencia > 0:
+                    cursor.execute("UPDATE productos SET cantidad = ? WHERE id = ?", (cantidad, product_id))
+                    ledger.record_stock_entries(cursor, [(nombre, diferencia, costo)])
+                elif diferencia < 0:
+                    costing.withdraw_units(cursor, [(product_id, -diferencia)], self.settings.costing_method)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Ya existe un producto llamado {nombre}") from e
+
+    def save_product(self, product_id: Optional[int], nombre: str, cantidad: int, precio: Cents,
+                     margen_ganancia: float, codigo_barras: Optional[str] = None,
+                     stock_minimo: Optional[int] = None) -> int:
+        """Guarda un producto nuevo o editado (conserva su id y su historial) en un solo commit"""
+        with self.transaction():
+            if product_id:
+                self.update_product(product_id, nombre, cantidad, precio, margen_ganancia)
+                # En la edición el formulario trae el código vigente: vacío lo quita
+                self.set_barcode(product_id, codigo_barras)
+            else:
+                product_id = self.add_or_update_product(nombre, cantidad, precio, margen_ganancia)
+                if codigo_barras:
+                    self.set_barcode(product_id, codigo_barras)
+            if stock_minimo is not None:
+                self.set_stock_minimum(product_id, stock_minimo)
             return product_id
-    
+
+    def set_barcode(self, product_id: int, codigo_barras: Optional[str]) -> None:
+        """Asigna (o quita, con None) el código de barras de un producto"""
+        try:
+            with self.transaction() as conn:
+                conn.execute("UPDATE productos SET codigo_barras = ? WHERE id = ?", (codigo_barras or None, product_id))
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"El código de barras {codigo_barras} ya está asignado a otro producto") from e
+
+    def set_stock_minimum(self, product_id: int, stock_minimo: int) -> None:
+        """Asigna el stock mínimo de un producto (0 lo saca de las alertas)"""
+        if stock_minimo < 0:
+            raise ValueError("El stock mínimo no puede ser negativo")
+        with self.transaction() as conn:
+            conn.execute("UPDATE productos SET stock_minimo = ? WHERE id = ?", (stock_minimo, product_id))
+
+    def get_stock_minimum(self, product_id: int) -> int:
+        """Obtiene el stock mínimo de un producto"""
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT stock_minimo FROM productos WHERE id = ?", (product_id,))
+        if not (producto := cursor.fetchone()):
+            raise ValueError("Producto no encontrado")
+        return producto[0]
+
+    def get_low_stock(self, product_ids: Optional[Iterable[int]] = None) -> List[LowStockItem]:
+        """Obtiene los productos en alerta de stock bajo (todos o solo los indicados) sin recorrer productos"""
+        return stock_alerts.low_stock(self._connection().cursor(), product_ids)
+
+    def get_reorder_suggestions(self, dias: int = VELOCITY_DAYS, cobertura: int = COVER_DAYS) -> List[ReorderSuggestion]:
+        """Calcula la reposición sugerida de los productos en alerta según las ventas de los últimos días"""
+        return stock_alerts.reorder_suggestions(self._connection().cursor(), dias, cobertura)
+
+    def preview_bulk(self, tipo: str, valor: float, filtro: ProductFilter = ProductFilter(),
+                     limit: int = bulk_ops.PREVIEW_ROWS) -> BulkPreview:
+        """Muestra qué productos cambiaría una operación masiva y cómo, sin modificar nada"""
+        return bulk_ops.preview(self._connection().cursor(), tipo, valor, filtro, limit)
+
+    def apply_bulk(self, tipo: str, valor: float, filtro: ProductFilter = ProductFilter()) -> BulkResult:
+        """Aplica una operación masiva (bulk_ops.OPERATIONS) a los productos filtrados en una transacción"""
+        with self.transaction() as conn:
+            return bulk_ops.apply(conn.cursor(), tipo, valor, filtro, self.settings.costing_method)
+
+    def undo_bulk(self, operacion_id: Optional[int] = None) -> BulkResult:
+        """Deshace una operación masiva (por defecto, la última sin deshacer)"""
+        with self.transaction() as conn:
+            return bulk_ops.undo(conn.cursor(), operacion_id, self.settings.costing_method)
+
+    def get_bulk_history(self, limit: int = bulk_ops.HISTORY) -> List[BulkOperation]:
+        """Obtiene las operaciones masivas registradas, las más recientes primero"""
+        return bulk_ops.history(self._connection().cursor(), limit)
+
+    def get_barcode_entries(self, product_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, str, str, Cents]]:
+        """Obtiene (producto_id, código, nombre, precio) de los productos con código, opcionalmente filtrados"""
+        where, params = "", ()
+        if product_ids is not None:
+            where, params = "AND id IN (SELECT value FROM json_each(?))", (json.dumps(list(product_ids)),)
+        cursor = self._connection().cursor()
+        cursor.execute(f"""SELECT id, codigo_barras, nombre, precio FROM productos
+                        WHERE codigo_barras IS NOT NULL {where}""", params)
+        return cursor.fetchall()
+
+    def find_barcodes(self, codes: Iterable[str]) -> List[Tuple[int, str, str, Cents]]:
+        """Busca productos por código de barras usando el índice único"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT id, codigo_barras, nombre, precio FROM productos
+                       WHERE codigo_barras IN (SELECT value FROM json_each(?))""", (json.dumps(list(codes)),))
+        return cursor.fetchall()
+
+    def bulk_upsert_products(self, rows: Iterable[Tuple[str, int, Cents, float]]) -> int:
+        """Agrega o actualiza un lote de productos (nombre, cantidad, precio en centavos, margen) en una transacción"""
+        rows = list(rows)
+        # Mismo costo que add_or_update_product; los resúmenes se actualizan una sola vez por lote
+        entries = [(nombre, cantidad, costing.unit_cost(precio, margen_ganancia))
+                   for nombre, cantidad, precio, margen_ganancia in rows]
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""INSERT INTO productos (nombre, cantidad, precio, margen_ganancia, uid)
+                               VALUES (?, ?, ?, ?, lower(hex(randomblob(16))))
+                               ON CONFLICT(nombre) DO UPDATE SET
+                                   cantidad = cantidad + excluded.cantidad,
+                                   precio = excluded.precio,
+                                   margen_ganancia = excluded.margen_ganancia""", rows)
+            ledger.record_stock_entries(cursor, entries)
+        return len(rows)
+
+    def iter_products(self, batch_size: int = 1000) -> Iterator[Tuple[int, str, int, Cents, float]]:
+        """Recorre todos los productos por lotes sin cargarlos en memoria"""
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT id, nombre, cantidad, precio, margen_ganancia FROM productos ORDER BY id")
+        while batch := cursor.fetchmany(batch_size):
+            yield from batch
+
+    def delete_product(self, product_id: int) -> None:
+        """Elimina un producto del inventario"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM productos WHERE id = ?", (product_id,))
+
     def get_product_id(self, nombre: str) -> int:
         """Obtiene el ID de un producto por su nombre"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM productos WHERE nombre = ?", (nombre,))
-            result = cursor.fetchone()
-            if not result:
-                raise ValueError("Producto no encontrado")
-            return result[0]
-    
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT id FROM productos WHERE nombre = ?", (nombre,))
+        result = cursor.fetchone()
+        if not result:
+            raise ValueError("Producto no encontrado")
+        return result[0]
+
+    def get_product_price(self, product_id: int) -> Cents:
+        """Obtiene el precio de venta actual de un producto (centavos)"""
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT precio FROM productos WHERE id = ?", (product_id,))
+        result = cursor.fetchone()
+        if not result:
+            raise ValueError("Producto no encontrado")
+        return result[0]
+
     def add_to_current_sales(self, product_id: int, cantidad: int = 1) -> None:
         """Agrega un producto a las ventas actuales"""
-        with self._get_connection() as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT precio FROM productos WHERE id = ?", (product_id,))
-            precio = cursor.fetchone()[0]
-            subtotal = precio * cantidad
-            
-            cursor.execute("SELECT cantidad FROM ventas_actuales WHERE producto_id = ?", (product_id,))
-            if existing := cursor.fetchone():
-                nueva_cantidad = existing[0] + cantidad
-                nuevo_subtotal = nueva_cantidad * precio
-                cursor.execute("UPDATE ventas_actuales SET cantidad = ?, subtotal = ? WHERE producto_id = ?",
-                             (nueva_cantidad, nuevo_subtotal, product_id))
-            else:
-                cursor.execute("INSERT INTO ventas_actuales (producto_id, cantidad, precio_unitario, subtotal) VALUES (?, ?, ?, ?)",
-                             (product_id, cantidad, precio, subtotal))
-    
-    def process_sale(self) -> float:
-        """Procesa todas las ventas actuales y devuelve el total"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT producto_id, cantidad FROM ventas_actuales")
-            current_sales = cursor.fetchall()
-            total_venta = 0.0
-            
-            for producto_id, cantidad in current_sales:
-                cursor.execute("SELECT cantidad FROM productos WHERE id = ?", (producto_id,))
-                stock = cursor.fetchone()[0]
-                if stock < cantidad:
-                    raise ValueError(f"Stock insuficiente para producto ID {producto_id}")
-                
-                cursor.execute("UPDATE productos SET cantidad = cantidad - ? WHERE id = ?", (cantidad, producto_id))
-                cursor.execute("SELECT subtotal FROM ventas_actuales WHERE producto_id = ?", (producto_id,))
-                subtotal = cursor.fetchone()[0]
-                total_venta += subtotal
-            
-            cursor.execute("UPDATE totales SET total_ventas = total_ventas + ?", (total_venta,))
-            cursor.execute("DELETE FROM ventas_actuales")
-            return total_venta
-    
-    def get_totals(self) -> Tuple[float, float]:
-        """Obtiene los totales de ventas y gastos"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT total_ventas, total_gastado FROM totales")
-            return cursor.fetchone()
-    
-    def get_all_products(self) -> List[Tuple[int, str, int, float, float]]:
+            # Una línea por producto (índice único): inserta o acumula con el precio de la línea
+            cursor.execute("""INSERT INTO ventas_actuales (producto_id, cantidad, precio_unitario, subtotal)
+                           SELECT id, ?, precio, precio * ? FROM productos WHERE id = ?
+                           ON CONFLICT(producto_id) DO UPDATE SET
+                               cantidad = cantidad + excluded.cantidad,
+                               subtotal = (cantidad + excluded.cantidad) * precio_unitario""",
+                           (cantidad, cantidad, product_id))
+            if cursor.rowcount == 0:
+                raise ValueError("Producto no encontrado")
+
+    def process_sale(self) -> Cents:
+        """Procesa todas las ventas actuales y devuelve el total (centavos)"""
+        return self._checkout.checkout()
+
+    def process_cart(self, lines: Iterable[Tuple[int, int, Cents]], ref: Optional[str] = None) -> Cents:
+        """Cobra un carrito en memoria (producto_id, cantidad, precio unitario) en una sola transacción"""
+        return self._checkout.checkout_lines(lines, ref)
+
+    def process_cart_record(self, lines: Iterable[Tuple[int, int, Cents]],
+                            ref: Optional[str] = None) -> Optional[SaleRecord]:
+        """Cobra un carrito como process_cart y devuelve la venta en forma compacta para su recibo"""
+        record = self._checkout.checkout_record(lines, ref)
+        return record._replace(iva_percent=self.settings.iva_percent) if record is not None else None
+
+    def get_sale_record(self, venta_id: int) -> Optional[SaleRecord]:
+        """Obtiene una venta confirmada en forma compacta (con el IVA vigente)"""
+        records = ledger.sale_records(self._connection().cursor(), "v.id = ?", (venta_id,))
+        return records[0]._replace(iva_percent=self.settings.iva_percent) if records else None
+
+    def get_sale_records(self, desde: str, hasta: str) -> List[SaleRecord]:
+        """Obtiene las ventas entre dos fechas AAAA-MM-DD inclusive en forma compacta (con el IVA vigente)"""
+        records = ledger.sale_records(self._connection().cursor(), "v.fecha >= ? AND v.fecha < date(?, '+1 day')",
+                                      (desde, hasta))
+        iva_percent = self.settings.iva_percent
+        return [record._replace(iva_percent=iva_percent) for record in records]
+
+    def sale_exists(self, ref: str) -> bool:
+        """Indica si ya se confirmó una venta con esa referencia"""
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM ventas WHERE ref = ?)", (ref,))
+        return bool(cursor.fetchone()[0])
+
+    def get_totals(self) -> Totals:
+        """Obtiene ventas, compras y costo de lo vendido desde el resumen diario y el valor del stock acumulado"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT COALESCE(SUM(total_ventas), 0), COALESCE(SUM(total_gastado), 0),
+                                 COALESCE(SUM(costo_ventas), 0),
+                                 (SELECT valor_stock FROM resumen_inventario)
+                          FROM resumen_diario""")
+        return Totals(*cursor.fetchone())
+
+    def get_ledger_mark(self) -> Tuple[int, int]:
+        """Marca de agua del libro: última línea de venta y última entrada de stock"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT (SELECT COALESCE(MAX(id), 0) FROM venta_lineas),
+                                 (SELECT COALESCE(MAX(id), 0) FROM entradas_stock)""")
+        return cursor.fetchone()
+
+    def restrict_to_reads(self) -> None:
+        """Deja la conexión del hilo actual en solo lectura (lectores del servicio POS)"""
+        self._connections.restrict_to_reads()
+
+    def query(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        """Ejecuta una consulta de solo lectura y devuelve el cursor para leerlo por lotes"""
+        cursor = self._connection().cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def iter_report_lines(self, referencia: str, desde: str, hasta: str,
+                          batch_size: int = 50000) -> Iterator[Tuple[int, int, int, Cents, Cents, float]]:
+        """Recorre por lotes las líneas vendidas entre `desde` y `hasta` (inclusive):
+        (id de línea, producto_id, cantidad, subtotal, costo, día relativo a `referencia`)"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT l.id, l.producto_id, l.cantidad, l.subtotal, l.costo,
+                                 julianday(substr(v.fecha, 1, 10)) - julianday(?)
+                          FROM ventas v JOIN venta_lineas l ON l.venta_id = v.id
+                          WHERE v.fecha >= ? AND v.fecha < date(?, '+1 day')""", (referencia, desde, hasta))
+        while batch := cursor.fetchmany(batch_size):
+            yield from batch
+
+    def get_daily_summary(self, desde: str, hasta: str) -> List[Tuple[str, int, Cents, Cents]]:
+        """Obtiene (día, número de ventas, total ventas, total gastado) entre dos fechas AAAA-MM-DD"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT dia, num_ventas, total_ventas, total_gastado FROM resumen_diario
+                       WHERE dia BETWEEN ? AND ? ORDER BY dia""", (desde, hasta))
+        return cursor.fetchall()
+
+    def get_sales(self, desde: str, hasta: str) -> List[Tuple[int, str, Cents]]:
+        """Obtiene las ventas (id, fecha, total) entre dos fechas AAAA-MM-DD inclusive"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT id, fecha, total FROM ventas
+                       WHERE fecha >= ? AND fecha < date(?, '+1 day') ORDER BY fecha, id""", (desde, hasta))
+        return cursor.fetchall()
+
+    def get_sale_lines(self, venta_id: int) -> List[Tuple[int, str, int, Cents, Cents]]:
+        """Obtiene las líneas (producto_id, nombre, cantidad, precio, subtotal) de una venta"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT l.producto_id, p.nombre, l.cantidad, l.precio_unitario, l.subtotal
+                       FROM venta_lineas l
+                       LEFT JOIN productos p ON p.id = l.producto_id
+                       WHERE l.venta_id = ? ORDER BY l.id""", (venta_id,))
+        return cursor.fetchall()
+
+    def get_stock_entries(self, desde: str, hasta: str) -> List[Tuple[int, str, int, str, int, Cents, Cents]]:
+        """Obtiene las entradas de stock (id, fecha, producto_id, nombre, cantidad, costo unitario, costo total)"""
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT e.id, e.fecha, e.producto_id, p.nombre, e.cantidad, e.costo_unitario, e.costo_total
+                       FROM entradas_stock e
+                       LEFT JOIN productos p ON p.id = e.producto_id
+                       WHERE e.fecha >= ? AND e.fecha < date(?, '+1 day') ORDER BY e.fecha, e.id""", (desde, hasta))
+        return cursor.fetchall()
+
+    def get_all_products(self) -> List[Tuple[int, str, int, Cents, float]]:
         """Obtiene todos los productos del inventario"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, nombre, cantidad, precio, margen_ganancia FROM productos")
-            return cursor.fetchall()
-    
-    def get_current_sales(self) -> List[Tuple[str, int, float, float]]:
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT id, nombre, cantidad, precio, margen_ganancia FROM productos")
+        return cursor.fetchall()
+
+    def get_products_page(self, sort_key: str = "id", after: Optional[Tuple] = None, limit: int = 100,
+                          descending: bool = False, inclusive: bool = False) -> List[Tuple[int, str, int, Cents, float]]:
+        """Obtiene una página de productos por paginación de clave (valor de orden, id)"""
+        column = PRODUCT_SORT_KEYS[sort_key]
+        direction = "DESC" if descending else "ASC"
+        operator = ("<" if descending else ">") + ("=" if inclusive else "")
+        where, params = "", []
+        if after is not None:
+            if column == "id":
+                where, params = f"WHERE id {operator} ?", [after[-1]]
+            else:
+                where, params = f"WHERE ({column}, id) {operator} (?, ?)", list(after)
+        cursor = self._connection().cursor()
+        cursor.execute(f"""SELECT id, nombre, cantidad, precio, margen_ganancia FROM productos
+                       {where} ORDER BY {column} {direction}, id {direction} LIMIT ?""", (*params, limit))
+        return cursor.fetchall()
+
+    def get_product_key_at(self, sort_key: str, offset: int, descending: bool = False) -> Optional[Tuple]:
+        """Obtiene la clave (valor de orden, id) de la fila en la posición indicada"""
+        column = PRODUCT_SORT_KEYS[sort_key]
+        direction = "DESC" if descending else "ASC"
+        cursor = self._connection().cursor()
+        cursor.execute(f"SELECT {column}, id FROM productos ORDER BY {column} {direction}, id {direction} LIMIT 1 OFFSET ?",
+                       (max(offset, 0),))
+        return cursor.fetchone()
+
+    def count_products(self) -> int:
+        """Cuenta los productos del inventario"""
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT COUNT(*) FROM productos")
+        return cursor.fetchone()[0]
+
+    def get_products_by_ids(self, product_ids: Iterable[int]) -> List[Tuple[int, str, int, Cents, float]]:
+        """Obtiene los productos con los IDs indicados"""
+        ids = list(product_ids)
+        cursor = self._connection().cursor()
+        cursor.execute(f"""SELECT id, nombre, cantidad, precio, margen_ganancia FROM productos
+                       WHERE id IN (SELECT value FROM json_each(?))""", (json.dumps(ids),))
+        return cursor.fetchall()
+
+    def search_products(self, query: str, limit: int = 10) -> List[Tuple[int, str, int, Cents, float]]:
+        """Busca productos por nombre: primero por prefijo, luego por subcadena y luego por similitud"""
+        query = query.strip()
+        if not query:
+            return []
+        cursor = self._connection().cursor()
+        columns = "p.id, p.nombre, p.cantidad, p.precio, p.margen_ganancia"
+        # 1. Prefijo, sin distinguir mayúsculas, por rango sobre idx_productos_nombre_nocase
+        cursor.execute(f"""SELECT {columns} FROM productos p
+                       WHERE p.nombre >= ? COLLATE NOCASE AND p.nombre < ? COLLATE NOCASE
+                       ORDER BY p.nombre COLLATE NOCASE LIMIT ?""", (query, query + "\U0010ffff", limit))
+        results = cursor.fetchall()
+        if len(results) >= limit or len(query) < 3:
+            return results
+
+        # 2. Subcadena y 3. similitud. Los candidatos salen del índice trigram sin ordenar por rank
+        # (ordenar por bm25 obliga a puntuar todas las coincidencias) y se ordenan aquí
+        seen = {row[0] for row in results}
+        for match, key in ((_fts_phrase(query), lambda row: row[1].lower().find(query.lower())),
+                           (_fts_fuzzy(query), lambda row: -_similarity(query, row[1]))):
+            cursor.execute(f"""SELECT {columns} FROM productos_fts f
+                           JOIN productos p ON p.id = f.rowid
+                           WHERE productos_fts MATCH ? LIMIT ?""", (match, SEARCH_CANDIDATES * limit))
+            candidates = [row for row in cursor.fetchall() if row[0] not in seen]
+            for row in sorted(candidates, key=key)[:limit - len(results)]:
+                seen.add(row[0])
+                results.append(row)
+            if len(results) >= limit:
+                break
+        return results
+
+    def get_current_sales(self) -> List[Tuple[str, int, Cents, Cents]]:
         """Obtiene los productos en venta actuales con nombres"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""SELECT p.nombre, v.cantidad, v.precio_unitario, v.subtotal
-                           FROM ventas_actuales v
-                           JOIN productos p ON v.producto_id = p.id""")
-            return cursor.fetchall()
-    
+        cursor = self._connection().cursor()
+        cursor.execute("""SELECT p.nombre, v.cantidad, v.precio_unitario, v.subtotal
+                       FROM ventas_actuales v
+                       JOIN productos p ON v.producto_id = p.id""")
+        return cursor.fetchall()
+
+    def get_current_sales_lines(self, product_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, str, int, Cents, Cents]]:
+        """Obtiene las líneas del carrito (producto_id, nombre, cantidad, precio, subtotal), opcionalmente filtradas"""
+        where, params = "", ()
+        if product_ids is not None:
+            where, params = "WHERE v.producto_id IN (SELECT value FROM json_each(?))", (json.dumps(list(product_ids)),)
+        cursor = self._connection().cursor()
+        cursor.execute(f"""SELECT v.producto_id, p.nombre, SUM(v.cantidad), v.precio_unitario, SUM(v.subtotal)
+                       FROM ventas_actuales v
+                       JOIN productos p ON v.producto_id = p.id
+                       {where}
+                       GROUP BY v.producto_id""", params)
+        return cursor.fetchall()
+
+    def get_change_token(self) -> int:
+        """Obtiene el token de versión actual del registro de cambios"""
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM cambios")
+        return cursor.fetchone()[0]
+
+    def get_changes(self, since: int) -> ChangeSet:
+        """Obtiene los productos y líneas del carrito modificados desde el token indicado"""
+        cursor = self._connection().cursor()
+        cursor.execute("SELECT MIN(seq) FROM cambios")
+        oldest = cursor.fetchone()[0]
+        productos: Set[int] = set()
+        ventas: Set[int] = set()
+        delta = 0
+        token = since
+        cursor.execute("SELECT seq, tabla, fila_id, op FROM cambios WHERE seq > ? ORDER BY seq", (since,))
+        for seq, tabla, fila_id, op in cursor:
+            token = seq
+            if tabla == "productos":
+                productos.add(fila_id)
+                delta += (op == "I") - (op == "D")
+            else:
+                ventas.add(fila_id)
+        reset = oldest is not None and since < oldest - 1
+        return ChangeSet(token, reset, productos, ventas, delta)
+
+    def data_version(self) -> int:
+        """Obtiene PRAGMA data_version: cambia cuando otra conexión confirma escrituras"""
+        cursor = self._connection().cursor()
+        cursor.execute("PRAGMA data_version")
+        return cursor.fetchone()[0]
+
     def clear_current_sales(self) -> None:
         """Limpia las ventas actuales"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM ventas_actuales")
-    
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM ventas_actuales")
+
     def get_iva_percent(self) -> float:
-        """Obtiene el porcentaje de IVA desde la base de datos"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT valor FROM configuraciones WHERE clave = 'iva_percent'")
-            return float(cursor.fetchone()[0])
-    
+        """Obtiene el porcentaje de IVA (desde la caché de configuraciones)"""
+        return self.settings.iva_percent
+
     def update_iva_percent(self, new_value: float) -> None:
         """Actualiza el porcentaje de IVA en la base de datos"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE configuraciones SET valor = ? WHERE clave = 'iva_percent'", (str(new_value),))
\ No newline at end of file
+        self.settings.set("iva_percent", new_value)
+
+    def get_costing_method(self) -> str:
+        """Obtiene el método de costeo de lo vendido (costing.AVERAGE o costing.FIFO)"""
+        return self.settings.costing_method
+
+    def set_costing_method(self, method: str) -> None:
+        """Cambia el método de costeo; al pasar a FIFO el stock se valúa con sus lotes abiertos"""
+        if method not in costing.COSTING_METHODS:
+            raise ValueError(f"Método de costeo desconocido: {method}")
+        with self.transaction() as conn:
+            if method == costing.FIFO and self.settings.costing_method != costing.FIFO:
+                costing.revalue_from_lots(conn.cursor())
+            self.settings.set("metodo_costo", method)
+
+    def get_store_id(self) -> str:
+        """Obtiene el identificador de esta tienda para la replicación"""
+        return replication.store_id(self._connection())
+
+    def export_changes(self, destino: str, directory: str, desde: Optional[int] = None) -> Optional[Bundle]:
+        """Exporta a `directory` el paquete de cambios pendientes para la tienda `destino`"""
+        return replication.export_bundle(self._connections, destino, directory, desde)
+
+    def import_changes(self, paths: Optional[Iterable[str]] = None, directory: Optional[str] = None,
+                       force: bool = False) -> List[ImportResult]:
+        """Importa los paquetes indicados o, con `directory`, los dirigidos a esta tienda"""
+        if paths is None:
+            return replication.import_directory(self._connections, directory)
+        return [replication.import_bundle(self._connections, path, force) for path in paths]
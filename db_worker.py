@@ -0,0 +1,122 @@
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+# Intervalo de sondeo de resultados mientras hay solicitudes pendientes
+POLL_MS = 15
+
+_STOP = object()
+
+
+class DatabaseWorker:
+    """Ejecuta las llamadas a la base de datos en un hilo dedicado fuera del hilo de Tk"""
+
+    def __init__(self, root, on_busy: Optional[Callable[[bool], None]] = None,
+                 on_error: Optional[Callable[[BaseException], None]] = None):
+        self.root = root
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self._requests: "queue.Queue" = queue.Queue()
+        self._results: "queue.Queue" = queue.Queue()
+        self._latest: Dict[str, Future] = {}
+        self._pending = 0
+        self._polling = False
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args, on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               key: Optional[str] = None, **kwargs) -> Future:
+        """Encola fn(*args); on_done/on_error se ejecutan luego en el hilo de Tk.
+
+        Con key, una solicitud nueva reemplaza a la anterior de la misma clave:
+        la anterior se cancela si no empezó y su resultado se descarta si ya corrió.
+        """
+        future: Future = Future()
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest[key] = future
+        self._set_pending(self._pending + 1)
+        self._requests.put((future, fn, args, kwargs, on_done, on_error, key))
+        self._ensure_polling()
+        return future
+
+    def call_soon(self, fn: Callable, *args) -> None:
+        """Programa fn(*args) en el hilo de Tk; se puede llamar desde el hilo de trabajo"""
+        self._results.put((None, fn, args, None, None))
+
+    def _run(self) -> None:
+        while True:
+            request = self._requests.get()
+            if request is _STOP:
+                break
+            future, fn, args, kwargs, on_done, on_error, key = request
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            self._results.put((future, None, None, (on_done, on_error), key))
+
+    def _ensure_polling(self) -> None:
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _poll(self) -> None:
+        """Aplica en el hilo de Tk los resultados terminados.
+
+        Un callback que falla se informa con report_callback_exception de Tk y no corta el sondeo:
+        los resultados siguientes se siguen entregando.
+        """
+        try:
+            while True:
+                try:
+                    future, fn, args, callbacks, key = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._deliver(future, fn, args, callbacks, key)
+                except Exception:
+                    self.root.report_callback_exception(*sys.exc_info())
+        finally:
+            if self._pending > 0 or not self._results.empty():
+                self.root.after(POLL_MS, self._poll)
+            else:
+                self._polling = False
+
+    def _deliver(self, future: Optional[Future], fn: Optional[Callable], args, callbacks, key: Optional[str]) -> None:
+        if future is None:
+            fn(*args)
+            return
+        self._set_pending(self._pending - 1)
+        if key is not None:
+            if self._latest.get(key) is not future:
+                return  # reemplazada por una solicitud más nueva
+            del self._latest[key]
+        if future.cancelled():
+            return
+        on_done, on_error = callbacks
+        error = future.exception()
+        if error is not None:
+            handler = on_error or self.on_error
+            if handler is None:
+                raise error
+            handler(error)
+        elif on_done is not None:
+            on_done(future.result())
+
+    def _set_pending(self, pending: int) -> None:
+        was_busy = self._pending > 0
+        self._pending = pending
+        if self.on_busy and was_busy != (pending > 0):
+            self.on_busy(pending > 0)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Termina las solicitudes en curso y detiene el hilo"""
+        self._requests.put(_STOP)
+        self._thread.join(timeout)
@@ -0,0 +1,177 @@
+import tkinter as tk
+from tkinter import messagebox
+import ttkbootstrap as tb
+from instrumentation import Diagnostics, format_ms
+
+STAT_COLUMNS = [
+    ("nombre", "Nombre", 420),
+    ("llamadas", "Llamadas", 80),
+    ("total", "Total (ms)", 90),
+    ("p50", "p50 (ms)", 80),
+    ("p99", "p99 (ms)", 80),
+    ("max", "Máx. (ms)", 80),
+]
+SLOW_COLUMNS = [
+    ("fecha", "Fecha", 140),
+    ("segundos", "Duración (ms)", 100),
+    ("sql", "Sentencia", 400),
+    ("plan", "Plan de consulta", 300),
+]
+STARTUP_COLUMNS = [
+    ("fase", "Fase", 300),
+    ("desde", "Desde el inicio (ms)", 140),
+    ("duracion", "Duración (ms)", 120),
+]
+MAINTENANCE_COLUMNS = [
+    ("tarea", "Tarea", 120),
+    ("ultima", "Última", 140),
+    ("duracion", "Duración (ms)", 100),
+    ("proxima", "Próxima (min)", 100),
+    ("detalle", "Resultado", 440),
+]
+RECEIPT_COLUMNS = [
+    ("nombre", "Recibos", 300),
+    ("valor", "Valor", 300),
+]
+
+
+def _tree(parent, columns) -> tb.Treeview:
+    tree = tb.Treeview(parent, columns=[c for c, _t, _w in columns], show="headings", bootstyle="info")
+    for col, text, width in columns:
+        tree.heading(col, text=text)
+        tree.column(col, width=width, anchor="w" if col in ("nombre", "sql", "plan", "fase", "detalle") else "center")
+    tree.pack(fill=tk.BOTH, expand=True)
+    return tree
+
+
+class DiagnosticsWindow(tb.Toplevel):
+    """Latencias por método y por sentencia SQL, consultas lentas, tiempos de arranque, mantenimiento y recibos"""
+
+    def __init__(self, parent, db, worker, startup=None, maintenance=None, receipts=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.maintenance = maintenance
+        self.receipts = receipts
+        self.title("Diagnóstico de la base de datos")
+        self.geometry("1000x550")
+
+        controls = tb.Frame(self, padding=10)
+        controls.pack(fill=tk.X)
+        self.enabled = tk.BooleanVar(value=db.instrumentation.enabled)
+        tb.Checkbutton(controls, text="Medición activa", variable=self.enabled,
+                       command=self._toggle, bootstyle="round-toggle").pack(side=tk.LEFT, padx=5)
+        tb.Label(controls, text="Umbral consultas lentas (ms):").pack(side=tk.LEFT, padx=(15, 5))
+        self.threshold = tb.Entry(controls, width=8)
+        self.threshold.insert(0, format_ms(db.instrumentation.slow_threshold))
+        self.threshold.pack(side=tk.LEFT)
+        tb.Button(controls, text="Actualizar", bootstyle="info", command=self.load).pack(side=tk.RIGHT, padx=5)
+        tb.Button(controls, text="Reiniciar", bootstyle="secondary", command=self._reset).pack(side=tk.RIGHT, padx=5)
+
+        notebook = tb.Notebook(self)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        tabs = {}
+        for key, text in (("methods", "Métodos"), ("statements", "Sentencias SQL"), ("slow", "Consultas lentas")):
+            tabs[key] = tb.Frame(notebook)
+            notebook.add(tabs[key], text=text)
+        self.methods_tree = _tree(tabs["methods"], STAT_COLUMNS)
+        self.statements_tree = _tree(tabs["statements"], STAT_COLUMNS)
+        self.slow_tree = _tree(tabs["slow"], SLOW_COLUMNS)
+        if startup is not None:
+            # Desglose del arranque de la aplicación (startup.StartupTimer)
+            frame = tb.Frame(notebook)
+            notebook.add(frame, text="Inicio")
+            startup_tree = _tree(frame, STARTUP_COLUMNS)
+            for phase, at, duration in startup.phases():
+                startup_tree.insert("", tk.END, values=(phase, format_ms(at), format_ms(duration)))
+        self.maintenance_tree = None
+        if maintenance is not None:
+            # Respaldos, archivo, compactación, optimización y registro de cambios (maintenance.MaintenanceService)
+            frame = tb.Frame(notebook)
+            notebook.add(frame, text="Mantenimiento")
+            buttons = tb.Frame(frame, padding=(0, 5))
+            buttons.pack(fill=tk.X)
+            tb.Button(buttons, text="Ejecutar ahora", bootstyle="warning",
+                      command=self._run_maintenance).pack(side=tk.LEFT)
+            tb.Label(buttons, text=f"Respaldos en {maintenance.backups}").pack(side=tk.LEFT, padx=10)
+            self.maintenance_tree = _tree(frame, MAINTENANCE_COLUMNS)
+        self.receipts_tree = None
+        if receipts is not None:
+            # Cola de recibos (receipts.ReceiptSpooler)
+            frame = tb.Frame(notebook)
+            notebook.add(frame, text="Recibos")
+            tb.Label(frame, text=f"Cola de impresión en {receipts.spool}", padding=(0, 5)).pack(fill=tk.X)
+            self.receipts_tree = _tree(frame, RECEIPT_COLUMNS)
+        self.load()
+
+    def _toggle(self) -> None:
+        if self.enabled.get():
+            try:
+                threshold = float(self.threshold.get()) / 1000
+            except ValueError:
+                messagebox.showerror("Error", "Umbral inválido", parent=self)
+                self.enabled.set(False)
+                return
+            self.db.enable_instrumentation(threshold)
+        else:
+            self.db.disable_instrumentation()
+        self.load()
+
+    def _reset(self) -> None:
+        self.db.instrumentation.reset()
+        self.load()
+
+    def load(self) -> None:
+        """Lee los contadores (copia en memoria, sin consultar la base)"""
+        self.worker.submit(self.db.get_diagnostics, on_done=self._show, key="diagnostics")
+        if self.maintenance_tree is not None:
+            self._show_maintenance()
+        if self.receipts_tree is not None:
+            self._show_receipts()
+
+    def _show_maintenance(self) -> None:
+        """Estado de las tareas de mantenimiento (en memoria)"""
+        self.maintenance_tree.delete(*self.maintenance_tree.get_children())
+        current, running = self.maintenance.current(), self.maintenance.running()
+        for status in self.maintenance.status():
+            detail = ("Error: " if status.error else "") + status.detalle
+            if status.tarea == current:
+                detail = f"En curso: {running}"
+            self.maintenance_tree.insert("", tk.END, iid=status.tarea, values=(
+                status.tarea, status.ultima or "-", format_ms(status.segundos) if status.ultima else "-",
+                f"{status.proxima / 60:.0f}", detail))
+
+    def _show_receipts(self) -> None:
+        """Contadores y latencias de la cola de recibos (en memoria)"""
+        stats = self.receipts.stats()
+        self.receipts_tree.delete(*self.receipts_tree.get_children())
+        for name, value in (
+            ("Encolados", stats.encolados),
+            ("Emitidos", stats.emitidos),
+            ("Rezagados (cola llena)", stats.rezagados),
+            ("Pendientes ahora / máximo", f"{stats.pendientes} / {stats.pendientes_max}"),
+            ("Render p50 / p99 (ms)", f"{format_ms(stats.render_p50)} / {format_ms(stats.render_p99)}"),
+            ("Espera desde el cobro p99 (ms)", format_ms(stats.espera_p99)),
+            ("Errores", stats.errores),
+            ("Último error", stats.ultimo_error or "-"),
+        ):
+            self.receipts_tree.insert("", tk.END, values=(name, value))
+
+    def _run_maintenance(self) -> None:
+        if not (selected := self.maintenance_tree.selection()):
+            messagebox.showwarning("Mantenimiento", "Seleccione una tarea", parent=self)
+            return
+        self.maintenance.run_now(selected[0])
+        self.after(1000, self._show_maintenance)
+
+    def _show(self, diagnostics: Diagnostics) -> None:
+        if not self.winfo_exists():
+            return
+        for tree, stats in ((self.methods_tree, diagnostics.methods), (self.statements_tree, diagnostics.statements)):
+            tree.delete(*tree.get_children())
+            for s in stats:
+                tree.insert("", tk.END, values=(s.nombre, s.llamadas, format_ms(s.total), format_ms(s.p50),
+                                                format_ms(s.p99), format_ms(s.max)))
+        self.slow_tree.delete(*self.slow_tree.get_children())
+        for q in diagnostics.slow_queries:
+            self.slow_tree.insert("", tk.END, values=(q.fecha, format_ms(q.segundos), q.sql, q.plan.replace("\n", " | ")))
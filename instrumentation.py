@@ -0,0 +1,222 @@
+import functools
+import inspect
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+# Umbral por defecto del registro de consultas lentas (segundos)
+SLOW_QUERY_THRESHOLD = 0.05
+SLOW_QUERY_LOG_SIZE = 200
+
+# Sentencias que no tienen plan de consulta
+_NO_PLAN = re.compile(r"^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA|CREATE|DROP|ALTER|EXPLAIN)\b", re.I)
+_SPACES = re.compile(r"\s+")
+
+
+class Histogram:
+    """Histograma de latencias con cubetas logarítmicas (potencias de 2 en microsegundos)"""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: List[int] = [0] * 40
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), 39)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Cota superior (segundos) de la cubeta que contiene el percentil"""
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+
+class Stat(NamedTuple):
+    """Resumen de un método o sentencia"""
+    nombre: str
+    llamadas: int
+    total: float
+    p50: float
+    p99: float
+    max: float
+
+
+class SlowQuery(NamedTuple):
+    """Sentencia que superó el umbral, con su plan de ejecución"""
+    fecha: str
+    segundos: float
+    sql: str
+    plan: str
+
+
+class Diagnostics(NamedTuple):
+    enabled: bool
+    slow_threshold: float
+    methods: List[Stat]
+    statements: List[Stat]
+    slow_queries: List[SlowQuery]
+
+
+def _normalize(sql: str) -> str:
+    return _SPACES.sub(" ", sql).strip()[:300]
+
+
+def _summary(name: str, histogram: Histogram) -> Stat:
+    return Stat(name, histogram.count, histogram.total, histogram.percentile(0.50),
+                histogram.percentile(0.99), histogram.max)
+
+
+class Instrumentation:
+    """Contadores e histogramas en memoria de métodos y sentencias SQL.
+
+    Desactivada no envuelve ningún método y las sentencias solo consultan `enabled`.
+    """
+
+    def __init__(self, slow_threshold: float = SLOW_QUERY_THRESHOLD):
+        self.enabled = False
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._methods: Dict[str, Histogram] = {}
+        self._statements: Dict[str, Histogram] = {}
+        self._slow: Deque[SlowQuery] = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._targets: List[Tuple[Any, List[str]]] = []
+
+    # Activación
+
+    def enable(self, *targets: Any, exclude: Tuple[str, ...] = ()) -> None:
+        """Activa la medición y envuelve los métodos públicos de los objetos indicados"""
+        with self._lock:
+            if self.enabled:
+                return
+            for target in targets:
+                self._targets.append((target, self._wrap_methods(target, exclude)))
+            self.enabled = True
+
+    def disable(self) -> None:
+        """Desactiva la medición y restaura los métodos originales"""
+        with self._lock:
+            self.enabled = False
+            for target, names in self._targets:
+                for name in names:
+                    target.__dict__.pop(name, None)
+            self._targets = []
+
+    def reset(self) -> None:
+        with self._lock:
+            self._methods.clear()
+            self._statements.clear()
+            self._slow.clear()
+
+    def _wrap_methods(self, target: Any, exclude: Tuple[str, ...]) -> List[str]:
+        """Envuelve en la instancia los métodos públicos que no son generadores ni contextos"""
+        wrapped = []
+        for name, function in inspect.getmembers(type(target), inspect.isfunction):
+            if name.startswith("_") or name in exclude or inspect.isgeneratorfunction(function) or hasattr(function, "__wrapped__"):
+                continue
+            setattr(target, name, self._timed(f"{type(target).__name__}.{name}", getattr(target, name)))
+            wrapped.append(name)
+        return wrapped
+
+    def _timed(self, name: str, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record_method(name, time.perf_counter() - start)
+
+        return timed
+
+    # Registro
+
+    def record_method(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._methods.get(name)
+            if histogram is None:
+                histogram = self._methods[name] = Histogram()
+            histogram.add(seconds)
+
+    def record_statement(self, conn: sqlite3.Connection, sql: str, parameters: Any, seconds: float) -> None:
+        key = _normalize(sql)
+        with self._lock:
+            histogram = self._statements.get(key)
+            if histogram is None:
+                histogram = self._statements[key] = Histogram()
+            histogram.add(seconds)
+        if seconds >= self.slow_threshold:
+            plan = self._explain(conn, sql, parameters)
+            with self._lock:
+                self._slow.append(SlowQuery(time.strftime("%Y-%m-%d %H:%M:%S"), seconds, key, plan))
+
+    def _explain(self, conn: sqlite3.Connection, sql: str, parameters: Any) -> str:
+        """EXPLAIN QUERY PLAN de la sentencia lenta (sin medir, sobre la misma conexión)"""
+        if _NO_PLAN.match(sql):
+            return ""
+        if parameters is None:
+            return "(executemany: sin plan)"
+        try:
+            rows = conn.cursor(sqlite3.Cursor).execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            return "\n".join(detail for *_ids, detail in rows.fetchall())
+        except sqlite3.Error as e:
+            return f"(sin plan: {e})"
+
+    # Lectura
+
+    def snapshot(self) -> Diagnostics:
+        """Copia de los contadores ordenada por tiempo total"""
+        with self._lock:
+            methods = sorted((_summary(n, h) for n, h in self._methods.items()), key=lambda s: -s.total)
+            statements = sorted((_summary(n, h) for n, h in self._statements.items()), key=lambda s: -s.total)
+            slow = list(reversed(self._slow))
+        return Diagnostics(self.enabled, self.slow_threshold, methods, statements, slow)
+
+    # Conexiones
+
+    def connection_factory(self) -> type:
+        """Clase de conexión cuyos cursores miden cada sentencia cuando la medición está activa"""
+        instrumentation = self
+
+        class TimedCursor(sqlite3.Cursor):
+            def execute(self, sql, parameters=()):
+                if not instrumentation.enabled:
+                    return super().execute(sql, parameters)
+                start = time.perf_counter()
+                try:
+                    return super().execute(sql, parameters)
+                finally:
+                    instrumentation.record_statement(self.connection, sql, parameters, time.perf_counter() - start)
+
+            def executemany(self, sql, seq_of_parameters):
+                if not instrumentation.enabled:
+                    return super().executemany(sql, seq_of_parameters)
+                start = time.perf_counter()
+                try:
+                    return super().executemany(sql, seq_of_parameters)
+                finally:
+                    instrumentation.record_statement(self.connection, sql, None, time.perf_counter() - start)
+
+        class TimedConnection(sqlite3.Connection):
+            # Connection.execute/executemany crean su cursor con cursor(), así también quedan medidos
+            def cursor(self, factory=TimedCursor):
+                return super().cursor(factory)
+
+        return TimedConnection
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f}"
@@ -1,27 +1,224 @@
+import sqlite3
+import sys
+import time
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 import ttkbootstrap as tb
-from typing import Optional
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from barcode import BarcodeIndex, ScanBatcher, ScannerInput, event_time_ms
+from bulk_window import BulkOperationWindow
+from cart import CartManager
+from catalog_io import export_catalog, import_catalog
+from checkout import InsufficientStockError
+from constants import CART_JOURNAL, DB_NAME
+from costing import AVERAGE, FIFO
 from database import DatabaseManager
+from db_worker import DatabaseWorker
+from ledger import SaleRecord
+from money import Cents, Money
+from diagnostics_window import DiagnosticsWindow
+from low_stock_window import LowStockWindow
+from maintenance import IDLE_SECONDS, MaintenanceService
+from product_search import TypeaheadDropdown
+from product_view import VirtualProductTree
+from receipts import FORMATS, HTML, ReceiptSpooler, export_receipts, receipts_dir
+from report_window import ReportWindow
+from reports import ReportEngine
 from sale_details_panel import SaleDetailsPanel
-from constants import IVA_PERCENT
+from startup import StartupTimer, build_snapshot, load_snapshot, save_snapshot, snapshot_path
+from stock_alerts import LowStockItem
+
+# Cada cuánto se revisan cambios confirmados por otras cajas
+EXTERNAL_CHANGES_POLL_MS = 1000
+# Cada cuánto se refleja en la barra de estado la tarea de mantenimiento en curso
+MAINTENANCE_POLL_MS = 1000
+
+# Métodos de costeo tal como se muestran en la configuración
+COSTING_LABELS = {
+    AVERAGE: "Promedio ponderado",
+    FIFO: "FIFO (primeras entradas, primeras salidas)",
+}
 
 
 class InventoryApp(tb.Window):
     """Aplicación principal de gestión de inventario"""
 
-    def __init__(self):
+    def __init__(self, db=None, cart_journal: str = CART_JOURNAL, started: Optional[float] = None,
+                 startup_report: bool = False):
+        # started: perf_counter() al iniciar el proceso, para incluir las importaciones en los tiempos
+        self.startup = StartupTimer(started)
+        # startup_report: imprime el desglose en stderr al terminar (siempre visible en Diagnóstico)
+        self._startup_report = startup_report
+        if started is not None:
+            self.startup.mark("importaciones")
         super().__init__(themename="cosmo")
         self.title("Sistema de Gestión de Inventario")
         self.geometry("1200x650")
-        self.db = DatabaseManager()
+        self.startup.mark("ventana")
+        # db: DatabaseManager local o un cliente remoto (pos_client.RemoteDatabase) con la misma interfaz
+        self.db = db if db is not None else DatabaseManager()
+        self.startup.mark("base de datos")
+        self.worker = DatabaseWorker(self, on_busy=self._set_busy, on_error=self._show_db_error)
+        self._idle_text = "Listo"
+        self._busy = False
+        self._last_activity = time.monotonic()
+        self.maintenance: Optional[MaintenanceService] = None
         self.current_edit_id: Optional[int] = None
+        self.reports: Optional[ReportEngine] = None
+        self._change_token: Optional[int] = None  # None hasta la primera carga completa
+        self._data_version: Optional[int] = None
+        # Productos bajo su mínimo: se cargan una vez y después se actualizan con los productos modificados
+        self.low_stock: Dict[int, LowStockItem] = {}
+        self._low_stock_window: Optional[LowStockWindow] = None
+        # Carritos en memoria: la base solo se toca al cobrar
+        self.carts = CartManager(cart_journal)
+        # Modo escáner: índice de códigos en memoria y escaneos agrupados en una sola actualización
+        self.barcodes = BarcodeIndex()
+        self.scanner = ScannerInput()
+        self.scan_batcher = ScanBatcher(self, self._apply_scans)
+        self.startup.mark("carritos")
         self._setup_ui()
-        self._load_products()
-        self._load_sales()
+        self._show_cart()
+        self.startup.mark("interfaz")
+        # Instantánea de la primera página (solo con base local): la ventana aparece ya con productos
+        self._snapshot_path = snapshot_path(self.db.db_name) if hasattr(self.db, "db_name") else None
+        self._snapshot_token = self._show_snapshot()
+        # Respaldos, archivo y compactación en su propio hilo (solo con base local; el servicio POS tiene el suyo)
+        self.maintenance = (MaintenanceService(self.db.db_name, is_idle=self._is_idle)
+                            if hasattr(self.db, "db_name") else None)
+        # Recibos en su propio hilo: la caja solo encola el registro de la venta
+        self.receipts = ReceiptSpooler(receipts_dir(getattr(self.db, "db_name", DB_NAME)),
+                                       load=self.db.get_sale_record)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        # Las cargas completas empiezan cuando la ventana ya se dibujó
+        self.after_idle(self._start_background_load)
+
+    def _on_close(self) -> None:
+        """Cierra las conexiones a la base de datos y la ventana"""
+        # La ventana desaparece enseguida; el hilo de trabajo termina lo pendiente antes de cerrar la base
+        self.withdraw()
+        if self.maintenance is not None:
+            self.maintenance.stop()
+        self.receipts.stop()
+        if self._snapshot_path:
+            self.worker.submit(self._save_snapshot, self.product_view.page_size)
+        self.worker.shutdown()
+        self.carts.close()
+        self.db.close()
+        self.destroy()
+
+    # Arranque
+
+    def _show_snapshot(self) -> Optional[int]:
+        """Muestra la instantánea guardada; devuelve su token o None.
+
+        No consulta la base: _start_background_load la confirma en el hilo de trabajo.
+        """
+        snapshot = load_snapshot(self._snapshot_path) if self._snapshot_path else None
+        if snapshot is None:
+            return None
+        self.product_view.show_rows(snapshot.rows, snapshot.total)
+        self.startup.mark("instantánea")
+        return snapshot.token
+
+    def _save_snapshot(self, page_size: int) -> None:
+        """Reconstruye la instantánea si la base cambió desde la última (en el hilo de trabajo)"""
+        try:
+            if self.db.get_change_token() != self._snapshot_token:
+                save_snapshot(self._snapshot_path, build_snapshot(self.db, page_size))
+        except (OSError, sqlite3.Error):
+            pass  # Sin instantánea el próximo arranque carga la primera página desde la base
+
+    def _start_background_load(self) -> None:
+        """Carga lo que la instantánea no cubre: primera página vigente, índice de códigos y cobros pendientes"""
+        self.startup.mark("primer dibujo")
+        if self._snapshot_token is None:
+            self._load_first_page()
+        else:
+            self.worker.submit(self.db.get_change_token, on_done=self._check_snapshot)
+        self._recover_checkouts()
+        self.receipts.start()
+        self.after(EXTERNAL_CHANGES_POLL_MS, self._poll_external_changes)
+        if self.maintenance is not None:
+            self.maintenance.start()
+            self.after(MAINTENANCE_POLL_MS, self._poll_maintenance)
+
+    def _load_first_page(self) -> None:
+        self._reload_views(on_loaded=lambda: self.startup.mark("primera página"))
+        self.worker.submit(lambda: None, on_done=lambda _: self._startup_done())
+
+    def _check_snapshot(self, token: int) -> None:
+        """La instantánea en pantalla es vigente si nadie cambió productos desde que se guardó"""
+        if token != self._snapshot_token:
+            self._snapshot_token = None
+            self._load_first_page()
+            return
+        self._change_token = token
+        self.worker.submit(self.db.get_barcode_entries, on_done=self.barcodes.load, key="barcodes")
+        self._load_low_stock()
+        self.worker.submit(lambda: None, on_done=lambda _: self._startup_done())
+
+    def _startup_done(self) -> None:
+        """Las cargas iniciales terminaron: informa el desglose de tiempos"""
+        self.startup.mark("carga en segundo plano")
+        self._idle_text = f"Listo (inicio en {self.startup.total * 1000:.0f} ms)"
+        self.status_label.config(text=self._status_text())
+        if self._startup_report:
+            print(self.startup.report(), file=sys.stderr)
+
+    def _set_busy(self, busy: bool) -> None:
+        """Muestra u oculta el indicador de trabajo en curso"""
+        self._busy = busy
+        self._last_activity = time.monotonic()
+        if busy:
+            self.status_label.config(text="Procesando...")
+            self.busy_bar.start(10)
+        else:
+            self.status_label.config(text=self._status_text())
+            self.busy_bar.stop()
+
+    def _status_text(self) -> str:
+        """Texto de reposo de la barra de estado, con la tarea de mantenimiento en curso si la hay"""
+        running = self.maintenance.running() if self.maintenance is not None else None
+        return f"{self._idle_text} · {running}" if running else self._idle_text
+
+    # Mantenimiento
+
+    def _touch(self, _event=None) -> None:
+        self._last_activity = time.monotonic()
+
+    def _is_idle(self) -> bool:
+        """Sin teclas, clics ni consultas en curso durante IDLE_SECONDS (se llama desde el hilo de mantenimiento)"""
+        return not self._busy and time.monotonic() - self._last_activity >= IDLE_SECONDS
+
+    def _poll_maintenance(self) -> None:
+        if not self._busy:
+            self.status_label.config(text=self._status_text())
+        self.after(MAINTENANCE_POLL_MS, self._poll_maintenance)
+
+    def _show_db_error(self, error: BaseException) -> None:
+        """Muestra los errores de las operaciones en segundo plano"""
+        messagebox.showerror("Error", str(error))
 
     def _setup_ui(self) -> None:
         """Configura la interfaz de usuario"""
+        self._setup_menu()
+
+        # Barra de estado con indicador de trabajo en segundo plano
+        status_frame = tb.Frame(self)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 5))
+        self.status_label = tb.Label(status_frame, text="Listo")
+        # Cualquier tecla o clic posterga las tareas de mantenimiento que esperan inactividad
+        self.bind_all("<Key>", self._touch, add="+")
+        self.bind_all("<Button>", self._touch, add="+")
+        self.status_label.pack(side=tk.LEFT)
+        # Aviso de stock bajo: visible solo con productos en alerta, abre el panel de reposición
+        self.low_stock_badge = tb.Button(status_frame, text="", bootstyle="danger-link",
+                                         command=self._show_low_stock)
+        self.busy_bar = tb.Progressbar(status_frame, mode="indeterminate", length=120, bootstyle="info")
+        self.busy_bar.pack(side=tk.RIGHT)
+
         # Panel izquierdo
         self.sale_panel = SaleDetailsPanel(self)
         self.sale_panel.pack(side=tk.LEFT, fill=tk.Y, padx=10, pady=10)
@@ -41,32 +238,14 @@ class InventoryApp(tb.Window):
         tb.Label(search_frame, text="Cantidad:").pack(side=tk.LEFT, padx=5)
         self.quantity_entry = tb.Entry(search_frame, width=10)
         self.quantity_entry.pack(side=tk.LEFT, padx=5)
-
-        # Lista de productos
-        self.tree = tb.Treeview(
-            main_frame,
-            columns=("id", "nombre", "cantidad", "precio", "ganancia"),
-            show="headings",
-            height=15,
-            bootstyle="primary",
+        self.product_search = TypeaheadDropdown(
+            self.product_entry, self._search_products, self._on_search_selected
         )
-        columns = [
-            ("id", "ID"),
-            ("nombre", "Nombre"),
-            ("cantidad", "Cantidad"),
-            ("precio", "Precio"),
-            ("ganancia", "% Ganancia"),
-        ]
-        for col, text in columns:
-            self.tree.heading(col, text=text)
-            self.tree.column(
-                col,
-                anchor="center",
-                width=100 if col != "id" else 0,
-                stretch=tk.NO if col == "id" else tk.YES,
-            )
-        self.tree.column("id")
-        self.tree.pack(fill=tk.BOTH, expand=True, pady=10)
+
+        # Lista de productos (desplazamiento virtual por páginas)
+        self.product_view = VirtualProductTree(main_frame, self.db, run=self.worker.submit)
+        self.product_view.pack(fill=tk.BOTH, expand=True, pady=10)
+        self.tree = self.product_view.tree
         self.tree.bind("<ButtonRelease-1>", self._on_product_selected)
 
         # Barra de herramientas
@@ -89,14 +268,60 @@ class InventoryApp(tb.Window):
         self.right_panel.pack(side=tk.RIGHT, fill=tk.BOTH, padx=10, pady=10)
         self._setup_right_panel()
 
+    def _setup_menu(self) -> None:
+        """Configura la barra de menú"""
+        menubar = tk.Menu(self)
+        file_menu = tk.Menu(menubar, tearoff=False)
+        file_menu.add_command(label="Importar catálogo...", command=self._import_catalog)
+        file_menu.add_command(label="Exportar catálogo...", command=self._export_catalog)
+        file_menu.add_command(label="Operaciones masivas...", command=self._show_bulk_operations)
+        file_menu.add_command(label="Exportar recibos del día...", command=self._export_receipts)
+        file_menu.add_separator()
+        file_menu.add_command(label="Salir", command=self._on_close)
+        menubar.add_cascade(label="Archivo", menu=file_menu)
+        config_menu = tk.Menu(menubar, tearoff=False)
+        config_menu.add_command(label="IVA...", command=self._show_iva_dialog)
+        config_menu.add_command(label="Método de costo...", command=self._show_costing_dialog)
+        config_menu.add_command(label="Diagnóstico...", command=self._show_diagnostics)
+        menubar.add_cascade(label="Configuración", menu=config_menu)
+        reports_menu = tk.Menu(menubar, tearoff=False)
+        reports_menu.add_command(label="Ventas e inventario...", command=self._show_reports)
+        reports_menu.add_command(label="Totales del sistema", command=self._show_totals)
+        reports_menu.add_command(label="Stock bajo y reposición...", command=self._show_low_stock)
+        menubar.add_cascade(label="Reportes", menu=reports_menu)
+        self.config(menu=menubar)
+
     def _setup_right_panel(self):
+        # El formulario de productos se construye al mostrarlo por primera vez
         self.add_product_frame = tb.Frame(self.right_panel)
-        self._build_add_product_form()
+        self.entries = {}
 
         self.sales_frame = tb.Frame(self.right_panel)
         tb.Label(
             self.sales_frame, text="Productos en Venta", font=("Helvetica", 12, "bold")
         ).pack(pady=5)
+
+        # Carritos en espera: varios clientes atendidos en la misma caja
+        session_frame = tb.Frame(self.sales_frame)
+        session_frame.pack(fill=tk.X, pady=(0, 5))
+        self.session_combo = tb.Combobox(session_frame, state="readonly", width=14)
+        self.session_combo.pack(side=tk.LEFT, padx=5)
+        self.session_combo.bind("<<ComboboxSelected>>", self._on_session_selected)
+        tb.Button(session_frame, text="Nuevo cliente", bootstyle="info-outline",
+                  command=self._new_session).pack(side=tk.LEFT, padx=2)
+        tb.Button(session_frame, text="Quitar línea", bootstyle="secondary-outline",
+                  command=self._remove_cart_line).pack(side=tk.LEFT, padx=2)
+        tb.Button(session_frame, text="Descartar", bootstyle="danger-outline",
+                  command=self._discard_session).pack(side=tk.LEFT, padx=2)
+
+        scan_frame = tb.Frame(self.sales_frame)
+        scan_frame.pack(fill=tk.X, pady=(0, 5))
+        tb.Label(scan_frame, text="Escanear:").pack(side=tk.LEFT, padx=5)
+        self.scan_entry = tb.Entry(scan_frame, width=24)
+        self.scan_entry.pack(side=tk.LEFT, padx=5)
+        self.scan_entry.bind("<Key>", self._on_scan_key)
+        self.scan_status = tb.Label(scan_frame, text="", bootstyle="secondary")
+        self.scan_status.pack(side=tk.LEFT, padx=5)
         self.sales_tree = tb.Treeview(
             self.sales_frame,
             columns=("producto", "cantidad", "precio", "subtotal"),
@@ -126,6 +351,7 @@ class InventoryApp(tb.Window):
         self.show_sales_view()
 
     def _build_add_product_form(self):
+        """Construye el formulario de agregar/editar producto"""
         form_frame = tb.Frame(self.add_product_frame)
         form_frame.pack(fill=tk.BOTH, expand=True)
         tb.Label(
@@ -140,6 +366,8 @@ class InventoryApp(tb.Window):
             ("Cantidad:", "cantidad"),
             ("Precio de Venta:", "precio"),
             ("% Ganancia:", "margen_ganancia"),
+            ("Código de barras (opcional):", "codigo_barras"),
+            ("Stock mínimo (opcional):", "stock_minimo"),
         ]
         for row, (label, key) in enumerate(fields):
             tb.Label(fields_frame, text=label).grid(
@@ -167,40 +395,252 @@ class InventoryApp(tb.Window):
 
     def _on_product_selected(self, event):
         """Manejador de evento cuando se selecciona un producto"""
+        # Clics en encabezados, separadores o espacio vacío conservan la selección anterior
+        if self.tree.identify_region(event.x, event.y) != "cell":
+            return
         selected = self.tree.selection()
         if not selected:
             return
 
-        item = self.tree.item(selected[0])
-        product_id = item["values"][0]
-        product_name = item["values"][1]
-        product_price = float(item["values"][3])  # Conversión a float aquí
+        row = self.product_view.get_row(int(selected[0]))
+        if row is None:
+            return
+        product_id, product_name, _cantidad, product_price, _margen = row
 
-        try:
-            self.db.add_to_current_sales(product_id)
-            self._load_sales()
-            self.sale_panel.update_details(product_name, product_price, 1)
-            self.product_entry.delete(0, tk.END)
-            self.product_entry.insert(0, product_name)
-            self.quantity_entry.delete(0, tk.END)
+        self._add_to_cart(product_id, product_name, product_price, 1)
+        self.product_entry.delete(0, tk.END)
+        self.product_entry.insert(0, product_name)
+        self.quantity_entry.delete(0, tk.END)
+        self.quantity_entry.insert(0, "1")
+
+    def _search_products(self, query: str, limit: int, callback) -> None:
+        """Busca sugerencias en segundo plano; una búsqueda nueva descarta la anterior"""
+        self.worker.submit(self.db.search_products, query, limit, on_done=callback, key="search")
+
+    def _on_search_selected(self, product) -> None:
+        """Completa la cantidad al elegir una sugerencia de la búsqueda"""
+        if not self.quantity_entry.get().strip():
             self.quantity_entry.insert(0, "1")
-        except ValueError as e:
-            messagebox.showerror("Error", str(e))
+        self.quantity_entry.focus_set()
+        self.quantity_entry.select_range(0, tk.END)
+
+    def _load_products(self, on_loaded=None) -> None:
+        """Carga la ventana visible de productos en el Treeview principal"""
+        self.product_view.refresh(on_loaded=on_loaded)
 
-    def _load_products(self) -> None:
-        """Carga los productos en el Treeview principal"""
-        self.tree.delete(*self.tree.get_children())
-        for producto in self.db.get_all_products():
-            self.tree.insert("", tk.END, values=producto)
+    def _reload_views(self, on_loaded=None) -> None:
+        """Recarga por completo la vista de productos y reinicia el token de cambios"""
 
-    def _load_sales(self):
-        """Carga los productos en venta"""
+        def apply(token: int) -> None:
+            self._change_token = token
+
+        # El token se lee antes que las filas para no saltear cambios; el índice de códigos llega al final
+        self.worker.submit(self.db.get_change_token, on_done=apply, key="sync")
+        self._load_products(on_loaded)
+        self.worker.submit(self.db.get_barcode_entries, on_done=self.barcodes.load, key="barcodes")
+        self._load_low_stock()
+
+    def _sync_views(self) -> None:
+        """Aplica a la vista de productos solo los cambios registrados desde la última sincronización"""
+        token = self._change_token
+        if token is None:
+            return
+
+        def collect():
+            changes = self.db.get_changes(token)
+            if changes.reset or not changes.productos:
+                return changes, {}, [], []
+            rows = {row[0]: row for row in self.db.get_products_by_ids(changes.productos)}
+            return (changes, rows, self.db.get_barcode_entries(changes.productos),
+                    self.db.get_low_stock(changes.productos))
+
+        # Con la misma clave, una sincronización pendiente queda reemplazada por la nueva
+        self.worker.submit(collect, on_done=self._apply_sync, key="sync")
+
+    def _apply_sync(self, result) -> None:
+        changes, rows, barcodes, low_stock = result
+        if changes.reset:
+            self._reload_views()
+            return
+        self._change_token = changes.token
+        self.product_view.apply_changes(changes.productos, rows, changes.productos_delta)
+        self.barcodes.update(changes.productos, barcodes)
+        if changes.productos:
+            self._apply_low_stock(changes.productos, low_stock)
+
+    # Alertas de stock bajo
+
+    def _load_low_stock(self) -> None:
+        """Carga la lista completa de alertas (al iniciar o al recargar las vistas)"""
+
+        def apply(items: List[LowStockItem]) -> None:
+            self._apply_low_stock(set(self.low_stock) | {item.producto_id for item in items}, items)
+
+        self.worker.submit(self.db.get_low_stock, on_done=apply, key="low-stock")
+
+    def _apply_low_stock(self, changed: Iterable[int], items: List[LowStockItem]) -> None:
+        """Actualiza las alertas de los productos modificados: `items` son los que siguen en alerta"""
+        changed = set(changed)
+        for product_id in changed:
+            self.low_stock.pop(product_id, None)
+        self.low_stock.update((item.producto_id, item) for item in items)
+        if self.low_stock:
+            self.low_stock_badge.config(text=f"⚠ Stock bajo: {len(self.low_stock)}")
+            self.low_stock_badge.pack(side=tk.LEFT, padx=10)
+        else:
+            self.low_stock_badge.pack_forget()
+        if self._low_stock_window is not None and self._low_stock_window.winfo_exists():
+            self._low_stock_window.apply(changed, items)
+
+    def _show_low_stock(self) -> None:
+        if self._low_stock_window is not None and self._low_stock_window.winfo_exists():
+            self._low_stock_window.lift()
+            return
+        items = sorted(self.low_stock.values(), key=lambda item: (item.desde, item.producto_id))
+        self._low_stock_window = LowStockWindow(self, self.db, self.worker, items)
+
+    # Carrito en memoria
+
+    def _add_to_cart(self, product_id: int, product_name: str, price: Cents, quantity: int) -> None:
+        """Agrega al carrito activo con el precio actual y actualiza solo esa línea"""
+        line = self.carts.add(product_id, product_name, price, quantity)
+        self._render_cart_line(product_id)
+        self.sale_panel.update_details(product_name, line.precio_unitario, quantity)
+
+    def _render_cart_line(self, product_id: int, update_total: bool = True) -> None:
+        iid = f"v{product_id}"
+        line = self.carts.cart.lines.get(product_id)
+        if line is None:
+            if self.sales_tree.exists(iid):
+                self.sales_tree.delete(iid)
+        elif self.sales_tree.exists(iid):
+            self.sales_tree.item(iid, values=line.values())
+        else:
+            self.sales_tree.insert("", tk.END, iid=iid, values=line.values())
+        if update_total:
+            self._update_total_label()
+
+    def _show_cart(self) -> None:
+        """Reconstruye la tabla y el selector a partir del carrito activo"""
         self.sales_tree.delete(*self.sales_tree.get_children())
-        total_venta = 0
-        for producto in self.db.get_current_sales():
-            self.sales_tree.insert("", tk.END, values=producto)
-            total_venta += producto[3]
-        self.total_venta_label.config(text=f"${total_venta * (1 + IVA_PERCENT):.2f}")
+        for line in self.carts.cart:
+            self.sales_tree.insert("", tk.END, iid=f"v{line.producto_id}", values=line.values())
+        self.session_combo.config(values=[f"Cliente {session}" for session in self.carts.carts])
+        self.session_combo.set(f"Cliente {self.carts.current}")
+        self._update_total_label()
+
+    def _update_total_label(self) -> None:
+        subtotal = Money(self.carts.cart.total)
+        self.total_venta_label.config(text=f"${subtotal + subtotal.percent(self.db.get_iva_percent())}")
+
+    def _on_session_selected(self, _event=None) -> None:
+        self.carts.select(int(self.session_combo.get().split()[-1]))
+        self._show_cart()
+
+    def _new_session(self) -> None:
+        """Deja el carrito actual en espera y atiende a otro cliente"""
+        self.carts.new_session()
+        self.sale_panel.clear()
+        self._show_cart()
+
+    def _remove_cart_line(self) -> None:
+        for iid in self.sales_tree.selection():
+            product_id = int(iid[1:])
+            self.carts.remove(product_id)
+            self._render_cart_line(product_id)
+
+    def _discard_session(self) -> None:
+        if self.carts.cart.lines and not messagebox.askyesno("Confirmar", "¿Descartar este carrito?"):
+            return
+        self.carts.close_session(self.carts.current)
+        self.sale_panel.clear()
+        self._show_cart()
+
+    # Modo escáner
+
+    def _on_scan_key(self, event):
+        """Arma el código tecla a tecla; Enter lo encola sin tocar la base ni redibujar el carrito"""
+        if event.keysym in ("Return", "KP_Enter"):
+            code, _burst = self.scanner.finish()
+            self.scan_entry.delete(0, tk.END)
+            if code:
+                self.scan_batcher.add(code)
+        elif event.keysym == "Escape":
+            self.scanner.reset()
+            self.scan_entry.delete(0, tk.END)
+        elif event.keysym == "BackSpace":
+            self.scanner.backspace()
+            self.scan_entry.delete(0, tk.END)
+            self.scan_entry.insert(0, self.scanner.text)
+        elif event.char and event.char.isprintable():
+            # Durante una ráfaga del lector no se redibuja el campo en cada tecla
+            if not self.scanner.feed(event.char, event_time_ms(event)):
+                self.scan_entry.delete(0, tk.END)
+                self.scan_entry.insert(0, self.scanner.text)
+        else:
+            return None
+        return "break"
+
+    def _apply_scans(self, counts: Counter) -> None:
+        """Aplica de una vez los escaneos agrupados: una línea por producto y un solo recálculo del total"""
+        session = self.carts.current
+        unknown = Counter()
+        for code, times in counts.items():
+            if (hit := self.barcodes.lookup(code)) is None:
+                unknown[code] = times
+            else:
+                self._add_scanned(session, hit, times)
+        self._update_total_label()
+        self.scan_status.config(text=f"{sum(counts.values())} escaneos" if not unknown else "Buscando códigos...")
+        if unknown:
+            # Código aún no presente en el índice (alta reciente en otra caja): se busca en la base
+            self.worker.submit(self.db.find_barcodes, list(unknown),
+                               on_done=lambda entries: self._apply_found_barcodes(session, unknown, entries))
+
+    def _add_scanned(self, session: int, hit, times: int) -> None:
+        product_id, nombre, precio = hit
+        line = self.carts.add(product_id, nombre, precio, times, session=session)
+        if session == self.carts.current:
+            self._render_cart_line(product_id, update_total=False)
+            self.sale_panel.update_details(nombre, line.precio_unitario, times)
+
+    def _apply_found_barcodes(self, session: int, unknown: Counter, entries) -> None:
+        self.barcodes.update((), entries)
+        if session not in self.carts.carts:
+            return
+        for product_id, code, nombre, precio in entries:
+            self._add_scanned(session, (product_id, nombre, precio), unknown.pop(code))
+        self._update_total_label()
+        missing = ", ".join(unknown)
+        self.scan_status.config(text=f"Código no encontrado: {missing}" if missing else "")
+
+    def _recover_checkouts(self) -> None:
+        """Carritos cuyo cobro se envió antes de un cierre abrupto: se vacían si la venta quedó confirmada"""
+        pending = self.carts.pending_checkouts()
+        if not pending:
+            return
+
+        def confirmed():
+            return [session for session, ref in pending.items() if self.db.sale_exists(ref)]
+
+        def apply(sessions) -> None:
+            for session in sessions:
+                self.carts.complete_checkout(session, pending[session])
+            self._show_cart()
+
+        self.worker.submit(confirmed, on_done=apply)
+
+    def _poll_external_changes(self) -> None:
+        """Sincroniza las vistas cuando otra conexión confirmó escrituras"""
+
+        def check(version: int) -> None:
+            if self._data_version is not None and version != self._data_version:
+                self._sync_views()
+            self._data_version = version
+
+        # data_version se lee en la conexión del hilo de trabajo, donde ocurren las escrituras propias
+        self.worker.submit(self.db.data_version, on_done=check, key="data-version")
+        self.after(EXTERNAL_CHANGES_POLL_MS, self._poll_external_changes)
 
     def _save_product(self) -> None:
         """Guarda un producto nuevo o editado"""
@@ -208,7 +648,7 @@ class InventoryApp(tb.Window):
             data = {
                 "nombre": self.entries["nombre"].get().strip(),
                 "cantidad": int(self.entries["cantidad"].get()),
-                "precio": float(self.entries["precio"].get()),
+                "precio": Money.parse(self.entries["precio"].get()).cents,
                 "margen_ganancia": float(self.entries["margen_ganancia"].get()),
             }
 
@@ -218,23 +658,110 @@ class InventoryApp(tb.Window):
             if data["cantidad"] <= 0 or data["precio"] <= 0 or data["margen_ganancia"] <= 0:
                 raise ValueError("Los valores deben ser positivos")
 
-            if self.current_edit_id:
-                with self.db._get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "DELETE FROM productos WHERE id = ?", (self.current_edit_id,)
-                    )
-                    conn.commit()
-                self.current_edit_id = None
-
-            self.db.add_or_update_product(**data)
-            self._load_products()
+            data["codigo_barras"] = self.entries["codigo_barras"].get().strip() or None
+            # Vacío equivale a sin mínimo (0): el producto no genera alertas
+            data["stock_minimo"] = int(self.entries["stock_minimo"].get().strip() or 0)
+            if data["stock_minimo"] < 0:
+                raise ValueError("El stock mínimo no puede ser negativo")
+
+        except ValueError as e:
+            messagebox.showerror("Error", f"Dato inválido: {e}")
+            return
+
+        edit_id = self.current_edit_id
+        self.current_edit_id = None
+
+        def saved(_) -> None:
             messagebox.showinfo("Éxito", "Producto guardado correctamente")
             self.show_sales_view()
             self._clear_entries()
 
-        except ValueError as e:
-            messagebox.showerror("Error", f"Dato inválido: {e}")
+        self.worker.submit(
+            self.db.save_product,
+            edit_id,
+            **data,
+            on_done=saved,
+            on_error=lambda e: messagebox.showerror("Error", f"Dato inválido: {e}"),
+        )
+        self._sync_views()
+
+    def _catalog_progress(self, action: str):
+        """Devuelve un callback (seguro desde el hilo de trabajo) que muestra el avance en el título"""
+        title = self.title()
+
+        def progress(count: int) -> None:
+            self.worker.call_soon(self.title, f"{title} - {action}: {count} filas")
+
+        return progress, lambda: self.title(title)
+
+    def _import_catalog(self) -> None:
+        """Importa un catálogo CSV/JSONL de proveedor"""
+        path = filedialog.askopenfilename(
+            title="Importar catálogo",
+            filetypes=[("Catálogos", "*.csv *.jsonl"), ("Todos los archivos", "*.*")],
+        )
+        if not path:
+            return
+        progress, restore = self._catalog_progress("Importando")
+
+        def done(count: int) -> None:
+            restore()
+            self._reload_views()
+            messagebox.showinfo("Éxito", f"{count} productos importados")
+
+        def failed(error: BaseException) -> None:
+            restore()
+            self._reload_views()
+            messagebox.showerror("Error", f"No se pudo importar el catálogo: {error}")
+
+        self.worker.submit(import_catalog, self.db, path, progress=progress, on_done=done, on_error=failed)
+
+    def _export_catalog(self) -> None:
+        """Exporta el catálogo a CSV/JSONL"""
+        path = filedialog.asksaveasfilename(
+            title="Exportar catálogo",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")],
+        )
+        if not path:
+            return
+        progress, restore = self._catalog_progress("Exportando")
+
+        def done(count: int) -> None:
+            restore()
+            messagebox.showinfo("Éxito", f"{count} productos exportados")
+
+        def failed(error: BaseException) -> None:
+            restore()
+            messagebox.showerror("Error", f"No se pudo exportar el catálogo: {error}")
+
+        self.worker.submit(export_catalog, self.db, path, progress=progress, on_done=done, on_error=failed)
+
+    def _export_receipts(self) -> None:
+        """Exporta en un solo archivo los recibos de las ventas de hoy (formato según la extensión)"""
+        path = filedialog.asksaveasfilename(
+            title="Exportar recibos del día",
+            defaultextension=FORMATS[HTML],
+            filetypes=[("HTML para imprimir", "*.html"), ("Texto", "*.txt"), ("ESC/POS", "*.bin")],
+        )
+        if not path:
+            return
+        today = time.strftime("%Y-%m-%d")
+
+        def export() -> int:
+            return export_receipts(self.db.get_sale_records(today, today), path, templates=self.receipts.templates)
+
+        self.worker.submit(
+            export,
+            on_done=lambda count: messagebox.showinfo("Éxito", f"{count} recibos exportados"),
+            on_error=lambda error: messagebox.showerror("Error", f"No se pudieron exportar los recibos: {error}"),
+        )
+
+    def _show_bulk_operations(self) -> None:
+        """Abre el diálogo de operaciones masivas con los productos elegidos en la lista (si hay varios)"""
+        selected = self.tree.selection()
+        selected_ids = [int(iid) for iid in selected] if len(selected) > 1 else []
+        BulkOperationWindow(self, self.db, self.worker, selected_ids, on_applied=self._sync_views)
 
     def _clear_entries(self):
         """Limpia los campos del formulario"""
@@ -247,22 +774,29 @@ class InventoryApp(tb.Window):
             messagebox.showwarning("Advertencia", "Seleccione un producto")
             return
 
-        item = self.tree.item(selected[0])
-        product_data = {
-            "id": item["values"][0],
-            "nombre": item["values"][1],
-            "cantidad": item["values"][2],
-            "precio": item["values"][3],
-            "margen_ganancia": item["values"][4],
-        }
+        row = self.product_view.get_row(int(selected[0]))
+        if row is None:
+            return
+        product_data = dict(zip(("id", "nombre", "cantidad", "precio", "margen_ganancia"), row))
 
+        # Primero se muestra el formulario: show_add_product_view lo limpia y reinicia la edición
+        self.show_add_product_view()
         self.current_edit_id = product_data["id"]
-        self._clear_entries()
         self.entries["nombre"].insert(0, product_data["nombre"])
         self.entries["cantidad"].insert(0, str(product_data["cantidad"]))
-        self.entries["precio"].insert(0, str(product_data["precio"]))
+        self.entries["precio"].insert(0, str(Money(product_data["precio"])))
         self.entries["margen_ganancia"].insert(0, str(product_data["margen_ganancia"]))
-        self.show_add_product_view()
+
+        def fill_barcode(entries) -> None:
+            if entries and self.current_edit_id == product_data["id"]:
+                self.entries["codigo_barras"].insert(0, entries[0][1])
+
+        def fill_minimum(stock_minimo: int) -> None:
+            if stock_minimo and self.current_edit_id == product_data["id"]:
+                self.entries["stock_minimo"].insert(0, str(stock_minimo))
+
+        self.worker.submit(self.db.get_barcode_entries, [product_data["id"]], on_done=fill_barcode)
+        self.worker.submit(self.db.get_stock_minimum, product_data["id"], on_done=fill_minimum)
 
     def _delete_product(self) -> None:
         """Elimina el producto seleccionado"""
@@ -274,13 +808,12 @@ class InventoryApp(tb.Window):
         product_name = self.tree.item(selected[0])["values"][1]
 
         if messagebox.askyesno("Confirmar", f"¿Eliminar el producto {product_name}?"):
-            with self.db._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM productos WHERE id = ?", (product_id,))
-                conn.commit()
-
-            self._load_products()
-            messagebox.showinfo("Éxito", "Producto eliminado")
+            self.worker.submit(
+                self.db.delete_product,
+                product_id,
+                on_done=lambda _: messagebox.showinfo("Éxito", "Producto eliminado"),
+            )
+            self._sync_views()
 
     def _update_sale_details(self) -> None:
         """Actualiza el panel de detalles de venta"""
@@ -295,64 +828,117 @@ class InventoryApp(tb.Window):
             if quantity <= 0:
                 raise ValueError("La cantidad debe ser positiva")
 
-            product_id = self.db.get_product_id(product_name)
-            self.db.add_to_current_sales(product_id, quantity)
-
-            # Obtener precio actualizado
-            with self.db._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT precio FROM productos WHERE id = ?", (product_id,)
-                )
-                price = cursor.fetchone()[0]
-
-            self._load_sales()
-            self.sale_panel.update_details(product_name, price, quantity)
-
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
 
-    def _sell_product(self) -> None:
-        """Realiza la venta del producto"""
-        try:
-            total_venta = self.db.process_sale()
-            current_sales = (
-                self.db.get_current_sales()
-            )  # Esto debería estar vacío ahora
+        def lookup():
+            product_id = self.db.get_product_id(product_name)
+            # Precio vigente al escanear: queda fijo en la línea del carrito
+            return product_id, self.db.get_product_price(product_id)
+
+        self.worker.submit(
+            lookup, on_done=lambda found: self._add_to_cart(found[0], product_name, found[1], quantity)
+        )
 
+    def _sell_product(self) -> None:
+        """Cobra el carrito activo en una sola transacción"""
+        cart = self.carts.cart
+        if not cart.lines:
+            messagebox.showinfo("Venta", "El carrito está vacío")
+            return
+        session = cart.session
+        if self.carts.is_checking_out(session):
+            messagebox.showinfo("Venta", "El cobro de este carrito todavía está en curso")
+            return
+        ref = self.carts.begin_checkout(session)
+        # Las líneas de esa referencia: lo que se agregue mientras tanto queda para el próximo cobro
+        lines = cart.pending_lines
+
+        def sell() -> SaleRecord:
+            return self.db.process_cart_record(lines, ref)
+
+        def sold(record: SaleRecord) -> None:
+            # El recibo se emite en segundo plano: el cajero no espera
+            self.receipts.submit(record)
+            iva_percent = record.iva_percent
+            subtotal = Money(record.total)
+            iva = subtotal.percent(iva_percent)
+            self.carts.complete_checkout(session, ref)
+            if session == self.carts.current:
+                self._show_cart()
             messagebox.showinfo(
                 "Venta realizada",
-                f"Total de productos: {len(current_sales)}\n"
-                f"Subtotal: ${total_venta:.2f}\n"
-                f"IVA ({IVA_PERCENT*100:.0f}%): ${total_venta * IVA_PERCENT:.2f}\n"
-                f"Total: ${total_venta * (1 + IVA_PERCENT):.2f}",
+                f"Total de productos: {len(lines)}\n"
+                f"Subtotal: ${subtotal}\n"
+                f"IVA ({iva_percent*100:.0f}%): ${iva}\n"
+                f"Total: ${subtotal + iva}",
             )
 
             # Limpiar campos y actualizar vistas
             self.product_entry.delete(0, tk.END)
             self.quantity_entry.delete(0, tk.END)
             self.sale_panel.clear()
-            self._load_products()
-            self._load_sales()
+            self._sync_views()
 
-        except ValueError as e:
-            messagebox.showerror("Error en venta", str(e))
+        def failed(error: BaseException) -> None:
+            self.carts.fail_checkout(session)
+            title = "Stock insuficiente" if isinstance(error, InsufficientStockError) else "Error en venta"
+            messagebox.showerror(title, str(error))
+
+        self.worker.submit(sell, on_done=sold, on_error=failed)
 
     def _show_totals(self) -> None:
         """Muestra los totales del sistema"""
-        ventas, gastos = self.db.get_totals()
-        ganancias = ventas - gastos
+        self.worker.submit(self.db.get_totals, on_done=self._show_totals_dialog)
+
+    def _show_totals_dialog(self, totals) -> None:
+        ventas, gastos, costo_ventas, inventario = (Money(total) for total in totals)
+        # Ganancia sobre el costo de lo vendido: las compras que siguen en stock no son pérdida
+        ganancias = ventas - costo_ventas
 
         messagebox.showinfo(
             "Totales del Sistema",
-            f"Ventas Totales: ${ventas:.2f}\n"
-            f"Gastos Totales: ${gastos:.2f}\n"
-            f"Ganancias: ${ganancias:.2f}\n\n"
-            f"Margen de ganancia: {(ganancias/ventas*100 if ventas else 0):.1f}%",
+            f"Ventas Totales: ${ventas}\n"
+            f"Costo de lo vendido: ${costo_ventas}\n"
+            f"Ganancias: ${ganancias}\n\n"
+            f"Margen de ganancia: {(ganancias.cents / ventas.cents * 100 if ventas else 0):.1f}%\n\n"
+            f"Compras Totales: ${gastos}\n"
+            f"Valor del inventario: ${inventario}",
         )
 
+    def _show_iva_dialog(self) -> None:
+        IVAConfigDialog(self, self.db, self.worker, on_saved=self._on_iva_changed)
+
+    def _show_costing_dialog(self) -> None:
+        CostingConfigDialog(self, self.db, self.worker)
+
+    def _show_diagnostics(self) -> None:
+        if not hasattr(self.db, "instrumentation"):
+            messagebox.showinfo("Diagnóstico", "El diagnóstico se consulta en el servicio de inventario")
+            return
+        DiagnosticsWindow(self, self.db, self.worker, self.startup, self.maintenance, self.receipts)
+
+    def _on_iva_changed(self) -> None:
+        """Refresca los importes mostrados con el nuevo IVA"""
+        self._update_total_label()
+        self.sale_panel.refresh_iva()
+
+    def _show_reports(self) -> None:
+        """Abre la ventana de reportes (el motor y su caché se crean una sola vez)"""
+        if self.reports is None:
+            try:
+                archive = self.maintenance.archive if self.maintenance is not None else None
+                self.reports = ReportEngine(self.db, archive=archive)
+            except RuntimeError as e:
+                messagebox.showerror("Reportes", str(e))
+                return
+        ReportWindow(self, self.reports, self.worker)
+
     def show_add_product_view(self):
         """Muestra el formulario para agregar/editar productos"""
+        if not self.entries:
+            self._build_add_product_form()
         self.sales_frame.pack_forget()
         self.add_product_frame.pack(fill=tk.BOTH, expand=True)
         self._clear_entries()
@@ -362,31 +948,73 @@ class InventoryApp(tb.Window):
         """Muestra la lista de productos en venta"""
         self.add_product_frame.pack_forget()
         self.sales_frame.pack(fill=tk.BOTH, expand=True)
-        self._load_sales()
+        self.scan_entry.focus_set()
+        self._sync_views()
 
 
 class IVAConfigDialog(tb.Toplevel):
-    def __init__(self, parent, db):
+    def __init__(self, parent, db, worker, on_saved=None):
         super().__init__(parent)
         self.db = db
+        self.worker = worker
+        self.on_saved = on_saved
         self.title("Configurar IVA")
 
         tb.Label(self, text="% IVA:").pack(pady=5)
         self.iva_entry = tb.Entry(self)
         self.iva_entry.pack(pady=5)
-        self.iva_entry.insert(0, f"{self.db.get_iva_percent() * 100:.0f}")
 
-        tb.Button(self, text="Guardar", bootstyle="success", command=self._save).pack(
-            pady=10
-        )
+        self.save_button = tb.Button(self, text="Guardar", bootstyle="success", command=self._save, state="disabled")
+        self.save_button.pack(pady=10)
+        self.worker.submit(self.db.get_iva_percent, on_done=self._loaded)
+
+    def _loaded(self, iva_percent: float) -> None:
+        if not self.winfo_exists():
+            return
+        self.iva_entry.insert(0, f"{iva_percent * 100:.0f}")
+        self.save_button.config(state="normal")
 
     def _save(self):
         try:
             new_value = float(self.iva_entry.get()) / 100
-            self.db.update_iva_percent(new_value)
-            self.destroy()
         except ValueError:
             messagebox.showerror("Error", "Valor inválido")
+            return
+        self.worker.submit(self.db.update_iva_percent, new_value, on_done=self._saved)
+
+    def _saved(self, _):
+        if self.on_saved:
+            self.on_saved()
+        self.destroy()
+
+
+class CostingConfigDialog(tb.Toplevel):
+    def __init__(self, parent, db, worker):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.title("Método de costo")
+
+        tb.Label(self, text="Costo de lo vendido:").pack(pady=5)
+        self.method_combo = tb.Combobox(self, values=list(COSTING_LABELS.values()), state="readonly")
+        self.method_combo.pack(pady=5)
 
-    def _show_iva_dialog(self):
-        IVAConfigDialog(self, self.db)
\ No newline at end of file
+        self.save_button = tb.Button(self, text="Guardar", bootstyle="success", command=self._save, state="disabled")
+        self.save_button.pack(pady=10)
+        self.worker.submit(self.db.get_costing_method, on_done=self._loaded)
+
+    def _loaded(self, method: str) -> None:
+        if not self.winfo_exists():
+            return
+        self.method_combo.set(COSTING_LABELS[method])
+        self.save_button.config(state="normal")
+
+    def _save(self):
+        label = self.method_combo.get()
+        method = next(method for method, text in COSTING_LABELS.items() if text == label)
+        self.worker.submit(
+            self.db.set_costing_method,
+            method,
+            on_done=lambda _: self.destroy(),
+            on_error=lambda e: messagebox.showerror("Error", str(e)),
+        )
@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import costing
+from money import Cents
+
+
+class SaleRecord(NamedTuple):
+    """Venta confirmada en forma compacta, con todo lo necesario para su recibo"""
+    venta_id: int
+    fecha: str
+    ref: Optional[str]
+    total: Cents  # sin IVA
+    lineas: List[Tuple[str, int, Cents, Cents]]  # (nombre, cantidad, precio unitario, subtotal)
+    iva_percent: float = 0.0
+
+
+def timestamp(moment: Optional[datetime] = None) -> str:
+    """Marca de tiempo local 'AAAA-MM-DD HH:MM:SS' usada en el libro"""
+    return (moment or datetime.now()).isoformat(sep=" ", timespec="seconds")
+
+
+def _add_to_day(cursor: sqlite3.Cursor, fecha: str, ventas: int = 0, total_ventas: Cents = 0,
+                total_gastado: Cents = 0, costo_ventas: Cents = 0) -> None:
+    cursor.execute('''INSERT INTO resumen_diario (dia, num_ventas, total_ventas, total_gastado, costo_ventas)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(dia) DO UPDATE SET
+                       num_ventas = num_ventas + excluded.num_ventas,
+                       total_ventas = total_ventas + excluded.total_ventas,
+                       total_gastado = total_gastado + excluded.total_gastado,
+                       costo_ventas = costo_ventas + excluded.costo_ventas''',
+                   (fecha[:10], ventas, total_ventas, total_gastado, costo_ventas))
+
+
+def record_stock_entries(cursor: sqlite3.Cursor, entries: Iterable[Tuple[str, int, Cents]],
+                         fecha: Optional[str] = None) -> Cents:
+    """Registra entradas de stock (nombre, cantidad, costo unitario en centavos) y actualiza los resúmenes.
+
+    Debe llamarse dentro de la transacción que modificó productos; abre un lote de costo por
+    entrada y devuelve el costo total.
+    """
+    fecha = fecha or timestamp()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM entradas_stock")
+    first_id = cursor.fetchone()[0]
+    cursor.executemany('''INSERT INTO entradas_stock (fecha, producto_id, cantidad, costo_unitario, costo_total)
+                       SELECT ?, id, ?, ?, ? FROM productos WHERE nombre = ?''',
+                       ((fecha, cantidad, costo, cantidad * costo, nombre) for nombre, cantidad, costo in entries))
+    # Resúmenes por producto y por día con una sentencia por conjunto cada uno
+    cursor.execute('''INSERT INTO resumen_producto (producto_id, unidades_compradas, total_gastado)
+                   SELECT producto_id, SUM(cantidad), SUM(costo_total) FROM entradas_stock NOT INDEXED
+                   WHERE id > ? GROUP BY producto_id
+                   ON CONFLICT(producto_id) DO UPDATE SET
+                       unidades_compradas = unidades_compradas + excluded.unidades_compradas,
+                       total_gastado = total_gastado + excluded.total_gastado''', (first_id,))
+    costing.receive(cursor, first_id)
+    cursor.execute("SELECT COALESCE(SUM(costo_total), 0) FROM entradas_stock WHERE id > ?", (first_id,))
+    total_gastado = cursor.fetchone()[0]
+    _add_to_day(cursor, fecha, total_gastado=total_gastado)
+    return total_gastado
+
+
+def record_sale_from_cart(cursor: sqlite3.Cursor, fecha: Optional[str] = None, source: str = "ventas_actuales",
+                          ref: Optional[str] = None, costs: str = costing.OUTFLOW) -> Tuple[int, Cents]:
+    """Pasa las líneas del carrito (`source`) al libro como una venta; devuelve (venta_id, total).
+
+    El costo de lo vendido por producto se toma de `costs`, que costing.withdraw llenó en la misma transacción.
+    """
+    fecha = fecha or timestamp()
+    cursor.execute(f"SELECT COALESCE(SUM(subtotal), 0) FROM {source}")
+    total = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO ventas (fecha, total, ref) VALUES (?, ?, ?)", (fecha, total, ref))
+    venta_id = cursor.lastrowid
+    cursor.execute(f'''INSERT INTO venta_lineas (venta_id, producto_id, cantidad, precio_unitario, subtotal, costo)
+                    SELECT ?, s.producto_id, SUM(s.cantidad), MAX(s.precio_unitario), SUM(s.subtotal),
+                           COALESCE((SELECT c.costo FROM {costs} c WHERE c.producto_id = s.producto_id), 0)
+                    FROM {source} s GROUP BY s.producto_id''', (venta_id,))
+    _add_sale_to_summaries(cursor, venta_id, fecha, total)
+    return venta_id, total
+
+
+def record_replicated_sale(cursor: sqlite3.Cursor, fecha: str, total: Cents, ref: str,
+                           lines: Iterable[Tuple[int, int, Cents, Cents, Cents]]) -> Optional[int]:
+    """Registra una venta de otra tienda (producto_id, cantidad, precio, subtotal, costo por línea).
+
+    Solo actualiza el libro y los resúmenes: el stock y los lotes son de la tienda de origen.
+    Devuelve el id de la venta, o None si ya estaba registrada con esa referencia.
+    """
+    cursor.execute("INSERT OR IGNORE INTO ventas (fecha, total, ref) VALUES (?, ?, ?)", (fecha, total, ref))
+    if not cursor.rowcount:
+        return None
+    venta_id = cursor.lastrowid
+    cursor.executemany('''INSERT INTO venta_lineas (venta_id, producto_id, cantidad, precio_unitario, subtotal, costo)
+                       VALUES (?, ?, ?, ?, ?, ?)''', ((venta_id, *line) for line in lines))
+    _add_sale_to_summaries(cursor, venta_id, fecha, total)
+    return venta_id
+
+
+def _add_sale_to_summaries(cursor: sqlite3.Cursor, venta_id: int, fecha: str, total: Cents) -> None:
+    cursor.execute('''INSERT INTO resumen_producto (producto_id, unidades_vendidas, total_ventas, costo_ventas)
+                   SELECT producto_id, cantidad, subtotal, costo FROM venta_lineas WHERE venta_id = ?
+                   ON CONFLICT(producto_id) DO UPDATE SET
+                       unidades_vendidas = unidades_vendidas + excluded.unidades_vendidas,
+                       total_ventas = total_ventas + excluded.total_ventas,
+                       costo_ventas = costo_ventas + excluded.costo_ventas''', (venta_id,))
+    cursor.execute("SELECT COALESCE(SUM(costo), 0) FROM venta_lineas WHERE venta_id = ?", (venta_id,))
+    _add_to_day(cursor, fecha, ventas=1, total_ventas=total, costo_ventas=cursor.fetchone()[0])
+
+
+def sale_records(cursor: sqlite3.Cursor, where: str, params: Sequence = ()) -> List[SaleRecord]:
+    """Ventas que cumplen `where` (sobre ventas v) con sus líneas, en una sola consulta ordenada por venta"""
+    cursor.execute(f'''SELECT v.id, v.fecha, v.ref, v.total,
+                           COALESCE(p.nombre, 'Producto ' || l.producto_id), l.cantidad, l.precio_unitario, l.subtotal
+                    FROM ventas v
+                    JOIN venta_lineas l ON l.venta_id = v.id
+                    LEFT JOIN productos p ON p.id = l.producto_id
+                    WHERE {where} ORDER BY v.id, l.id''', params)
+    records: List[SaleRecord] = []
+    for venta_id, fecha, ref, total, *line in cursor.fetchall():
+        if not records or records[-1].venta_id != venta_id:
+            records.append(SaleRecord(venta_id, fecha, ref, total, []))
+        records[-1].lineas.append(tuple(line))
+    return records
@@ -0,0 +1,92 @@
+import tkinter as tk
+import ttkbootstrap as tb
+from typing import Dict, Iterable, List
+from stock_alerts import COVER_DAYS, VELOCITY_DAYS, LowStockItem, ReorderSuggestion
+
+
+class LowStockWindow(tb.Toplevel):
+    """Productos bajo su mínimo con la reposición sugerida por la velocidad de venta"""
+
+    def __init__(self, parent, db, worker, items: Iterable[LowStockItem]):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.title("Stock bajo y reposición")
+        self.geometry("850x400")
+
+        controls = tb.Frame(self, padding=10)
+        controls.pack(fill=tk.X)
+        self.summary_label = tb.Label(controls, text="", font=("Helvetica", 10, "bold"))
+        self.summary_label.pack(side=tk.LEFT, padx=5)
+        tb.Button(controls, text="Recalcular sugerencias", bootstyle="info-outline",
+                  command=self.load_suggestions).pack(side=tk.RIGHT, padx=5)
+
+        columns = [
+            ("nombre", "Producto", 200),
+            ("cantidad", "Cantidad", 80),
+            ("minimo", "Mínimo", 80),
+            ("desde", "En alerta desde", 140),
+            ("vendidas", f"Vendidas ({VELOCITY_DAYS} días)", 110),
+            ("diaria", "Unid./día", 80),
+            ("sugerido", f"Reponer ({COVER_DAYS} días)", 110),
+        ]
+        self.tree = tb.Treeview(
+            self, columns=[c for c, _t, _w in columns], show="headings", bootstyle="danger"
+        )
+        for col, text, width in columns:
+            self.tree.heading(col, text=text)
+            self.tree.column(col, anchor="center", width=width)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        self._suggestions: Dict[int, ReorderSuggestion] = {}
+        for item in items:
+            self._render(item)
+        self._update_summary()
+        self.load_suggestions()
+
+    def apply(self, changed: Iterable[int], items: List[LowStockItem]) -> None:
+        """Refleja los productos modificados: entran, salen o cambian de cantidad solo esas filas"""
+        if not self.winfo_exists():
+            return
+        current = {item.producto_id for item in items}
+        for product_id in changed:
+            if product_id not in current and self.tree.exists(str(product_id)):
+                self.tree.delete(str(product_id))
+        for item in items:
+            self._render(item)
+        self._update_summary()
+        self.load_suggestions()
+
+    def load_suggestions(self) -> None:
+        """Calcula la reposición en segundo plano; un pedido nuevo reemplaza al pendiente"""
+        self.worker.submit(self.db.get_reorder_suggestions, on_done=self._show_suggestions, key="reorder")
+
+    def _show_suggestions(self, suggestions: List[ReorderSuggestion]) -> None:
+        if not self.winfo_exists():
+            return
+        self._suggestions = {s.producto_id: s for s in suggestions}
+        for iid in self.tree.get_children():
+            values = list(self.tree.item(iid)["values"])
+            values[4:] = self._suggestion_values(int(iid))
+            self.tree.item(iid, values=values)
+        self._update_summary()
+
+    def _render(self, item: LowStockItem) -> None:
+        iid = str(item.producto_id)
+        values = (item.nombre, item.cantidad, item.stock_minimo, item.desde,
+                  *self._suggestion_values(item.producto_id))
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values)
+        else:
+            self.tree.insert("", tk.END, iid=iid, values=values)
+
+    def _suggestion_values(self, product_id: int):
+        suggestion = self._suggestions.get(product_id)
+        if suggestion is None:
+            return "…", "…", "…"
+        return suggestion.vendidas, f"{suggestion.diaria:.2f}", suggestion.sugerido
+
+    def _update_summary(self) -> None:
+        count = len(self.tree.get_children())
+        units = sum(s.sugerido for s in self._suggestions.values() if self.tree.exists(str(s.producto_id)))
+        self.summary_label.config(text=f"{count} productos en alerta  |  {units} unidades a reponer")
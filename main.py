@@ -1,5 +1,25 @@
+import time
+
+STARTED = time.perf_counter()  # Antes de importar Tk: los tiempos de arranque incluyen las importaciones
+
+import argparse
 from inventory_app import InventoryApp
 
 if __name__ == "__main__":
-    app = InventoryApp()
-    app.mainloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sistema de Gestión de Inventario")
+    parser.add_argument("--server", metavar="HOST:PUERTO",
+                        help="Usar un servicio de inventario compartido (pos_server.py) en lugar del archivo local")
+    parser.add_argument("--perfil-arranque", action="store_true",
+                        help="Imprimir en stderr el desglose de tiempos del arranque")
+    args = parser.parse_args()
+
+    db = None
+    if args.server:
+        from pos_client import RemoteDatabase
+        host, _, port = args.server.rpartition(":")
+        db = RemoteDatabase(host or "127.0.0.1", int(port))
+        # Conecta y trae la configuración antes de abrir la ventana: la interfaz la lee desde memoria
+        db.data_version()
+
+    app = InventoryApp(db, started=STARTED, startup_report=args.perfil_arranque)
+    app.mainloop()
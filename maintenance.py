@@ -0,0 +1,355 @@
+import argparse
+import glob
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+from archive import SalesArchive, archive_dir, cutoff_month
+from connection import ConnectionManager
+from constants import DB_NAME
+from ledger import timestamp
+
+# Páginas copiadas por paso del respaldo y pausa entre pasos (las cajas escriben entre medio)
+BACKUP_PAGES = 256
+BACKUP_PAUSE = 0.005
+# Reinicios tolerados (la base cambió durante la copia) antes de copiar el resto de una vez
+MAX_BACKUP_RESTARTS = 3
+# Respaldos que se conservan
+BACKUPS_KEPT = 7
+
+# Páginas liberadas por paso de incremental_vacuum y páginas libres mínimas para compactar
+VACUUM_PAGES = 512
+VACUUM_MIN_FREE = 256
+VACUUM_PAUSE = 0.005
+
+# Entradas del registro de cambios que se conservan, filas borradas por paso y pausa entre pasos
+CHANGE_LOG_RETENTION = 10000
+TRIM_ROWS = 5000
+TRIM_PAUSE = 0.005
+
+# Segundos sin actividad para considerar la caja inactiva
+IDLE_SECONDS = 60
+# Cada cuánto se revisan las tareas pendientes (segundos)
+TICK = 5.0
+
+# Tareas: nombre -> (intervalo en segundos, solo con la caja inactiva)
+TASKS: Dict[str, tuple] = {
+    "respaldo": (4 * 3600, False),
+    "archivo": (24 * 3600, True),
+    "compactación": (6 * 3600, True),
+    "optimización": (3600, True),
+    "registro de cambios": (3600, False),
+}
+
+
+class BackupResult(NamedTuple):
+    """Respaldo terminado"""
+    ruta: str
+    paginas: int
+    reinicios: int
+    segundos: float
+
+
+class TaskStatus(NamedTuple):
+    """Estado de una tarea de mantenimiento para la interfaz"""
+    tarea: str
+    ultima: Optional[str]  # fecha y hora de la última ejecución
+    segundos: float
+    detalle: str
+    error: bool
+    proxima: float  # segundos hasta la próxima ejecución (0: pendiente)
+
+
+class _Cancelled(Exception):
+    """El servicio se está deteniendo"""
+
+
+class _Restart(Exception):
+    """El respaldo por pasos se reinició demasiadas veces"""
+
+
+def backup_dir(db_name: str) -> str:
+    """Carpeta de respaldos junto a la base"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), "respaldos")
+
+
+def backup_database(conn: sqlite3.Connection, dest: str, pages: int = BACKUP_PAGES, pause: float = BACKUP_PAUSE,
+                    progress: Optional[Callable[[float], None]] = None,
+                    cancelled: Callable[[], bool] = lambda: False) -> BackupResult:
+    """Respaldo en línea con la API de backup de SQLite, por pasos de `pages` páginas.
+
+    Escribe en un archivo temporal, verifica la copia (quick_check) y la pone en `dest` con un
+    reemplazo atómico. Si otra conexión escribe durante la copia SQLite la reinicia; tras
+    MAX_BACKUP_RESTARTS reinicios el resto se copia en un solo paso (una lectura consistente
+    que en modo WAL no bloquea a los escritores).
+    """
+    started = time.perf_counter()
+    temp = f"{dest}.tmp"
+    restarts = 0
+    remaining_before = None
+    total_pages = 0
+
+    def step(_status: int, remaining: int, total: int) -> None:
+        nonlocal restarts, remaining_before, total_pages
+        if cancelled():
+            raise _Cancelled()
+        if remaining_before is not None and remaining > remaining_before:
+            restarts += 1
+            if restarts > MAX_BACKUP_RESTARTS:
+                raise _Restart()
+        remaining_before, total_pages = remaining, total
+        if progress is not None and total:
+            progress(1 - remaining / total)
+        time.sleep(pause)
+
+    target = sqlite3.connect(temp)
+    try:
+        try:
+            conn.backup(target, pages=pages, progress=step)
+        except _Restart:
+            conn.backup(target)
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"El respaldo no pasó la verificación: {check}")
+    except BaseException:
+        target.close()
+        os.remove(temp)
+        raise
+    target.close()
+    os.replace(temp, dest)
+    return BackupResult(dest, total_pages, restarts, time.perf_counter() - started)
+
+
+def prune_backups(directory: str, prefix: str, keep: int = BACKUPS_KEPT) -> List[str]:
+    """Borra los respaldos más viejos de la carpeta; devuelve los borrados"""
+    backups = sorted(glob.glob(os.path.join(directory, f"{prefix}-*.db")))
+    removed = backups[:-keep] if keep > 0 else backups
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def compact(conn: sqlite3.Connection, pages: int = VACUUM_PAGES, min_free: int = VACUUM_MIN_FREE,
+            pause: float = VACUUM_PAUSE) -> str:
+    """Devuelve al sistema las páginas libres con incremental_vacuum, por pasos cortos.
+
+    Una base creada sin auto_vacuum se convierte una sola vez con un VACUUM completo.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return "Base convertida a vacuum incremental (VACUUM completo)"
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if free < min_free:
+        return f"{free} páginas libres: nada que compactar"
+    released = 0
+    while (current := conn.execute("PRAGMA freelist_count").fetchone()[0]) > 0:
+        conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+        released += current - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        time.sleep(pause)
+    return f"{released} páginas liberadas"
+
+
+def optimize(conn: sqlite3.Connection) -> str:
+    """PRAGMA optimize (estadísticas del planificador) y checkpoint pasivo del WAL"""
+    conn.execute("PRAGMA optimize")
+    _busy, frames, copied = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    return f"Estadísticas al día; WAL {copied}/{frames} páginas copiadas"
+
+
+def trim_change_log(conn: sqlite3.Connection, keep: int = CHANGE_LOG_RETENTION, rows: int = TRIM_ROWS,
+                    pause: float = TRIM_PAUSE) -> str:
+    """Conserva las últimas `keep` entradas de cambios, borrando por pasos de `rows` filas"""
+    last = conn.execute("SELECT MAX(seq) FROM cambios").fetchone()[0]
+    if last is None:
+        return "Registro de cambios vacío"
+    removed = 0
+    while True:
+        # Cada paso es una transacción corta: las cajas pueden escribir entre medio
+        deleted = conn.execute("""DELETE FROM cambios WHERE seq IN (
+                                      SELECT seq FROM cambios WHERE seq <= ? ORDER BY seq LIMIT ?)""",
+                               (last - keep, rows)).rowcount
+        removed += deleted
+        if deleted < rows:
+            break
+        time.sleep(pause)
+    if not removed:
+        return "Registro de cambios dentro del límite"
+    return f"{removed} entradas antiguas borradas (se conservan {keep})"
+
+
+class MaintenanceService:
+    """Respaldos, archivo de ventas cerradas, compactación, optimización y recorte del registro de
+    cambios en un hilo propio.
+
+    Usa su propia conexión; las tareas pesadas esperan a que `is_idle()` indique que la caja
+    está inactiva y todas avanzan por pasos cortos para no demorar los cobros.
+    """
+
+    def __init__(self, db_name: str, is_idle: Callable[[], bool] = lambda: True,
+                 tasks: Optional[Dict[str, tuple]] = None, tick: float = TICK):
+        self.db_name = db_name
+        self.is_idle = is_idle
+        self.tasks = dict(tasks or TASKS)
+        self.tick = tick
+        self.backups = backup_dir(db_name)
+        self.archive = SalesArchive(archive_dir(db_name))
+        self._prefix = os.path.splitext(os.path.basename(db_name))[0]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._requested: set = set()
+        self._status: Dict[str, TaskStatus] = {}
+        self._last: Dict[str, float] = {name: float("-inf") for name in self.tasks}
+        self._current: Optional[str] = None
+        self._running: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._handlers: Dict[str, Callable[[sqlite3.Connection], str]] = {
+            "respaldo": self._backup,
+            "archivo": self._archive,
+            "compactación": compact,
+            "optimización": optimize,
+            "registro de cambios": trim_change_log,
+        }
+        if (newest := self._newest_backup()) is not None:
+            # Tiempo monotónico equivalente a la fecha del último respaldo
+            self._last["respaldo"] = time.monotonic() - (time.time() - os.path.getmtime(newest))
+
+    def _newest_backup(self) -> Optional[str]:
+        backups = sorted(glob.glob(os.path.join(self.backups, f"{self._prefix}-*.db")))
+        return backups[-1] if backups else None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="mantenimiento", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene el hilo; un respaldo en curso se cancela"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_now(self, task: str) -> None:
+        """Pide ejecutar una tarea en cuanto el hilo esté libre, aunque la caja no esté inactiva"""
+        if task not in self.tasks:
+            raise ValueError(f"Tarea desconocida: {task}")
+        with self._lock:
+            self._requested.add(task)
+        self._wake.set()
+
+    def running(self) -> Optional[str]:
+        """Texto de la tarea en curso (p. ej. 'Respaldo 40%') o None"""
+        return self._running
+
+    def current(self) -> Optional[str]:
+        """Nombre de la tarea en curso o None"""
+        return self._current
+
+    def status(self) -> List[TaskStatus]:
+        """Estado de todas las tareas, en el orden de TASKS"""
+        now = time.monotonic()
+        with self._lock:
+            result = []
+            for name, (interval, _idle) in self.tasks.items():
+                proxima = max(0.0, self._last[name] + interval - now)
+                previous = self._status.get(name)
+                if previous is None:
+                    result.append(TaskStatus(name, None, 0.0, "", False, proxima))
+                else:
+                    result.append(previous._replace(proxima=proxima))
+            return result
+
+    def _run(self) -> None:
+        connections = ConnectionManager(self.db_name)
+        try:
+            while not self._stopping:
+                for name in self._due():
+                    if self._stopping:
+                        break
+                    self._execute(name, connections.connection())
+                self._wake.wait(self.tick)
+                self._wake.clear()
+        finally:
+            connections.close()
+
+    def _due(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            requested, self._requested = self._requested, set()
+        idle = None
+        due = []
+        for name, (interval, needs_idle) in self.tasks.items():
+            if name in requested:
+                due.append(name)
+            elif now - self._last[name] >= interval:
+                if needs_idle and idle is None:
+                    idle = self.is_idle()
+                if not needs_idle or idle:
+                    due.append(name)
+        return due
+
+    def _execute(self, name: str, conn: sqlite3.Connection) -> None:
+        self._current, self._running = name, name.capitalize()
+        started = time.perf_counter()
+        try:
+            detail, error = self._handlers[name](conn), False
+        except _Cancelled:
+            return
+        except (OSError, sqlite3.Error) as e:
+            detail, error = str(e), True
+        finally:
+            self._current = self._running = None
+        with self._lock:
+            self._last[name] = time.monotonic()
+            self._status[name] = TaskStatus(name, timestamp(), time.perf_counter() - started, detail, error, 0.0)
+
+    def _backup(self, conn: sqlite3.Connection) -> str:
+        os.makedirs(self.backups, exist_ok=True)
+        dest = os.path.join(self.backups, f"{self._prefix}-{time.strftime('%Y%m%d-%H%M%S')}.db")
+
+        def progress(done: float) -> None:
+            self._running = f"Respaldo {done * 100:.0f}%"
+
+        result = backup_database(conn, dest, progress=progress, cancelled=lambda: self._stopping)
+        removed = prune_backups(self.backups, self._prefix)
+        detail = f"{os.path.basename(result.ruta)} ({result.paginas} páginas"
+        if result.reinicios:
+            detail += f", {result.reinicios} reinicios"
+        return detail + (f", {len(removed)} antiguos borrados)" if removed else ")")
+
+    def _archive(self, conn: sqlite3.Connection) -> str:
+        months = self.archive.pending_months(conn, cutoff_month())
+        sales = 0
+        for mes in months:
+            if self._stopping:
+                raise _Cancelled()
+            self._running = f"Archivando {mes}"
+            sales += self.archive.archive_month(conn, mes).ventas
+        if not months:
+            return "Sin meses cerrados para archivar"
+        return f"{len(months)} meses archivados ({sales} ventas): {', '.join(months)}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ejecuta una tarea de mantenimiento desde la línea de comandos (p. ej. desde cron)"""
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de inventario")
+    parser.add_argument("tarea", choices=list(TASKS))
+    parser.add_argument("--db", default=DB_NAME, help="Archivo de base de datos")
+    args = parser.parse_args(argv)
+    service = MaintenanceService(args.db)
+    connections = ConnectionManager(args.db)
+    try:
+        service._execute(args.tarea, connections.connection())
+    finally:
+        connections.close()
+    status = next(s for s in service.status() if s.tarea == args.tarea)
+    print(f"{status.tarea}: {status.detalle} ({status.segundos * 1000:.0f} ms)",
+          file=sys.stderr if status.error else sys.stdout)
+    return 1 if status.error else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,512 @@
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from connection import ConnectionManager
+from constants import DB_NAME, IVA_PERCENT
+from money import Money, to_cents
+
+# Cada migración lleva su DDL literal y no llama a los módulos de la aplicación: si estos cambian,
+# el historial del esquema no cambia con ellos. Un cambio de esquema es siempre una migración nueva.
+
+# Día del saldo heredado de la tabla totales en resumen_diario
+LEGACY_DAY = "0000-00-00"
+
+
+def _base_schema(cursor: sqlite3.Cursor) -> None:
+    """Esquema anterior a las migraciones (idempotente: las bases existentes ya lo tienen)"""
+    # Tabla productos con margen_ganancia
+    cursor.execute('''CREATE TABLE IF NOT EXISTS productos
+                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   nombre TEXT NOT NULL UNIQUE,
+                   cantidad INTEGER NOT NULL,
+                   precio REAL NOT NULL,
+                   margen_ganancia REAL NOT NULL)''')
+
+    # Tabla totales (requerida para los cálculos)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS totales
+                   (id INTEGER PRIMARY KEY,
+                   total_ventas REAL DEFAULT 0,
+                   total_gastado REAL DEFAULT 0)''')
+    cursor.execute("INSERT OR IGNORE INTO totales (id) VALUES (1)")
+
+    # Tabla de configuración para IVA
+    cursor.execute('''CREATE TABLE IF NOT EXISTS configuraciones
+                   (clave TEXT PRIMARY KEY,
+                   valor TEXT)''')
+    cursor.execute("INSERT OR IGNORE INTO configuraciones VALUES ('iva_percent', ?)", (str(IVA_PERCENT),))
+
+    # Tabla ventas_actuales
+    cursor.execute('''CREATE TABLE IF NOT EXISTS ventas_actuales
+                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   producto_id INTEGER NOT NULL,
+                   cantidad INTEGER NOT NULL,
+                   precio_unitario REAL NOT NULL,
+                   subtotal REAL NOT NULL,
+                   FOREIGN KEY(producto_id) REFERENCES productos(id))''')
+
+    # Índices para la paginación por clave (columna, id) de la vista de productos
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_productos_cantidad ON productos(cantidad)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_productos_precio ON productos(precio)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_productos_margen ON productos(margen_ganancia)")
+
+    # Registro de cambios alimentado por triggers para el refresco incremental de las vistas
+    cursor.execute('''CREATE TABLE IF NOT EXISTS cambios
+                   (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                   tabla TEXT NOT NULL,
+                   fila_id INTEGER NOT NULL,
+                   op TEXT NOT NULL)''')
+    for tabla, key in (("productos", "id"), ("ventas_actuales", "producto_id")):
+        for op, event, row in (("I", "INSERT", "NEW"), ("U", "UPDATE", "NEW"), ("D", "DELETE", "OLD")):
+            cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{tabla}_{event.lower()}_cambios
+                           AFTER {event} ON {tabla} BEGIN
+                               INSERT INTO cambios (tabla, fila_id, op) VALUES ('{tabla}', {row}.{key}, '{op}');
+                           END''')
+
+    # Índice de búsqueda: prefijo sin distinguir mayúsculas + FTS5 trigram para subcadenas y similares
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_productos_nombre_nocase ON productos(nombre COLLATE NOCASE)")
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'productos_fts'")
+    fts_exists = cursor.fetchone() is not None
+    cursor.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5
+                   (nombre, content='productos', content_rowid='id', tokenize='trigram')''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_productos_insert_fts AFTER INSERT ON productos BEGIN
+                       INSERT INTO productos_fts (rowid, nombre) VALUES (NEW.id, NEW.nombre);
+                   END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_productos_delete_fts AFTER DELETE ON productos BEGIN
+                       INSERT INTO productos_fts (productos_fts, rowid, nombre) VALUES ('delete', OLD.id, OLD.nombre);
+                   END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_productos_update_fts AFTER UPDATE OF nombre ON productos BEGIN
+                       INSERT INTO productos_fts (productos_fts, rowid, nombre) VALUES ('delete', OLD.id, OLD.nombre);
+                       INSERT INTO productos_fts (rowid, nombre) VALUES (NEW.id, NEW.nombre);
+                   END''')
+    if not fts_exists:
+        cursor.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+
+    # Libro de ventas y entradas de stock (solo inserciones) con resúmenes por día y por producto
+    cursor.execute('''CREATE TABLE IF NOT EXISTS ventas
+                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   fecha TEXT NOT NULL,
+                   total REAL NOT NULL)''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha)")
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS venta_lineas
+                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   venta_id INTEGER NOT NULL,
+                   producto_id INTEGER NOT NULL,
+                   cantidad INTEGER NOT NULL,
+                   precio_unitario REAL NOT NULL,
+                   subtotal REAL NOT NULL,
+                   FOREIGN KEY(venta_id) REFERENCES ventas(id))''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_venta_lineas_venta ON venta_lineas(venta_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_venta_lineas_producto ON venta_lineas(producto_id)")
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS entradas_stock
+                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   fecha TEXT NOT NULL,
+                   producto_id INTEGER NOT NULL,
+                   cantidad INTEGER NOT NULL,
+                   costo_unitario REAL NOT NULL,
+                   costo_total REAL NOT NULL)''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_entradas_stock_fecha ON entradas_stock(fecha)")
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'resumen_diario'")
+    resumen_exists = cursor.fetchone() is not None
+    cursor.execute('''CREATE TABLE IF NOT EXISTS resumen_diario
+                   (dia TEXT PRIMARY KEY,
+                   num_ventas INTEGER NOT NULL DEFAULT 0,
+                   total_ventas REAL NOT NULL DEFAULT 0,
+                   total_gastado REAL NOT NULL DEFAULT 0)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS resumen_producto
+                   (producto_id INTEGER PRIMARY KEY,
+                   unidades_vendidas INTEGER NOT NULL DEFAULT 0,
+                   total_ventas REAL NOT NULL DEFAULT 0,
+                   unidades_compradas INTEGER NOT NULL DEFAULT 0,
+                   total_gastado REAL NOT NULL DEFAULT 0)''')
+    if not resumen_exists:
+        # Conserva los acumulados históricos de la tabla totales
+        cursor.execute('''INSERT INTO resumen_diario (dia, total_ventas, total_gastado)
+                       SELECT ?, total_ventas, total_gastado FROM totales WHERE id = 1''', (LEGACY_DAY,))
+
+
+def _unique_cart_line(cursor: sqlite3.Cursor) -> None:
+    """Una línea de carrito por producto: fusiona duplicados y agrega la restricción UNIQUE"""
+    cursor.execute('''UPDATE ventas_actuales SET
+                       cantidad = (SELECT SUM(cantidad) FROM ventas_actuales d
+                                   WHERE d.producto_id = ventas_actuales.producto_id),
+                       subtotal = (SELECT SUM(subtotal) FROM ventas_actuales d
+                                   WHERE d.producto_id = ventas_actuales.producto_id)
+                   WHERE producto_id IN (SELECT producto_id FROM ventas_actuales
+                                         GROUP BY producto_id HAVING COUNT(*) > 1)''')
+    cursor.execute('''DELETE FROM ventas_actuales WHERE id NOT IN
+                       (SELECT MIN(id) FROM ventas_actuales GROUP BY producto_id)''')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ventas_actuales_producto ON ventas_actuales(producto_id)")
+
+
+def _stock_indexes(cursor: sqlite3.Cursor) -> None:
+    """Índice del historial de entradas por producto (idx_productos_cantidad ya está en el esquema base)"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_entradas_stock_producto ON entradas_stock(producto_id)")
+
+
+def _sale_reference(cursor: sqlite3.Cursor) -> None:
+    """Referencia única por venta para que el cobro de un carrito en memoria sea idempotente"""
+    cursor.execute("ALTER TABLE ventas ADD COLUMN ref TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ventas_ref ON ventas(ref) WHERE ref IS NOT NULL")
+
+
+def _barcode(cursor: sqlite3.Cursor) -> None:
+    """Código de barras / SKU opcional y único por producto"""
+    cursor.execute("ALTER TABLE productos ADD COLUMN codigo_barras TEXT")
+    cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_codigo_barras
+                   ON productos(codigo_barras) WHERE codigo_barras IS NOT NULL''')
+
+
+def _rebuild_table(cursor: sqlite3.Cursor, table: str, types: Dict[str, str], expressions: Dict[str, str]) -> None:
+    """Reconstruye una tabla con otros tipos de columna (SQLite no tiene ALTER COLUMN).
+
+    Tabla nueva, copia con `expressions` por columna, borrado, renombre y recreación de
+    índices y triggers; conserva los id y la secuencia de AUTOINCREMENT.
+    """
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    sql = cursor.fetchone()[0]
+    cursor.execute("""SELECT sql FROM sqlite_master
+                   WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL""", (table,))
+    dependents = [row[0] for row in cursor.fetchall()]
+    for column, new_type in types.items():
+        sql, found = re.subn(rf"\b{column}\s+\w+", f"{column} {new_type}", sql, count=1)
+        if not found:
+            raise RuntimeError(f"No se encontró la columna {table}.{column}")
+    temp = f"{table}_nueva"
+    sql = re.sub(r"^CREATE TABLE\s+\S+", f"CREATE TABLE {temp}", sql)
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+    sequence = cursor.fetchone()
+    cursor.execute(sql)
+    cursor.execute(f"INSERT INTO {temp} ({', '.join(columns)}) "
+                   f"SELECT {', '.join(expressions.get(c, c) for c in columns)} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {temp} RENAME TO {table}")
+    if sequence is not None:
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, sequence[0]))
+    for statement in dependents:
+        cursor.execute(statement)
+
+
+# Importes que pasan de REAL a centavos INTEGER
+MONEY_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "productos": ("precio",),
+    "totales": ("total_ventas", "total_gastado"),
+    "ventas_actuales": ("precio_unitario", "subtotal"),
+    "ventas": ("total",),
+    "venta_lineas": ("precio_unitario", "subtotal"),
+    "entradas_stock": ("costo_unitario", "costo_total"),
+    "resumen_diario": ("total_ventas", "total_gastado"),
+    "resumen_producto": ("total_ventas", "total_gastado"),
+}
+
+
+def _integer_cents(cursor: sqlite3.Cursor) -> None:
+    """Importes en centavos enteros: sumas exactas en SQL sin deriva de punto flotante"""
+    # Mismo redondeo (bancario) que money.Money.parse
+    cursor.connection.create_function("centavos", 1, lambda value: None if value is None else to_cents(value),
+                                      deterministic=True)
+    for table, columns in MONEY_COLUMNS.items():
+        _rebuild_table(cursor, table, {c: "INTEGER" for c in columns}, {c: f"centavos({c})" for c in columns})
+
+
+def _cost_layers(cursor: sqlite3.Cursor) -> None:
+    """Lotes de costo, valor del stock por producto y costo de lo vendido guardado por línea.
+
+    El stock existente queda en un lote por producto al costo promedio de compra del historial
+    (o al que se deriva del precio y el margen); las ventas pasadas se costean a ese mismo promedio.
+    """
+    cursor.execute("ALTER TABLE productos ADD COLUMN valor_stock INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE venta_lineas ADD COLUMN costo INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE resumen_producto ADD COLUMN costo_ventas INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE resumen_diario ADD COLUMN costo_ventas INTEGER NOT NULL DEFAULT 0")
+    cursor.execute('''CREATE TABLE IF NOT EXISTS lotes_stock
+                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   producto_id INTEGER NOT NULL,
+                   entrada_id INTEGER,
+                   fecha TEXT NOT NULL,
+                   cantidad INTEGER NOT NULL,
+                   restante INTEGER NOT NULL,
+                   costo_unitario INTEGER NOT NULL)''')
+    # Solo los lotes con unidades: los agotados no se vuelven a leer
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_lotes_stock_abiertos
+                   ON lotes_stock(producto_id, id) WHERE restante > 0''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_productos_delete_lotes AFTER DELETE ON productos BEGIN
+                       DELETE FROM lotes_stock WHERE producto_id = OLD.id;
+                   END''')
+
+    # Costo desde el precio y el margen: precio / (1 + margen/100) con redondeo bancario
+    cursor.connection.create_function(
+        "costo_unitario", 2, lambda precio, margen: Money(precio).without_margin(margen).cents, deterministic=True)
+    cursor.execute('''CREATE TEMP TABLE costo_inicial AS
+                   SELECT p.id AS producto_id,
+                          CASE WHEN r.unidades_compradas > 0
+                               THEN (r.total_gastado + r.unidades_compradas / 2) / r.unidades_compradas
+                               ELSE costo_unitario(p.precio, p.margen_ganancia) END AS costo
+                   FROM productos p LEFT JOIN resumen_producto r ON r.producto_id = p.id''')
+    cursor.execute('''INSERT INTO lotes_stock (producto_id, fecha, cantidad, restante, costo_unitario)
+                   SELECT p.id, ?, p.cantidad, p.cantidad, c.costo
+                   FROM productos p JOIN temp.costo_inicial c ON c.producto_id = p.id
+                   WHERE p.cantidad > 0''', (datetime.now().isoformat(sep=" ", timespec="seconds"),))
+    cursor.execute('''UPDATE productos SET valor_stock = MAX(cantidad, 0) *
+                       (SELECT costo FROM temp.costo_inicial WHERE producto_id = productos.id)''')
+
+    cursor.execute('''UPDATE venta_lineas SET costo = cantidad *
+                       COALESCE((SELECT costo FROM temp.costo_inicial WHERE producto_id = venta_lineas.producto_id), 0)''')
+    cursor.execute('''UPDATE resumen_producto SET costo_ventas =
+                       (SELECT COALESCE(SUM(costo), 0) FROM venta_lineas WHERE producto_id = resumen_producto.producto_id)''')
+    cursor.execute('''UPDATE resumen_diario SET costo_ventas =
+                       (SELECT COALESCE(SUM(l.costo), 0) FROM ventas v JOIN venta_lineas l ON l.venta_id = v.id
+                        WHERE v.fecha >= resumen_diario.dia AND v.fecha < date(resumen_diario.dia, '+1 day'))
+                   WHERE dia <> ?''', (LEGACY_DAY,))
+    # El saldo heredado no tiene líneas: conserva la ganancia que mostraba la versión anterior
+    cursor.execute("UPDATE resumen_diario SET costo_ventas = total_gastado WHERE dia = ?", (LEGACY_DAY,))
+    cursor.execute("DROP TABLE temp.costo_inicial")
+
+
+def _low_stock(cursor: sqlite3.Cursor) -> None:
+    """Stock mínimo por producto y lista de alertas mantenida por triggers"""
+    cursor.execute("ALTER TABLE productos ADD COLUMN stock_minimo INTEGER NOT NULL DEFAULT 0")
+    cursor.execute('''CREATE TABLE IF NOT EXISTS stock_bajo
+                   (producto_id INTEGER PRIMARY KEY,
+                   desde TEXT NOT NULL)''')
+    # Los triggers solo escriben cuando un producto cruza su mínimo (tiene mínimo y no lo supera)
+    low = "{row}.stock_minimo > 0 AND {row}.cantidad <= {row}.stock_minimo"
+    new_low, old_low = low.format(row="NEW"), low.format(row="OLD")
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_productos_insert_stock_bajo
+                   AFTER INSERT ON productos WHEN {new_low} BEGIN
+                       INSERT OR IGNORE INTO stock_bajo VALUES (NEW.id, datetime('now', 'localtime'));
+                   END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_productos_update_stock_bajo
+                   AFTER UPDATE OF cantidad, stock_minimo ON productos WHEN ({new_low}) AND NOT ({old_low}) BEGIN
+                       INSERT OR IGNORE INTO stock_bajo VALUES (NEW.id, datetime('now', 'localtime'));
+                   END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_productos_update_stock_repuesto
+                   AFTER UPDATE OF cantidad, stock_minimo ON productos WHEN ({old_low}) AND NOT ({new_low}) BEGIN
+                       DELETE FROM stock_bajo WHERE producto_id = NEW.id;
+                   END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_productos_delete_stock_bajo
+                   AFTER DELETE ON productos WHEN {old_low} BEGIN
+                       DELETE FROM stock_bajo WHERE producto_id = OLD.id;
+                   END''')
+    cursor.execute(f"INSERT INTO stock_bajo (producto_id, desde) "
+                   f"SELECT id, datetime('now', 'localtime') FROM productos p WHERE {low.format(row='p')}")
+
+
+def _replication(cursor: sqlite3.Cursor) -> None:
+    """Identificador global de producto y registro de cambios para replicar entre tiendas"""
+    cursor.execute("ALTER TABLE productos ADD COLUMN uid TEXT")
+    cursor.execute("UPDATE productos SET uid = lower(hex(randomblob(16)))")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_uid ON productos(uid)")
+    # Una fila por clave (la última versión): un paquete lleva cada producto o venta una sola vez
+    cursor.execute('''CREATE TABLE IF NOT EXISTS replica_estado
+                   (id INTEGER PRIMARY KEY CHECK (id = 1),
+                   tienda TEXT NOT NULL,
+                   reloj INTEGER NOT NULL DEFAULT 0,
+                   seq INTEGER NOT NULL DEFAULT 0,
+                   aplicando INTEGER NOT NULL DEFAULT 0)''')
+    cursor.execute("INSERT OR IGNORE INTO replica_estado (id, tienda) VALUES (1, lower(hex(randomblob(4))))")
+    cursor.execute('''CREATE TABLE IF NOT EXISTS replica_cambios
+                   (tabla TEXT NOT NULL,
+                   clave TEXT NOT NULL,
+                   fila_id INTEGER NOT NULL,
+                   seq INTEGER NOT NULL,
+                   reloj INTEGER NOT NULL,
+                   tienda TEXT NOT NULL,
+                   borrado INTEGER NOT NULL DEFAULT 0,
+                   PRIMARY KEY (tabla, clave)) WITHOUT ROWID''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_replica_cambios_seq ON replica_cambios(seq)")
+    # Marcas de agua por tienda vecina: último seq propio exportado y último seq suyo importado
+    cursor.execute('''CREATE TABLE IF NOT EXISTS replica_pares
+                   (tienda TEXT PRIMARY KEY,
+                   enviado INTEGER NOT NULL DEFAULT 0,
+                   recibido INTEGER NOT NULL DEFAULT 0)''')
+
+    # Cada cambio local se registra con la marca de la tienda (reloj de Lamport + 1); durante una
+    # importación (aplicando = 1) no: lo hace el importador con la marca de la tienda de origen
+    log_change = '''UPDATE replica_estado SET reloj = reloj + 1, seq = seq + 1;
+                 INSERT INTO replica_cambios (tabla, clave, fila_id, seq, reloj, tienda, borrado)
+                 SELECT '{tabla}', {clave}, {fila}, seq, reloj, tienda, {borrado} FROM replica_estado WHERE true
+                 ON CONFLICT (tabla, clave) DO UPDATE SET
+                     fila_id = excluded.fila_id, seq = excluded.seq, reloj = excluded.reloj,
+                     tienda = excluded.tienda, borrado = excluded.borrado;'''
+    local = "(SELECT aplicando FROM replica_estado) = 0"
+    catalog = ("nombre", "precio", "margen_ganancia", "codigo_barras")
+    changed = " OR ".join(f"NEW.{c} IS NOT OLD.{c}" for c in catalog)
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_productos_insert_replica
+                   AFTER INSERT ON productos WHEN {local} BEGIN
+                       UPDATE productos SET uid = lower(hex(randomblob(16))) WHERE id = NEW.id AND uid IS NULL;
+                       {log_change.format(tabla="productos", clave="(SELECT uid FROM productos WHERE id = NEW.id)",
+                                          fila="NEW.id", borrado=0)}
+                   END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_productos_update_replica
+                   AFTER UPDATE OF {", ".join(catalog)} ON productos WHEN {local} AND ({changed}) BEGIN
+                       {log_change.format(tabla="productos", clave="NEW.uid", fila="NEW.id", borrado=0)}
+                   END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_productos_delete_replica
+                   AFTER DELETE ON productos WHEN {local} BEGIN
+                       {log_change.format(tabla="productos", clave="OLD.uid", fila="OLD.id", borrado=1)}
+                   END''')
+    # Las ventas solo se insertan: basta con registrar las propias
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_ventas_insert_replica
+                   AFTER INSERT ON ventas WHEN {local} BEGIN
+                       {log_change.format(tabla="ventas", clave="COALESCE(NEW.ref, tienda || ':' || NEW.id)",
+                                          fila="NEW.id", borrado=0)}
+                   END''')
+
+    # El catálogo y las ventas existentes entran al registro para que el primer paquete los lleve completos
+    cursor.execute('''INSERT OR IGNORE INTO replica_cambios (tabla, clave, fila_id, seq, reloj, tienda)
+                   SELECT 'productos', p.uid, p.id, e.seq + ROW_NUMBER() OVER (ORDER BY p.id), e.reloj + 1, e.tienda
+                   FROM productos p, replica_estado e''')
+    cursor.execute('''INSERT OR IGNORE INTO replica_cambios (tabla, clave, fila_id, seq, reloj, tienda)
+                   SELECT 'ventas', COALESCE(v.ref, e.tienda || ':' || v.id), v.id,
+                          e.seq + (SELECT COUNT(*) FROM productos) + ROW_NUMBER() OVER (ORDER BY v.id),
+                          e.reloj + 1, e.tienda
+                   FROM ventas v, replica_estado e''')
+    cursor.execute('''UPDATE replica_estado SET reloj = reloj + 1,
+                       seq = COALESCE((SELECT MAX(seq) FROM replica_cambios), seq)''')
+
+
+def _bulk_operations(cursor: sqlite3.Cursor) -> None:
+    """Historial de operaciones masivas con los valores previos de cada producto para deshacerlas"""
+    cursor.execute('''CREATE TABLE IF NOT EXISTS operaciones_masivas
+                   (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   fecha TEXT NOT NULL,
+                   tipo TEXT NOT NULL,
+                   valor REAL NOT NULL,
+                   descripcion TEXT NOT NULL,
+                   productos INTEGER NOT NULL DEFAULT 0,
+                   deshecha TEXT)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS operaciones_masivas_filas
+                   (operacion_id INTEGER NOT NULL,
+                   producto_id INTEGER NOT NULL,
+                   precio_antes INTEGER NOT NULL,
+                   precio_despues INTEGER NOT NULL,
+                   margen_antes REAL NOT NULL,
+                   margen_despues REAL NOT NULL,
+                   cantidad_antes INTEGER NOT NULL,
+                   cantidad_despues INTEGER NOT NULL,
+                   costo INTEGER NOT NULL DEFAULT 0,
+                   PRIMARY KEY (operacion_id, producto_id)) WITHOUT ROWID''')
+
+
+def _inventory_value(cursor: sqlite3.Cursor) -> None:
+    """Valor total del stock en una fila mantenida por triggers: los totales no recorren productos"""
+    cursor.execute('''CREATE TABLE IF NOT EXISTS resumen_inventario
+                   (id INTEGER PRIMARY KEY CHECK (id = 1),
+                   valor_stock INTEGER NOT NULL)''')
+    cursor.execute("INSERT OR REPLACE INTO resumen_inventario SELECT 1, COALESCE(SUM(valor_stock), 0) FROM productos")
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_productos_insert_valor
+                   AFTER INSERT ON productos WHEN NEW.valor_stock <> 0 BEGIN
+                       UPDATE resumen_inventario SET valor_stock = valor_stock + NEW.valor_stock;
+                   END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_productos_update_valor
+                   AFTER UPDATE OF valor_stock ON productos WHEN NEW.valor_stock <> OLD.valor_stock BEGIN
+                       UPDATE resumen_inventario SET valor_stock = valor_stock + NEW.valor_stock - OLD.valor_stock;
+                   END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_productos_delete_valor
+                   AFTER DELETE ON productos WHEN OLD.valor_stock <> 0 BEGIN
+                       UPDATE resumen_inventario SET valor_stock = valor_stock - OLD.valor_stock;
+                   END''')
+
+
+# Migraciones en orden; la versión del esquema (PRAGMA user_version) es la cantidad aplicada
+MIGRATIONS: List[Tuple[str, Callable[[sqlite3.Cursor], None]]] = [
+    ("esquema base", _base_schema),
+    ("línea única por producto en el carrito", _unique_cart_line),
+    ("índice de entradas por producto", _stock_indexes),
+    ("referencia de venta", _sale_reference),
+    ("código de barras", _barcode),
+    ("importes en centavos", _integer_cents),
+    ("lotes y costo de lo vendido", _cost_layers),
+    ("stock mínimo y alertas", _low_stock),
+    ("replicación entre tiendas", _replication),
+    ("operaciones masivas", _bulk_operations),
+    ("valor del inventario acumulado", _inventory_value),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Versión del esquema guardada en la cabecera de la base"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(connections: ConnectionManager, target: int = SCHEMA_VERSION) -> List[str]:
+    """Aplica las migraciones pendientes, cada una en su transacción; devuelve las aplicadas"""
+    version = schema_version(connections.connection())
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"La base tiene el esquema {version}, más nuevo que el de esta versión ({SCHEMA_VERSION})")
+    applied = []
+    while version < target:
+        with connections.transaction() as conn:
+            # Otro proceso pudo migrar mientras se esperaba el bloqueo de escritura
+            version = schema_version(conn)
+            if version >= target:
+                break
+            name, migration = MIGRATIONS[version]
+            migration(conn.cursor())
+            version += 1
+            conn.execute(f"PRAGMA user_version = {version}")
+        applied.append(name)
+    return applied
+
+
+# Consultas frecuentes y el índice que deben usar según EXPLAIN QUERY PLAN
+HOT_QUERIES: List[Tuple[str, str, Sequence]] = [
+    ("SELECT precio FROM productos WHERE id = ?", "INTEGER PRIMARY KEY", (1,)),
+    ("SELECT id FROM productos WHERE nombre = ?", "sqlite_autoindex_productos_1", ("x",)),
+    ("SELECT id FROM productos WHERE cantidad <= ?", "idx_productos_cantidad", (5,)),
+    ("SELECT cantidad FROM ventas_actuales WHERE producto_id = ?", "idx_ventas_actuales_producto", (1,)),
+    ("SELECT id FROM venta_lineas WHERE venta_id = ?", "idx_venta_lineas_venta", (1,)),
+    ("SELECT id FROM venta_lineas WHERE producto_id = ?", "idx_venta_lineas_producto", (1,)),
+    ("SELECT id FROM entradas_stock WHERE producto_id = ?", "idx_entradas_stock_producto", (1,)),
+    ("SELECT id FROM ventas WHERE fecha >= ?", "idx_ventas_fecha", ("2024-01-01",)),
+    ("SELECT id FROM productos WHERE codigo_barras = ?", "idx_productos_codigo_barras", ("7790001",)),
+    ("SELECT id FROM lotes_stock WHERE producto_id = ? AND restante > 0", "idx_lotes_stock_abiertos", (1,)),
+    ("SELECT cantidad FROM venta_lineas WHERE producto_id = ? AND id >= ?", "idx_venta_lineas_producto", (1, 1)),
+    ("SELECT id FROM productos WHERE uid = ?", "idx_productos_uid", ("x",)),
+    ("SELECT clave FROM replica_cambios WHERE seq > ?", "idx_replica_cambios_seq", (0,)),
+]
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    """Líneas de EXPLAIN QUERY PLAN de una consulta"""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_query_plans(conn: sqlite3.Connection,
+                      queries: Sequence[Tuple[str, str, Sequence]] = HOT_QUERIES) -> List[str]:
+    """Devuelve los problemas encontrados: consultas frecuentes que recorren la tabla sin su índice"""
+    problems = []
+    for sql, index, params in queries:
+        plan = query_plan(conn, sql, params)
+        if not any(index in line for line in plan):
+            problems.append(f"{sql}\n    esperado: {index}\n    plan: {' | '.join(plan)}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Migra la base indicada y verifica los planes de las consultas frecuentes"""
+    db_name = (argv if argv is not None else sys.argv[1:] or [DB_NAME])[0]
+    connections = ConnectionManager(db_name)
+    try:
+        for name in migrate(connections):
+            print(f"Migración aplicada: {name}")
+        print(f"Esquema en versión {schema_version(connections.connection())}")
+        problems = check_query_plans(connections.connection())
+    finally:
+        connections.close()
+    for problem in problems:
+        print(f"Sin índice: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import sqlite3
+from fractions import Fraction
+from functools import lru_cache
+from typing import Tuple, Union
+
+# Importes guardados y transmitidos como enteros en centavos (unidad mínima de la moneda)
+Cents = int
+
+CENTS_PER_UNIT = 100
+
+
+def _rate(value: Union[int, float, str, Fraction]) -> Fraction:
+    """Tasa o cantidad decimal exacta (los float se toman por su representación corta: 0.19 -> 19/100)"""
+    if isinstance(value, (int, Fraction)):
+        return Fraction(value)
+    return Fraction(str(value).strip())
+
+
+@lru_cache(maxsize=256)
+def _ratio(value: Union[int, float, str, Fraction]) -> Tuple[int, int]:
+    """(numerador, denominador) de una tasa; las tasas (IVA, márgenes) se repiten mucho"""
+    rate = _rate(value)
+    return rate.numerator, rate.denominator
+
+
+@lru_cache(maxsize=256)
+def _margin(margen_pct: Union[float, str, Fraction]) -> Tuple[int, int]:
+    """(numerador, denominador) de un margen porcentual; debe ser mayor que -100 %"""
+    numerator, denominator = _ratio(margen_pct)
+    if 100 * denominator + numerator <= 0:
+        raise ValueError(f"El margen de ganancia debe ser mayor que -100% (se recibió {margen_pct}%)")
+    return numerator, denominator
+
+
+def _round_half_even(numerator: int, denominator: int) -> int:
+    """numerator / denominator redondeado al entero con mitades al par, en aritmética entera"""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+class Money:
+    """Importe exacto en centavos; inmutable y con redondeo bancario al centavo"""
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents: Cents = 0):
+        if not isinstance(cents, int):
+            raise TypeError(f"Money espera centavos enteros, no {type(cents).__name__}")
+        _set_cents(self, cents)
+
+    @classmethod
+    def _of(cls, cents: int) -> "Money":
+        """Constructor interno sin validación (los resultados de la aritmética ya son enteros)"""
+        money = _new(cls)
+        _set_cents(money, cents)
+        return money
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Money es inmutable")
+
+    @classmethod
+    def parse(cls, value: Union[int, float, str, Fraction]) -> "Money":
+        """Importe en unidades ('12.50', 12.5) redondeado al centavo (mitades al par)"""
+        try:
+            if isinstance(value, str) and "/" in value:
+                raise ValueError(value)  # Fraction acepta "1/3", que no es un importe
+            amount = _rate(value)
+        except (ValueError, ZeroDivisionError):
+            raise ValueError(f"Importe inválido: {value!r}") from None
+        return cls._of(_round_half_even(amount.numerator * CENTS_PER_UNIT, amount.denominator))
+
+    # Aritmética exacta
+
+    def __add__(self, other: "Money") -> "Money":
+        if isinstance(other, Money):
+            return Money._of(self.cents + other.cents)
+        return NotImplemented
+
+    def __radd__(self, other) -> "Money":
+        # sum() empieza en 0
+        if other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other: "Money") -> "Money":
+        if isinstance(other, Money):
+            return Money._of(self.cents - other.cents)
+        return NotImplemented
+
+    def __neg__(self) -> "Money":
+        return Money._of(-self.cents)
+
+    def __mul__(self, quantity: int) -> "Money":
+        """Por una cantidad entera de unidades (para tasas, usar percent/scale)"""
+        if isinstance(quantity, int):
+            return Money._of(self.cents * quantity)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def scale(self, factor: Union[int, float, str, Fraction]) -> "Money":
+        """Multiplica por un factor decimal y redondea al centavo con redondeo bancario"""
+        numerator, denominator = _ratio(factor)
+        return Money._of(_round_half_even(self.cents * numerator, denominator))
+
+    def percent(self, rate: Union[float, str, Fraction]) -> "Money":
+        """Porción del importe a una tasa (0.19 para IVA 19%), redondeada al centavo"""
+        return self.scale(rate)
+
+    def without_margin(self, margen_pct: Union[float, str, Fraction]) -> "Money":
+        """Costo de un precio que incluye un margen porcentual: precio / (1 + margen/100)"""
+        numerator, denominator = _margin(margen_pct)
+        # precio / (1 + n/(100 d)) = precio * 100 d / (100 d + n)
+        return Money._of(_round_half_even(self.cents * 100 * denominator, 100 * denominator + numerator))
+
+    def with_margin(self, margen_pct: Union[float, str, Fraction]) -> "Money":
+        """Importe más un porcentaje (negativo para rebajar, hasta menos del 100 %): costo * (1 + margen/100)"""
+        numerator, denominator = _margin(margen_pct)
+        return Money._of(_round_half_even(self.cents * (100 * denominator + numerator), 100 * denominator))
+
+    # Comparación y conversión
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Money) and self.cents == other.cents
+
+    def __lt__(self, other: "Money") -> bool:
+        return self.cents < other.cents
+
+    def __le__(self, other: "Money") -> bool:
+        return self.cents <= other.cents
+
+    def __gt__(self, other: "Money") -> bool:
+        return self.cents > other.cents
+
+    def __ge__(self, other: "Money") -> bool:
+        return self.cents >= other.cents
+
+    def __hash__(self) -> int:
+        return hash(self.cents)
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    def __float__(self) -> float:
+        return self.cents / CENTS_PER_UNIT
+
+    def __str__(self) -> str:
+        sign = "-" if self.cents < 0 else ""
+        units, cents = divmod(abs(self.cents), CENTS_PER_UNIT)
+        return f"{sign}{units}.{cents:02d}"
+
+    def __repr__(self) -> str:
+        return f"Money({self.cents})"
+
+
+_new = object.__new__
+_set_cents = Money.cents.__set__
+
+
+def to_cents(value: Union[int, float, str, Fraction]) -> Cents:
+    """Centavos de un importe en unidades ('12.50' -> 1250)"""
+    return Money.parse(value).cents
+
+
+# Un Money se puede pasar directamente como parámetro de sqlite3 (se guarda en centavos)
+sqlite3.register_adapter(Money, lambda money: money.cents)
@@ -0,0 +1,278 @@
+import itertools
+import json
+import socket
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import bulk_ops
+from bulk_ops import BulkChange, BulkOperation, BulkPreview, BulkResult, ProductFilter
+from checkout import InsufficientStockError
+from database import ChangeSet, Totals
+from ledger import SaleRecord
+from money import Cents
+from pos_server import DEFAULT_HOST, DEFAULT_PORT
+from stock_alerts import COVER_DAYS, VELOCITY_DAYS, LowStockItem, ReorderSuggestion
+
+# Excepciones que se vuelven a lanzar en el cliente con su tipo original
+ERRORS: Dict[str, Callable[[str], BaseException]] = {
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "TypeError": TypeError,
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+}
+
+
+class RemoteError(RuntimeError):
+    """Error del servicio de inventario sin equivalente local"""
+
+
+def _rows(value: List[List[Any]]) -> List[Tuple]:
+    return [tuple(row) for row in value]
+
+
+def _row(value: Optional[List[Any]]) -> Optional[Tuple]:
+    return tuple(value) if value is not None else None
+
+
+def _sale_record(value: Optional[List[Any]]) -> Optional[SaleRecord]:
+    if value is None:
+        return None
+    venta_id, fecha, ref, total, lineas, iva_percent = value
+    return SaleRecord(venta_id, fecha, ref, total, _rows(lineas), iva_percent)
+
+
+class RemoteDatabase:
+    """Cliente de pos_server con la misma interfaz que DatabaseManager (una conexión por hilo)"""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sockets: List[socket.socket] = []
+        self._ids = itertools.count(1)
+        # IVA y método de costeo en memoria: la interfaz los lee en cada cambio del carrito y no puede
+        # esperar la red. Se renuevan con cada data_version (el sondeo de la interfaz, en el hilo de trabajo)
+        self._settings: Dict[str, Any] = {}
+
+    def _stream(self):
+        stream = getattr(self._local, "stream", None)
+        if stream is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._sockets.append(sock)
+            stream = self._local.stream = sock.makefile("rwb")
+        return stream
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        """Invoca un método del servicio y espera su respuesta"""
+        request_id = next(self._ids)
+        stream = self._stream()
+        try:
+            stream.write(json.dumps({"id": request_id, "method": method, "args": args, "kwargs": kwargs}).encode()
+                         + b"\n")
+            stream.flush()
+            line = stream.readline()
+        except OSError:
+            self._local.stream = None
+            raise
+        if not line:
+            self._local.stream = None
+            raise ConnectionError("El servicio de inventario cerró la conexión")
+        response = json.loads(line)
+        if "error" in response:
+            error = response["error"]
+            if error["type"] == "InsufficientStockError":
+                raise InsufficientStockError([tuple(s) for s in error["shortages"]])
+            raise ERRORS.get(error["type"], RemoteError)(error["message"])
+        return response["result"]
+
+    def close(self) -> None:
+        """Cierra las conexiones de todos los hilos"""
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            sock.close()
+        self._local = threading.local()
+
+    # Escrituras (el servicio las serializa y agrupa las del carrito)
+
+    def add_or_update_product(self, nombre: str, cantidad: int, precio: Cents, margen_ganancia: float) -> int:
+        return self.call("add_or_update_product", nombre, cantidad, precio, margen_ganancia)
+
+    def save_product(self, product_id: Optional[int], nombre: str, cantidad: int, precio: Cents,
+                     margen_ganancia: float, codigo_barras: Optional[str] = None,
+                     stock_minimo: Optional[int] = None) -> int:
+        return self.call("save_product", product_id, nombre, cantidad, precio, margen_ganancia, codigo_barras,
+                         stock_minimo)
+
+    def update_product(self, product_id: int, nombre: str, cantidad: int, precio: Cents, margen_ganancia: float) -> None:
+        self.call("update_product", product_id, nombre, cantidad, precio, margen_ganancia)
+
+    def set_barcode(self, product_id: int, codigo_barras: Optional[str]) -> None:
+        self.call("set_barcode", product_id, codigo_barras)
+
+    def set_stock_minimum(self, product_id: int, stock_minimo: int) -> None:
+        self.call("set_stock_minimum", product_id, stock_minimo)
+
+    def bulk_upsert_products(self, rows) -> int:
+        return self.call("bulk_upsert_products", [tuple(row) for row in rows])
+
+    def apply_bulk(self, tipo: str, valor: float, filtro: ProductFilter = ProductFilter()) -> BulkResult:
+        return BulkResult(*self.call("apply_bulk", tipo, valor, filtro))
+
+    def undo_bulk(self, operacion_id: Optional[int] = None) -> BulkResult:
+        return BulkResult(*self.call("undo_bulk", operacion_id))
+
+    def delete_product(self, product_id: int) -> None:
+        self.call("delete_product", product_id)
+
+    def add_to_current_sales(self, product_id: int, cantidad: int = 1) -> None:
+        self.call("add_to_current_sales", product_id, cantidad)
+
+    def clear_current_sales(self) -> None:
+        self.call("clear_current_sales")
+
+    def process_sale(self) -> Cents:
+        return self.call("process_sale")
+
+    def process_cart(self, lines, ref: Optional[str] = None) -> Cents:
+        return self.call("process_cart", [tuple(line) for line in lines], ref)
+
+    def process_cart_record(self, lines, ref: Optional[str] = None) -> Optional[SaleRecord]:
+        return _sale_record(self.call("process_cart_record", [tuple(line) for line in lines], ref))
+
+    def update_iva_percent(self, new_value: float) -> None:
+        self.call("update_iva_percent", new_value)
+        self._cache_settings(iva_percent=float(new_value))
+
+    def set_costing_method(self, method: str) -> None:
+        self.call("set_costing_method", method)
+        self._cache_settings(metodo_costo=method)
+
+    # Lecturas
+
+    def iter_products(self, batch_size: int = 1000) -> Iterator[Tuple[int, str, int, Cents, float]]:
+        after = None
+        while batch := self.get_products_page("id", after, batch_size):
+            yield from batch
+            after = (batch[-1][0],)
+
+    def iter_report_lines(self, referencia: str, desde: str, hasta: str,
+                          batch_size: int = 50000) -> Iterator[Tuple[int, int, int, Cents, Cents, float]]:
+        yield from _rows(self.call("iter_report_lines", referencia, desde, hasta))
+
+    def get_barcode_entries(self, product_ids=None) -> List[Tuple[int, str, str, Cents]]:
+        return _rows(self.call("get_barcode_entries", None if product_ids is None else list(product_ids)))
+
+    def get_stock_minimum(self, product_id: int) -> int:
+        return self.call("get_stock_minimum", product_id)
+
+    def get_low_stock(self, product_ids=None) -> List[LowStockItem]:
+        rows = self.call("get_low_stock", None if product_ids is None else list(product_ids))
+        return [LowStockItem(*row) for row in rows]
+
+    def get_reorder_suggestions(self, dias: int = VELOCITY_DAYS, cobertura: int = COVER_DAYS) -> List[ReorderSuggestion]:
+        return [ReorderSuggestion(*row) for row in self.call("get_reorder_suggestions", dias, cobertura)]
+
+    def preview_bulk(self, tipo: str, valor: float, filtro: ProductFilter = ProductFilter(),
+                     limit: int = bulk_ops.PREVIEW_ROWS) -> BulkPreview:
+        productos, invalidos, filas = self.call("preview_bulk", tipo, valor, filtro, limit)
+        return BulkPreview(productos, invalidos, [BulkChange(*row) for row in filas])
+
+    def get_bulk_history(self, limit: int = bulk_ops.HISTORY) -> List[BulkOperation]:
+        return [BulkOperation(*row) for row in self.call("get_bulk_history", limit)]
+
+    def find_barcodes(self, codes) -> List[Tuple[int, str, str, Cents]]:
+        return _rows(self.call("find_barcodes", list(codes)))
+
+    def get_sale_record(self, venta_id: int) -> Optional[SaleRecord]:
+        return _sale_record(self.call("get_sale_record", venta_id))
+
+    def get_sale_records(self, desde: str, hasta: str) -> List[SaleRecord]:
+        return [_sale_record(row) for row in self.call("get_sale_records", desde, hasta)]
+
+    def sale_exists(self, ref: str) -> bool:
+        return self.call("sale_exists", ref)
+
+    def get_product_id(self, nombre: str) -> int:
+        return self.call("get_product_id", nombre)
+
+    def get_product_price(self, product_id: int) -> Cents:
+        return self.call("get_product_price", product_id)
+
+    def get_totals(self) -> Totals:
+        return Totals(*self.call("get_totals"))
+
+    def get_ledger_mark(self) -> Tuple[int, int]:
+        return tuple(self.call("get_ledger_mark"))
+
+    def get_daily_summary(self, desde: str, hasta: str) -> List[Tuple[str, int, Cents, Cents]]:
+        return _rows(self.call("get_daily_summary", desde, hasta))
+
+    def get_sales(self, desde: str, hasta: str) -> List[Tuple[int, str, Cents]]:
+        return _rows(self.call("get_sales", desde, hasta))
+
+    def get_sale_lines(self, venta_id: int) -> List[Tuple[int, str, int, Cents, Cents]]:
+        return _rows(self.call("get_sale_lines", venta_id))
+
+    def get_stock_entries(self, desde: str, hasta: str) -> List[Tuple[int, str, int, str, int, Cents, Cents]]:
+        return _rows(self.call("get_stock_entries", desde, hasta))
+
+    def get_all_products(self) -> List[Tuple[int, str, int, Cents, float]]:
+        return _rows(self.call("get_all_products"))
+
+    def get_products_page(self, sort_key: str = "id", after: Optional[Tuple] = None, limit: int = 100,
+                          descending: bool = False, inclusive: bool = False) -> List[Tuple[int, str, int, Cents, float]]:
+        return _rows(self.call("get_products_page", sort_key, after, limit, descending, inclusive))
+
+    def get_product_key_at(self, sort_key: str, offset: int, descending: bool = False) -> Optional[Tuple]:
+        return _row(self.call("get_product_key_at", sort_key, offset, descending))
+
+    def count_products(self) -> int:
+        return self.call("count_products")
+
+    def get_products_by_ids(self, product_ids) -> List[Tuple[int, str, int, Cents, float]]:
+        return _rows(self.call("get_products_by_ids", list(product_ids)))
+
+    def search_products(self, query: str, limit: int = 10) -> List[Tuple[int, str, int, Cents, float]]:
+        return _rows(self.call("search_products", query, limit))
+
+    def get_current_sales(self) -> List[Tuple[str, int, Cents, Cents]]:
+        return _rows(self.call("get_current_sales"))
+
+    def get_current_sales_lines(self, product_ids=None) -> List[Tuple[int, str, int, Cents, Cents]]:
+        return _rows(self.call("get_current_sales_lines", None if product_ids is None else list(product_ids)))
+
+    def get_change_token(self) -> int:
+        return self.call("get_change_token")
+
+    def get_changes(self, since: int) -> ChangeSet:
+        token, reset, productos, ventas, delta = self.call("get_changes", since)
+        return ChangeSet(token, reset, set(productos), set(ventas), delta)
+
+    def data_version(self) -> Tuple:
+        """Marca que cambia cuando cualquier caja confirma escrituras o cambia la configuración"""
+        version = tuple(self.call("data_version"))
+        iva_percent, costing_method = version[-2:]
+        self._cache_settings(iva_percent=iva_percent, metodo_costo=costing_method)
+        return version
+
+    def _cache_settings(self, **values: Any) -> None:
+        with self._lock:
+            self._settings = {**self._settings, **values}
+
+    def _setting(self, key: str) -> Any:
+        """Configuración desde memoria; el servicio solo se consulta la primera vez"""
+        if key not in self._settings:
+            self.data_version()
+        return self._settings[key]
+
+    def get_iva_percent(self) -> float:
+        return self._setting("iva_percent")
+
+    def get_costing_method(self) -> str:
+        return self._setting("metodo_costo")
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from constants import DB_NAME
+from database import DatabaseManager
+from maintenance import IDLE_SECONDS, MaintenanceService
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Ventana de espera para agrupar mutaciones del carrito en una sola transacción (segundos)
+BATCH_WINDOW = 0.003
+MAX_BATCH = 200
+
+# Tamaño máximo de una línea del protocolo (lotes de importación grandes)
+MAX_LINE = 64 * 1024 * 1024
+
+READ_METHODS = frozenset({
+    "count_products", "data_version", "get_bulk_history", "get_costing_method", "get_all_products", "get_change_token", "get_changes",
+    "get_current_sales", "get_current_sales_lines", "get_daily_summary", "get_iva_percent",
+    "find_barcodes", "get_barcode_entries", "get_ledger_mark", "get_product_id", "get_product_key_at", "get_product_price",
+    "get_low_stock", "get_products_by_ids", "get_products_page", "get_reorder_suggestions", "get_sale_lines",
+    "get_sale_record", "get_sale_records", "get_sales", "get_stock_entries", "get_stock_minimum",
+    "get_totals", "iter_report_lines", "preview_bulk", "sale_exists", "search_products",
+})
+WRITE_METHODS = frozenset({
+    "add_or_update_product", "add_to_current_sales", "apply_bulk", "bulk_upsert_products", "clear_current_sales",
+    "delete_product", "process_cart", "process_cart_record", "process_sale", "save_product", "set_barcode", "set_costing_method",
+    "set_stock_minimum", "undo_bulk", "update_iva_percent", "update_product",
+})
+# Escrituras pequeñas y frecuentes que se agrupan con las que llegan dentro de BATCH_WINDOW
+BATCHED_METHODS = frozenset({"add_to_current_sales", "clear_current_sales"})
+
+
+class _Call(NamedTuple):
+    method: str
+    args: List[Any]
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+
+
+def _encode(value: Any) -> Any:
+    """Convierte conjuntos (ChangeSet) a listas para JSON"""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _error(error: BaseException) -> Dict[str, Any]:
+    return {
+        "type": type(error).__name__,
+        "message": str(error),
+        "shortages": getattr(error, "shortages", None),
+    }
+
+
+class PosServer:
+    """Servicio local de inventario: un único escritor y lecturas concurrentes sobre DatabaseManager.
+
+    Protocolo: una línea JSON por solicitud {"id", "method", "args", "kwargs"} y una por
+    respuesta {"id", "result"} o {"id", "error"}; las respuestas pueden llegar desordenadas.
+    """
+
+    def __init__(self, db: DatabaseManager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 readers: int = 4):
+        self.db = db
+        self.host = host
+        self.port = port
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="pos-reader",
+                                           initializer=self._init_reader)
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="pos-writer")
+        self._writes: Optional[asyncio.Queue] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.batches = 0
+        self.batched_calls = 0
+        self.last_request = time.monotonic()
+
+    def _init_reader(self) -> None:
+        # Solo se atienden métodos con nombre, pero las conexiones de lectura tampoco pueden escribir
+        self.db.restrict_to_reads()
+
+    async def start(self) -> None:
+        self._writes = asyncio.Queue()
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port, limit=MAX_LINE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        asyncio.create_task(self._write_loop())
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        self.db.close()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for task in list(tasks):
+                await asyncio.gather(task, return_exceptions=True)
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            result = await self.dispatch(request["method"], request.get("args", []), request.get("kwargs", {}))
+            response = {"id": request_id, "result": result}
+        except Exception as e:
+            response = {"id": request_id, "error": _error(e)}
+        try:
+            writer.write(json.dumps(response, default=_encode).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def dispatch(self, method: str, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+        """Lecturas en el pool de lectores; escrituras en la cola del escritor único"""
+        self.last_request = time.monotonic()
+        loop = asyncio.get_running_loop()
+        if method in READ_METHODS:
+            return await loop.run_in_executor(self._readers, lambda: self._read(method, args, kwargs))
+        if method in WRITE_METHODS:
+            future = loop.create_future()
+            await self._writes.put(_Call(method, args, kwargs, future))
+            return await future
+        raise ValueError(f"Método desconocido: {method}")
+
+    def _read(self, method: str, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+        if method == "iter_report_lines":
+            # El cliente recibe todas las líneas en una respuesta
+            return list(self.db.iter_report_lines(*args, **kwargs))
+        if method == "data_version":
+            # data_version es por conexión y hay varios lectores: se usa una marca global equivalente.
+            # Lleva también las configuraciones, que el cliente guarda en memoria con cada consulta
+            return [self.db.get_change_token(), *self.db.get_ledger_mark(),
+                    self.db.get_iva_percent(), self.db.get_costing_method()]
+        return getattr(self.db, method)(*args, **kwargs)
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        pending: Optional[_Call] = None
+        while True:
+            call = pending or await self._writes.get()
+            pending = None
+            batch = [call]
+            if call.method in BATCHED_METHODS:
+                # Espera unos milisegundos y toma las mutaciones del carrito que llegaron mientras tanto
+                await asyncio.sleep(BATCH_WINDOW)
+                while len(batch) < MAX_BATCH and not self._writes.empty():
+                    call = self._writes.get_nowait()
+                    if call.method not in BATCHED_METHODS:
+                        pending = call
+                        break
+                    batch.append(call)
+            try:
+                results = await loop.run_in_executor(self._writer, self._apply, batch)
+            except Exception as e:
+                results = [(False, e)] * len(batch)
+            for call, (ok, value) in zip(batch, results):
+                if call.future.done():
+                    continue
+                if ok:
+                    call.future.set_result(value)
+                else:
+                    call.future.set_exception(value)
+
+    def _apply(self, batch: List[_Call]) -> List[Tuple[bool, Any]]:
+        """Ejecuta un lote en una transacción; cada llamada en su SAVEPOINT para aislar errores"""
+        if len(batch) == 1:
+            call = batch[0]
+            try:
+                return [(True, getattr(self.db, call.method)(*call.args, **call.kwargs))]
+            except Exception as e:
+                return [(False, e)]
+        results = []
+        with self.db.transaction():
+            for call in batch:
+                try:
+                    with self.db.transaction():
+                        results.append((True, getattr(self.db, call.method)(*call.args, **call.kwargs)))
+                except Exception as e:
+                    results.append((False, e))
+        self.batches += 1
+        self.batched_calls += len(batch)
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servicio de inventario compartido para varias cajas")
+    parser.add_argument("--db", default=DB_NAME, help="Archivo de base de datos")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Dirección de escucha (solo local por defecto)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto de escucha")
+    parser.add_argument("--lectores", type=int, default=4, help="Hilos de lectura concurrentes")
+    parser.add_argument("--sin-mantenimiento", action="store_true",
+                        help="No ejecutar respaldos, archivo ni compactación en segundo plano")
+    args = parser.parse_args(argv)
+
+    server = PosServer(DatabaseManager(args.db), args.host, args.port, args.lectores)
+    maintenance = None
+    if not args.sin_mantenimiento:
+        # Las tareas que esperan inactividad corren cuando ninguna caja hizo solicitudes en IDLE_SECONDS
+        maintenance = MaintenanceService(
+            args.db, is_idle=lambda: time.monotonic() - server.last_request >= IDLE_SECONDS)
+        maintenance.start()
+    print(f"Servicio de inventario en {args.host}:{args.port} ({args.db})")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if maintenance is not None:
+            maintenance.stop()
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import tkinter as tk
+from typing import Callable, List, Optional, Tuple
+from money import Money
+
+# Teclas que no cambian el texto y no deben disparar una búsqueda
+NAVIGATION_KEYS = {"Up", "Down", "Return", "KP_Enter", "Escape", "Tab", "Left", "Right",
+                   "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"}
+
+
+class TypeaheadDropdown:
+    """Lista desplegable de sugerencias con búsqueda diferida bajo un Entry"""
+
+    def __init__(
+        self,
+        entry,
+        search: Callable[[str, int, Callable[[List[Tuple]], None]], None],
+        on_select: Callable[[Tuple], None],
+        delay_ms: int = 150,
+        limit: int = 10,
+    ):
+        self.entry = entry
+        self.search = search
+        self.on_select = on_select
+        self.delay_ms = delay_ms
+        self.limit = limit
+        self._pending: Optional[str] = None
+        self._results: List[Tuple] = []
+        self._popup: Optional[tk.Toplevel] = None
+        self._listbox: Optional[tk.Listbox] = None
+
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", self._focus_list, add="+")
+        entry.bind("<Escape>", lambda e: self.hide(), add="+")
+        entry.bind("<FocusOut>", lambda e: entry.after(150, self._hide_if_unfocused), add="+")
+
+    def _on_key(self, event) -> None:
+        """Reprograma la búsqueda en cada tecla (debounce)"""
+        if event.keysym in NAVIGATION_KEYS:
+            return
+        if self._pending:
+            self.entry.after_cancel(self._pending)
+        self._pending = self.entry.after(self.delay_ms, self._run_search)
+
+    def _run_search(self) -> None:
+        """Lanza la búsqueda; search(query, limit, callback) entrega los resultados de forma asíncrona"""
+        self._pending = None
+        query = self.entry.get().strip()
+        if not query:
+            self.show_results([])
+            return
+
+        def deliver(results: List[Tuple]) -> None:
+            # Se descartan resultados de un texto que el usuario ya cambió
+            if self.entry.get().strip() == query:
+                self.show_results(results)
+
+        self.search(query, self.limit, deliver)
+
+    def show_results(self, results: List[Tuple]) -> None:
+        """Muestra las sugerencias (id, nombre, cantidad, precio, margen)"""
+        self._results = results
+        if not results:
+            self.hide()
+            return
+        if self._popup is None:
+            self._build_popup()
+        self._listbox.delete(0, tk.END)
+        for _id, nombre, cantidad, precio, _margen in results:
+            self._listbox.insert(tk.END, f"{nombre}  —  ${Money(precio)}  ({cantidad} disp.)")
+        self._listbox.configure(height=len(results))
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self._popup.geometry(f"{self.entry.winfo_width()}x{self._listbox.winfo_reqheight()}+{x}+{y}")
+        self._popup.deiconify()
+        self._popup.lift()
+
+    def _build_popup(self) -> None:
+        self._popup = tk.Toplevel(self.entry)
+        self._popup.overrideredirect(True)
+        self._popup.withdraw()
+        self._listbox = tk.Listbox(self._popup, activestyle="dotbox", exportselection=False)
+        self._listbox.pack(fill=tk.BOTH, expand=True)
+        self._listbox.bind("<Return>", self._choose)
+        self._listbox.bind("<ButtonRelease-1>", self._choose)
+        self._listbox.bind("<Escape>", lambda e: (self.hide(), self.entry.focus_set()))
+        self._listbox.bind("<FocusOut>", lambda e: self.entry.after(150, self._hide_if_unfocused))
+
+    def _focus_list(self, event) -> Optional[str]:
+        if self._popup is None or not self._results:
+            return None
+        self._listbox.focus_set()
+        self._listbox.selection_clear(0, tk.END)
+        self._listbox.selection_set(0)
+        self._listbox.activate(0)
+        return "break"
+
+    def _choose(self, event=None) -> None:
+        selection = self._listbox.curselection()
+        if not selection:
+            return
+        row = self._results[selection[0]]
+        self.hide()
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, row[1])
+        self.on_select(row)
+
+    def _hide_if_unfocused(self) -> None:
+        focus = self.entry.focus_get()
+        if focus is not self.entry and focus is not self._listbox:
+            self.hide()
+
+    def hide(self) -> None:
+        """Oculta la lista de sugerencias"""
+        if self._popup is not None:
+            self._popup.withdraw()
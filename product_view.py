@@ -0,0 +1,333 @@
+import tkinter as tk
+import ttkbootstrap as tb
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from money import Money
+
+COLUMNS = [
+    ("id", "ID"),
+    ("nombre", "Nombre"),
+    ("cantidad", "Cantidad"),
+    ("precio", "Precio"),
+    ("ganancia", "% Ganancia"),
+]
+# Posición de cada columna dentro de la fila (id, nombre, cantidad, precio, margen)
+COLUMN_INDEX = {col: i for i, (col, _text) in enumerate(COLUMNS)}
+PRICE_INDEX = COLUMN_INDEX["precio"]
+
+
+def display_values(row: Tuple) -> Tuple:
+    """Valores de la fila para el Treeview (el precio llega en centavos)"""
+    return row[:PRICE_INDEX] + (str(Money(row[PRICE_INDEX])),) + row[PRICE_INDEX + 1:]
+
+
+def run_sync(fn: Callable, *args, on_done: Callable, key: Optional[str] = None) -> None:
+    """Ejecutor por defecto: llama a la base de datos en el mismo hilo"""
+    on_done(fn(*args))
+
+
+class VirtualProductTree(tb.Frame):
+    """Treeview de productos con desplazamiento virtual sobre páginas por clave"""
+
+    def __init__(self, master, db, page_size: int = 100, height: int = 15, run: Callable = run_sync):
+        super().__init__(master)
+        self.db = db
+        self.run = run  # run(fn, *args, on_done=..., key=...), p. ej. DatabaseWorker.submit
+        self.page_size = page_size
+        self.sort_key = "id"
+        self.descending = False
+        self._rows: List[Tuple] = []  # ventana visible + buffer de precarga
+        self._top = 0  # índice en _rows de la primera fila visible
+        self._offset = 0  # posición absoluta de _rows[0]
+        self._total = 0
+        self._at_end = False  # el buffer llega hasta la última fila
+        self._visible = height
+        self._generation = 0  # invalida páginas pedidas antes de una recarga u orden nuevo
+        self._loading_ahead = False
+        self._loading_behind = False
+
+        self.tree = tb.Treeview(
+            self,
+            columns=[col for col, _text in COLUMNS],
+            show="headings",
+            height=height,
+            bootstyle="primary",
+        )
+        for col, text in COLUMNS:
+            self.tree.heading(col, text=text, command=lambda c=col: self.sort_by(c))
+            self.tree.column(
+                col,
+                anchor="center",
+                width=100 if col != "id" else 0,
+                stretch=tk.NO if col == "id" else tk.YES,
+            )
+        self.scrollbar = tb.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self._on_wheel(-1 if e.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda e: self._on_wheel(-1))
+        self.tree.bind("<Button-5>", lambda e: self._on_wheel(1))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self._scroll(-self._visible) or "break")
+        self.tree.bind("<Next>", lambda e: self._scroll(self._visible) or "break")
+
+    # --- Claves y carga de páginas ---
+
+    def _key(self, row: Tuple) -> Tuple:
+        """Clave (valor de orden, id) de una fila"""
+        return row[COLUMN_INDEX[self.sort_key]], row[0]
+
+    def _fetch(self, sort_key: str, descending: bool, key: Optional[Tuple],
+               backward: bool = False, inclusive: bool = False) -> List[Tuple]:
+        """Obtiene la página siguiente (o anterior) a una clave; se ejecuta en el hilo de la base"""
+        page = self.db.get_products_page(sort_key, key, self.page_size, descending != backward, inclusive)
+        if backward:
+            page.reverse()
+        return page
+
+    def _trim(self) -> None:
+        """Descarta filas fuera de la ventana visible más el buffer de precarga"""
+        limit = self._visible + 2 * self.page_size
+        excess_front = self._top - self.page_size
+        if excess_front > 0:
+            del self._rows[:excess_front]
+            self._top -= excess_front
+            self._offset += excess_front
+        if len(self._rows) > limit:
+            del self._rows[limit:]
+            self._at_end = False
+
+    def refresh(self, recount: bool = True, on_loaded: Optional[Callable[[], None]] = None) -> None:
+        """Recarga la ventana actual desde la fila visible superior (on_loaded al mostrarla)"""
+        anchor = self._key(self._rows[self._top]) if self._top < len(self._rows) else None
+        self._load_window(anchor, self._offset + self._top, recount=recount, on_loaded=on_loaded)
+
+    def show_rows(self, rows: List[Tuple], total: int) -> None:
+        """Muestra como primera página (orden por id) filas ya leídas, p. ej. la instantánea de arranque"""
+        self._generation += 1
+        self.sort_key, self.descending = "id", False
+        self._rows = list(rows)
+        self._top = self._offset = 0
+        self._total = total
+        self._at_end = len(rows) < self.page_size
+        self._loading_ahead = self._loading_behind = False
+        self._render()
+        self._prefetch()
+
+    def _load_window(self, anchor: Optional[Tuple], position: int, recount: bool = False,
+                     seek: bool = False, on_loaded: Optional[Callable[[], None]] = None) -> None:
+        """Pide la ventana que comienza en anchor (o en position si seek) y la muestra al llegar"""
+        self._generation += 1
+        generation = self._generation
+        sort_key, descending = self.sort_key, self.descending
+
+        def load():
+            total = self.db.count_products() if recount else None
+            key = self.db.get_product_key_at(sort_key, position, descending) if seek else anchor
+            rows = self._fetch(sort_key, descending, key, inclusive=True)
+            before = self._fetch(sort_key, descending, key, backward=True) if key is not None and position > 0 else []
+            return total, rows, before
+
+        def loaded(result) -> None:
+            if self._on_window_loaded(generation, position, *result) and on_loaded is not None:
+                on_loaded()
+
+        self.run(load, on_done=loaded, key=f"products-window-{id(self)}")
+
+    def _on_window_loaded(self, generation: int, position: int, total: Optional[int],
+                          rows: List[Tuple], before: List[Tuple]) -> bool:
+        """Muestra la ventana pedida; False si una recarga posterior la dejó obsoleta"""
+        if generation != self._generation:
+            return False
+        if total is not None:
+            self._total = total
+        if not rows and before:
+            # La clave ancla ya no existe al final: se muestra la última página
+            rows, before = before, []
+        self._rows = before + rows
+        self._top = len(before)
+        self._offset = max(position - len(before), 0)
+        self._at_end = len(rows) < self.page_size
+        self._loading_ahead = self._loading_behind = False
+        self._render()
+        self._prefetch()
+        return True
+
+    def _prefetch(self) -> None:
+        """Pide en segundo plano las páginas vecinas cuando el buffer se agota"""
+        generation = self._generation
+        sort_key, descending = self.sort_key, self.descending
+        ahead = len(self._rows) - self._top
+        if not self._at_end and not self._loading_ahead and ahead < self._visible + self.page_size // 2:
+            self._loading_ahead = True
+            last = self._key(self._rows[-1]) if self._rows else None
+            self.run(self._fetch, sort_key, descending, last,
+                     on_done=lambda page: self._on_page_ahead(generation, last, page))
+        if self._rows and self._offset > 0 and not self._loading_behind and self._top < self.page_size // 2:
+            self._loading_behind = True
+            first = self._key(self._rows[0])
+            self.run(self._fetch, sort_key, descending, first, True,
+                     on_done=lambda page: self._on_page_behind(generation, first, page))
+
+    def _on_page_ahead(self, generation: int, last: Optional[Tuple], page: List[Tuple]) -> None:
+        if generation != self._generation:
+            return
+        self._loading_ahead = False
+        if (self._key(self._rows[-1]) if self._rows else None) != last:
+            self._prefetch()  # el buffer cambió mientras tanto
+            return
+        was_short = len(self._rows) - self._top < self._visible
+        self._rows.extend(page)
+        self._at_end = len(page) < self.page_size
+        self._trim()
+        if was_short:
+            self._render()
+        self._prefetch()
+
+    def _on_page_behind(self, generation: int, first: Tuple, page: List[Tuple]) -> None:
+        if generation != self._generation:
+            return
+        self._loading_behind = False
+        if not self._rows or self._key(self._rows[0]) != first:
+            self._prefetch()
+            return
+        if not page:
+            self._offset = 0
+            return
+        self._rows[:0] = page
+        self._top += len(page)
+        self._offset = max(self._offset - len(page), 0)
+        if len(self._rows) > self._visible + 2 * self.page_size:
+            del self._rows[self._visible + 2 * self.page_size:]
+            self._at_end = False
+        self._update_scrollbar()
+
+    def _in_buffer_range(self, key: Tuple) -> bool:
+        """Indica si una clave cae dentro del rango de filas en el buffer"""
+        if not self._rows:
+            return True
+        first, last = self._key(self._rows[0]), self._key(self._rows[-1])
+        low, high = (last, first) if self.descending else (first, last)
+        # Los extremos ya alcanzados de la lista quedan abiertos
+        open_low = self._at_end if self.descending else self._offset == 0
+        open_high = self._offset == 0 if self.descending else self._at_end
+        return (open_low or key >= low) and (open_high or key <= high)
+
+    def apply_changes(self, product_ids: Iterable[int], rows: Dict[int, Tuple], delta: int = 0) -> None:
+        """Aplica solo los cambios de los productos indicados, con sus filas ya leídas (id -> fila)"""
+        self._total += delta
+        positions = {row[0]: i for i, row in enumerate(self._rows)}
+        for product_id in set(product_ids):
+            row = rows.get(product_id)
+            index = positions.get(product_id)
+            if index is not None:
+                moved = row is None or self._key(row) != self._key(self._rows[index])
+            else:
+                moved = row is not None and self._in_buffer_range(self._key(row))
+            if moved:
+                # Alta, baja o cambio de posición dentro de la ventana: recargar desde el ancla
+                self.refresh(recount=False)
+                return
+            if index is not None:
+                self._rows[index] = row
+                if self.tree.exists(str(product_id)):
+                    self.tree.item(str(product_id), values=display_values(row))
+        self._update_scrollbar()
+
+    def get_row(self, product_id: int) -> Optional[Tuple]:
+        """Fila (id, nombre, cantidad, precio en centavos, margen) de un producto en el buffer"""
+        for row in self._rows:
+            if row[0] == product_id:
+                return row
+        return None
+
+    # --- Desplazamiento ---
+
+    def _scroll(self, delta: int) -> None:
+        """Desplaza la ventana visible delta filas dentro del buffer y precarga lo que falte"""
+        self._top = max(min(self._top + delta, len(self._rows) - self._visible), 0)
+        self._trim()
+        self._render()
+        self._prefetch()
+
+    def _jump_to(self, position: int) -> None:
+        """Salta a una posición absoluta (arrastre de la barra de desplazamiento)"""
+        position = max(min(position, self._total - self._visible), 0)
+        if self._offset <= position <= self._offset + len(self._rows) - self._visible:
+            self._scroll(position - self._offset - self._top)
+            return
+        self._load_window(None, position, seek=True)
+
+    def _on_scrollbar(self, action: str, value: str, unit: Optional[str] = None) -> None:
+        if action == "moveto":
+            self._jump_to(int(float(value) * self._total))
+        elif action == "scroll":
+            step = self._visible if unit == "pages" else 1
+            self._scroll(int(value) * step)
+
+    def _on_wheel(self, direction: int) -> str:
+        self._scroll(direction * 3)
+        return "break"
+
+    def _on_arrow(self, direction: int) -> Optional[str]:
+        """Desplaza la ventana cuando la selección llega al borde visible"""
+        items = self.tree.get_children()
+        selected = self.tree.selection()
+        if not items or not selected:
+            return None
+        edge = items[0] if direction < 0 else items[-1]
+        if selected[0] != edge:
+            return None
+        self._scroll(direction)
+        index = self._top + (0 if direction < 0 else len(items) - 1)
+        if index < len(self._rows):
+            iid = str(self._rows[index][0])
+            if self.tree.exists(iid):
+                self.tree.selection_set(iid)
+                self.tree.focus(iid)
+        return "break"
+
+    def _on_resize(self, event) -> None:
+        """Recalcula cuántas filas caben en la vista"""
+        rowheight = int(tb.Style().lookup("Treeview", "rowheight") or 20)
+        visible = max((event.height - rowheight) // rowheight, 1)
+        if visible != self._visible:
+            self._visible = visible
+            self._render()
+            self._prefetch()
+
+    # --- Orden ---
+
+    def sort_by(self, sort_key: str) -> None:
+        """Ordena por la columna indicada; un segundo clic invierte el orden"""
+        if sort_key == self.sort_key:
+            self.descending = not self.descending
+        else:
+            self.sort_key, self.descending = sort_key, False
+        for col, text in COLUMNS:
+            arrow = (" ▼" if self.descending else " ▲") if col == self.sort_key else ""
+            self.tree.heading(col, text=text + arrow)
+        self._rows, self._top, self._offset = [], 0, 0
+        self._load_window(None, 0)
+
+    # --- Dibujo ---
+
+    def _render(self) -> None:
+        """Inserta en el Treeview solo las filas visibles"""
+        selected = self.tree.selection()
+        self.tree.delete(*self.tree.get_children())
+        for row in self._rows[self._top:self._top + self._visible]:
+            self.tree.insert("", tk.END, iid=str(row[0]), values=display_values(row))
+        keep = [iid for iid in selected if self.tree.exists(iid)]
+        if keep:
+            self.tree.selection_set(keep)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self) -> None:
+        if not self._total:
+            self.scrollbar.set(0, 1)
+            return
+        first = self._offset + self._top
+        self.scrollbar.set(first / self._total, min((first + self._visible) / self._total, 1))
@@ -0,0 +1,357 @@
+import argparse
+import html
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date
+from functools import lru_cache
+from string import Formatter
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Sequence
+from constants import DB_NAME
+from instrumentation import Histogram
+from ledger import SaleRecord
+from money import Money
+
+# Formatos de recibo y la extensión de sus archivos
+TEXT = "texto"
+ESCPOS = "escpos"  # texto con los comandos de una impresora térmica ESC/POS
+HTML = "html"
+FORMATS: Dict[str, str] = {TEXT: ".txt", ESCPOS: ".bin", HTML: ".html"}
+
+# Formatos que se escriben en la cola de impresión con cada venta
+SPOOL_FORMATS = (TEXT,)
+# Recibos en espera como máximo: con la cola llena la venta queda rezagada y no se espera
+QUEUE_SIZE = 256
+# Rezagados que se recuerdan para emitirlos al vaciarse la cola (el resto, en la exportación del día)
+LATE_MAX = 10000
+# Cada cuánto revisa el hilo los rezagados y la detención (segundos)
+TICK = 0.5
+
+# Bloque que se repite por línea de venta en las plantillas
+LINES_START = "{lineas}"
+LINES_END = "{fin_lineas}"
+SALE_FIELDS = frozenset({"venta_id", "fecha", "ref", "articulos", "subtotal", "iva_pct", "iva", "total",
+                         "negrita", "normal"})
+LINE_FIELDS = frozenset({"nombre", "cantidad", "precio", "importe"})
+
+# Plantillas predeterminadas; recibo.txt o recibo.html en la carpeta de plantillas las reemplazan
+DEFAULT_TEMPLATES: Dict[str, str] = {
+    TEXT: """{negrita}    SISTEMA DE GESTIÓN DE INVENTARIO{normal}
+Venta N° {venta_id:<10} {fecha:>19}
+----------------------------------------
+{lineas}
+{nombre:.40}
+  {cantidad:>4} x {precio:>10} {importe:>20}
+{fin_lineas}
+----------------------------------------
+Subtotal{subtotal:>32}
+IVA {iva_pct:>3}%{iva:>32}
+{negrita}TOTAL{total:>35}{normal}
+Artículos: {articulos}
+""",
+    HTML: """<section class="recibo">
+<h1>Sistema de Gestión de Inventario</h1>
+<p>Venta N° {venta_id}<br>{fecha}</p>
+<table>
+{lineas}
+<tr><td>{nombre}</td><td class="n">{cantidad} x ${precio}</td><td class="n">${importe}</td></tr>
+{fin_lineas}
+</table>
+<table class="totales">
+<tr><td>Subtotal</td><td class="n">${subtotal}</td></tr>
+<tr><td>IVA {iva_pct}%</td><td class="n">${iva}</td></tr>
+<tr class="total"><td>Total</td><td class="n">${total}</td></tr>
+</table>
+<p>Artículos: {articulos}</p>
+</section>
+""",
+}
+TEMPLATE_FILES = {TEXT: "recibo.txt", ESCPOS: "recibo.txt", HTML: "recibo.html"}
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Recibos</title>
+<style>
+body { font-family: monospace; }
+.recibo { width: 80mm; margin-bottom: 2em; page-break-after: always; }
+h1 { font-size: 1.1em; text-align: center; }
+table { width: 100%; border-collapse: collapse; }
+.n { text-align: right; }
+.totales { border-top: 1px dashed #000; }
+.total { font-weight: bold; }
+</style></head><body>
+"""
+_HTML_TAIL = "</body></html>\n"
+
+# Comandos ESC/POS: inicializar, página de códigos PC850, negrita, avance y corte parcial
+_ESC_INIT = b"\x1b@\x1bt\x02"
+_ESC_BOLD, _ESC_NORMAL = "\x1bE\x01", "\x1bE\x00"
+_ESC_CUT = b"\x1bd\x04\x1dVB\x00"
+_TEXT_SEPARATOR = "\n" + "=" * 40 + "\n\n"
+
+
+class ReceiptStats(NamedTuple):
+    """Contadores de la cola de recibos"""
+    encolados: int
+    emitidos: int
+    rezagados: int  # ventas que encontraron la cola llena
+    pendientes: int  # en la cola ahora
+    pendientes_max: int
+    errores: int
+    render_p50: float  # segundos por recibo (todos los formatos)
+    render_p99: float
+    espera_p99: float  # desde el cobro hasta el archivo escrito
+    ultimo_error: str
+
+
+class _Template(NamedTuple):
+    """Plantilla compilada: cabecera, línea y pie como métodos format ya validados"""
+    head: Callable[..., str]
+    line: Callable[..., str]
+    tail: Callable[..., str]
+
+
+def receipts_dir(db_name: str) -> str:
+    """Carpeta de recibos junto a la base"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), "recibos")
+
+
+def compile_template(text: str) -> _Template:
+    """Separa el bloque de líneas y valida los campos una sola vez; ValueError si la plantilla es inválida"""
+    head, found, rest = text.partition(LINES_START)
+    line, found_end, tail = rest.partition(LINES_END)
+    if not found or not found_end:
+        raise ValueError(f"La plantilla debe tener un bloque {LINES_START} ... {LINES_END}")
+    # Los marcadores van en su propia línea: no dejan un salto de línea de más
+    line, tail = line.removeprefix("\n"), tail.removeprefix("\n")
+    for part, allowed in ((head, SALE_FIELDS), (line, SALE_FIELDS | LINE_FIELDS), (tail, SALE_FIELDS)):
+        for _literal, field, _spec, _conversion in Formatter().parse(part):
+            if field is not None and field.split(".")[0].split("[")[0] not in allowed:
+                raise ValueError(f"Campo desconocido en la plantilla: {{{field}}}")
+    return _Template(head.format, line.format, tail.format)
+
+
+@lru_cache(maxsize=16)
+def _compiled(path: Optional[str], _mtime: Optional[float], default: str) -> _Template:
+    if path is None:
+        return compile_template(default)
+    with open(path, encoding="utf-8") as f:
+        return compile_template(f.read())
+
+
+def _template(formato: str, templates: Optional[str]) -> _Template:
+    """Plantilla compilada del formato; se vuelve a compilar solo si su archivo cambió"""
+    path = os.path.join(templates, TEMPLATE_FILES[formato]) if templates else None
+    try:
+        mtime = os.stat(path).st_mtime if path else None
+    except OSError:
+        path = mtime = None
+    return _compiled(path, mtime, DEFAULT_TEMPLATES[HTML if formato == HTML else TEXT])
+
+
+def _fragment(record: SaleRecord, formato: str, templates: Optional[str]) -> str:
+    """Texto de un recibo sin el envoltorio del documento"""
+    template = _template(formato, templates)
+    escape = html.escape if formato == HTML else str
+    bold, normal = (_ESC_BOLD, _ESC_NORMAL) if formato == ESCPOS else ("", "")
+    subtotal = Money(record.total)
+    iva = subtotal.percent(record.iva_percent)
+    sale = {
+        "venta_id": record.venta_id, "fecha": record.fecha, "ref": escape(record.ref or ""),
+        "articulos": sum(cantidad for _n, cantidad, _p, _s in record.lineas),
+        "subtotal": str(subtotal), "iva_pct": f"{record.iva_percent * 100:g}", "iva": str(iva),
+        "total": str(subtotal + iva), "negrita": bold, "normal": normal,
+    }
+    parts = [template.head(**sale)]
+    for nombre, cantidad, precio, importe in record.lineas:
+        parts.append(template.line(**sale, nombre=escape(nombre), cantidad=cantidad,
+                                   precio=str(Money(precio)), importe=str(Money(importe))))
+    parts.append(template.tail(**sale))
+    return "".join(parts)
+
+
+def _document(fragments: Sequence[str], formato: str) -> bytes:
+    """Uno o varios recibos como el contenido de un archivo del formato"""
+    if formato == ESCPOS:
+        return b"".join(_ESC_INIT + fragment.encode("cp850", "replace") + _ESC_CUT for fragment in fragments)
+    if formato == HTML:
+        return (_HTML_HEAD + "".join(fragments) + _HTML_TAIL).encode("utf-8")
+    return _TEXT_SEPARATOR.join(fragments).encode("utf-8")
+
+
+def render(record: SaleRecord, formato: str = TEXT, templates: Optional[str] = None) -> bytes:
+    """Recibo de una venta en el formato indicado"""
+    if formato not in FORMATS:
+        raise ValueError(f"Formato de recibo desconocido: {formato}")
+    return _document([_fragment(record, formato, templates)], formato)
+
+
+def _write(path: str, data: bytes) -> None:
+    """Escritura atómica: quien lea la carpeta nunca ve un archivo a medias"""
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def export_receipts(records: Iterable[SaleRecord], path: str, formato: Optional[str] = None,
+                    templates: Optional[str] = None) -> int:
+    """Escribe en un solo archivo los recibos de las ventas (cierre del día); devuelve cuántos.
+
+    Sin `formato`, se deduce de la extensión del archivo.
+    """
+    if formato is None:
+        extension = os.path.splitext(path)[1].lower()
+        formato = next((name for name, ext in FORMATS.items() if ext == extension), TEXT)
+    if formato not in FORMATS:
+        raise ValueError(f"Formato de recibo desconocido: {formato}")
+    fragments = [_fragment(record, formato, templates) for record in records]
+    _write(path, _document(fragments, formato))
+    return len(fragments)
+
+
+class ReceiptSpooler:
+    """Emite los recibos de las ventas en un hilo propio y los deja en la cola de impresión.
+
+    La caja solo encola el registro compacto de la venta: submit() nunca espera. Con la cola
+    llena la venta queda rezagada (solo su id) y se emite desde el libro cuando la cola se vacía;
+    si también se supera LATE_MAX, su recibo queda para la exportación del día.
+    """
+
+    def __init__(self, directory: str, load: Callable[[int], Optional[SaleRecord]],
+                 formats: Sequence[str] = SPOOL_FORMATS, queue_size: int = QUEUE_SIZE, tick: float = TICK):
+        unknown = [formato for formato in formats if formato not in FORMATS]
+        if unknown:
+            raise ValueError(f"Formato de recibo desconocido: {', '.join(unknown)}")
+        self.directory = directory
+        self.spool = os.path.join(directory, "cola")
+        self.templates = os.path.join(directory, "plantillas")
+        self.load = load
+        self.formats = tuple(formats)
+        self.tick = tick
+        self._queue: "queue.Queue" = queue.Queue(queue_size)
+        self._late: Deque[int] = deque(maxlen=LATE_MAX)
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._counts = {"encolados": 0, "emitidos": 0, "rezagados": 0, "errores": 0, "pendientes_max": 0}
+        self._render = Histogram()
+        self._wait = Histogram()
+        self._last_error = ""
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="recibos", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Emite lo que queda en la cola y detiene el hilo"""
+        self._stopping = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, record: SaleRecord) -> bool:
+        """Encola el recibo de una venta sin esperar; False si la cola estaba llena (queda rezagado)"""
+        try:
+            self._queue.put_nowait((record, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._late.append(record.venta_id)
+                self._counts["rezagados"] += 1
+            return False
+        with self._lock:
+            self._counts["encolados"] += 1
+            self._counts["pendientes_max"] = max(self._counts["pendientes_max"], self._queue.qsize())
+        return True
+
+    def stats(self) -> ReceiptStats:
+        with self._lock:
+            counts = dict(self._counts)
+            return ReceiptStats(counts["encolados"], counts["emitidos"], counts["rezagados"], self._queue.qsize(),
+                                counts["pendientes_max"], counts["errores"], self._render.percentile(0.5),
+                                self._render.percentile(0.99), self._wait.percentile(0.99), self._last_error)
+
+    def _run(self) -> None:
+        os.makedirs(self.spool, exist_ok=True)
+        while True:
+            try:
+                item = self._queue.get(timeout=self.tick)
+            except queue.Empty:
+                if self._stopping:
+                    break
+                self._catch_up()
+                continue
+            if item is None:
+                break
+            self._emit(*item)
+
+    def _catch_up(self) -> None:
+        """Emite desde el libro los rezagados mientras la cola siga vacía"""
+        while self._queue.empty() and not self._stopping:
+            with self._lock:
+                if not self._late:
+                    return
+                venta_id = self._late.popleft()
+            try:
+                record = self.load(venta_id)
+            except Exception as e:  # noqa: BLE001 - un error de lectura no detiene la cola
+                self._failed(e)
+                continue
+            if record is not None:
+                self._emit(record, None)
+
+    def _emit(self, record: SaleRecord, queued_at: Optional[float]) -> None:
+        started = time.perf_counter()
+        try:
+            for formato in self.formats:
+                data = render(record, formato, self.templates)
+                _write(os.path.join(self.spool, f"venta-{record.venta_id:08d}{FORMATS[formato]}"), data)
+        except (OSError, ValueError, KeyError) as e:
+            self._failed(e)
+            return
+        finished = time.perf_counter()
+        with self._lock:
+            self._counts["emitidos"] += 1
+            self._render.add(finished - started)
+            if queued_at is not None:
+                self._wait.add(finished - queued_at)
+
+    def _failed(self, error: BaseException) -> None:
+        with self._lock:
+            self._counts["errores"] += 1
+            self._last_error = str(error)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Exporta los recibos de un día en un solo archivo (p. ej. al cierre, desde cron)"""
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Exporta los recibos de las ventas de un día")
+    parser.add_argument("--db", default=DB_NAME, help="Archivo de base de datos")
+    parser.add_argument("--dia", default=date.today().isoformat(), help="Día AAAA-MM-DD (por defecto, hoy)")
+    parser.add_argument("--formato", choices=list(FORMATS), default=HTML)
+    parser.add_argument("--dir", help="Carpeta de destino (por defecto, la de recibos junto a la base)")
+    args = parser.parse_args(argv)
+    directory = args.dir or receipts_dir(args.db)
+    path = os.path.join(directory, f"recibos-{args.dia}{FORMATS[args.formato]}")
+    db = DatabaseManager(args.db)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        count = export_receipts(db.get_sale_records(args.dia, args.dia), path, args.formato,
+                                os.path.join(receipts_dir(args.db), "plantillas"))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(f"{count} recibos en {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import argparse
+import sys
+from constants import DB_NAME
+from database import DatabaseManager
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replica catálogo y ventas entre tiendas con paquetes de cambios")
+    parser.add_argument("accion", choices=("tienda", "exportar", "importar"))
+    parser.add_argument("paquetes", nargs="*", help="Paquetes a importar (por defecto, los de --dir para esta tienda)")
+    parser.add_argument("--db", default=DB_NAME, help="Base de datos de inventario")
+    parser.add_argument("--dir", default="replica", help="Carpeta compartida o unidad USB")
+    parser.add_argument("--para", help="Tienda de destino al exportar")
+    parser.add_argument("--desde", type=int, help="Reenviar los cambios posteriores a este seq")
+    parser.add_argument("--forzar", action="store_true", help="Importar aunque falte un paquete anterior")
+    args = parser.parse_intermixed_args(argv)
+    if args.accion == "exportar" and not args.para:
+        parser.error("exportar requiere --para <tienda>")
+
+    db = DatabaseManager(args.db)
+    try:
+        if args.accion == "tienda":
+            print(db.get_store_id())
+        elif args.accion == "exportar":
+            bundle = db.export_changes(args.para, args.dir, args.desde)
+            print(f"{bundle.cambios} cambios en {bundle.ruta}" if bundle else "Sin cambios para exportar")
+        else:
+            results = db.import_changes(args.paquetes or None, args.dir, args.forzar)
+            if not results:
+                print("Sin paquetes para esta tienda")
+            for result in results:
+                print(f"{result.archivo}: {result.productos} productos, {result.ventas} ventas, "
+                      f"{result.omitidos} omitidos, {result.conflictos} conflictos")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
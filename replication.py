@@ -0,0 +1,299 @@
+import glob
+import gzip
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+import ledger
+from connection import ConnectionManager
+
+# Versión del formato de los paquetes (uno distinto se rechaza)
+BUNDLE_FORMAT = 1
+# Entradas aplicadas por transacción al importar (el bloqueo de escritura se suelta entre lotes)
+APPLY_BATCH = 500
+# Filas leídas por consulta al exportar
+EXPORT_BATCH = 500
+
+# Columnas del catálogo que se replican; la cantidad, el valor del stock y el mínimo son de cada tienda
+CATALOG_COLUMNS = ("nombre", "precio", "margen_ganancia", "codigo_barras")
+
+# Nombre de un paquete: replica-<origen>-<destino>-<hasta>.jsonl.gz
+_BUNDLE_NAME = "replica-{origen}-{destino}-{hasta:012d}.jsonl.gz"
+
+
+class Stamp(NamedTuple):
+    """Marca de una versión: el reloj de Lamport y, para desempatar, la tienda que la escribió"""
+    reloj: int
+    tienda: str
+
+
+class Bundle(NamedTuple):
+    """Paquete exportado"""
+    ruta: str
+    desde: int  # seq exclusivo
+    hasta: int  # seq inclusivo
+    cambios: int
+
+
+class ImportResult(NamedTuple):
+    """Resultado de importar un paquete"""
+    archivo: str
+    tienda: str
+    productos: int  # cambios de catálogo aplicados
+    ventas: int  # ventas nuevas
+    omitidos: int  # versiones iguales o más viejas que las locales, o ventas ya registradas
+    conflictos: int  # nombres o códigos de barras en uso que se resolvieron sin aplicar ese campo
+
+
+def store_id(conn: sqlite3.Connection) -> str:
+    """Identificador de la tienda local"""
+    return conn.execute("SELECT tienda FROM replica_estado").fetchone()[0]
+
+
+def bundle_paths(directory: str, origen: str = "*", destino: str = "*") -> List[str]:
+    """Paquetes de una carpeta, en orden de origen y de seq"""
+    return sorted(glob.glob(os.path.join(directory, f"replica-{origen}-{destino}-*.jsonl.gz")))
+
+
+def export_bundle(connections: ConnectionManager, destino: str, directory: str,
+                  desde: Optional[int] = None) -> Optional[Bundle]:
+    """Escribe en `directory` los cambios que `destino` todavía no recibió; None si no hay.
+
+    Por defecto empieza en el último seq exportado a ese destino; `desde` permite reenviar
+    (p. ej. si un paquete se perdió). Lee el registro por su índice de seq: el costo depende
+    de la cantidad de cambios y no del tamaño de la base.
+    """
+    conn = connections.connection()
+    # Lectura consistente de todo el paquete sin bloquear a las cajas (WAL)
+    conn.execute("BEGIN")
+    try:
+        origen, reloj = conn.execute("SELECT tienda, reloj FROM replica_estado").fetchone()
+        if desde is None:
+            row = conn.execute("SELECT enviado FROM replica_pares WHERE tienda = ?", (destino,)).fetchone()
+            desde = row[0] if row else 0
+        hasta, cambios = conn.execute("SELECT MAX(seq), COUNT(*) FROM replica_cambios WHERE seq > ?",
+                                      (desde,)).fetchone()
+        if not cambios:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, _BUNDLE_NAME.format(origen=origen, destino=destino, hasta=hasta))
+        temp = f"{path}.tmp"
+        with gzip.open(temp, "wt", encoding="utf-8") as f:
+            header = {"v": BUNDLE_FORMAT, "origen": origen, "destino": destino, "desde": desde, "hasta": hasta,
+                      "reloj": reloj, "cambios": cambios}
+            f.write(json.dumps(header, separators=(",", ":")) + "\n")
+            for entry in _read_changes(conn, desde, hasta):
+                f.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+        os.replace(temp, path)
+    finally:
+        conn.execute("COMMIT")
+    with connections.transaction() as conn:
+        conn.execute('''INSERT INTO replica_pares (tienda, enviado) VALUES (?, ?)
+                     ON CONFLICT(tienda) DO UPDATE SET enviado = MAX(enviado, excluded.enviado)''', (destino, hasta))
+    return Bundle(path, desde, hasta, cambios)
+
+
+def _read_changes(conn: sqlite3.Connection, desde: int, hasta: int) -> Iterator[Dict[str, Any]]:
+    """Entradas del paquete en orden de seq, con el estado actual de cada fila"""
+    columns = ", ".join(f"p.{c}" for c in CATALOG_COLUMNS)
+    after = desde
+    while True:
+        rows = conn.execute(f'''SELECT c.seq, c.tabla, c.clave, c.reloj, c.tienda, c.borrado,
+                                       v.id, v.fecha, v.total, {columns}
+                                FROM replica_cambios c
+                                LEFT JOIN ventas v ON c.tabla = 'ventas' AND v.id = c.fila_id
+                                LEFT JOIN productos p ON c.tabla = 'productos' AND p.id = c.fila_id AND p.uid = c.clave
+                                WHERE c.seq > ? AND c.seq <= ? ORDER BY c.seq LIMIT ?''',
+                            (after, hasta, EXPORT_BATCH)).fetchall()
+        if not rows:
+            return
+        after = rows[-1][0]
+        sale_ids = [row[6] for row in rows if row[6] is not None]
+        lines: Dict[int, List[list]] = {}
+        for venta_id, *line in conn.execute('''SELECT l.venta_id, p.uid, l.cantidad, l.precio_unitario, l.subtotal,
+                                                      l.costo
+                                               FROM venta_lineas l LEFT JOIN productos p ON p.id = l.producto_id
+                                               WHERE l.venta_id IN (SELECT value FROM json_each(?))
+                                               ORDER BY l.id''', (json.dumps(sale_ids),)):
+            lines.setdefault(venta_id, []).append(line)
+        for _seq, tabla, clave, reloj, tienda, borrado, venta_id, fecha, total, *catalog in rows:
+            entry: Dict[str, Any] = {"t": tabla, "k": clave, "r": reloj, "s": tienda}
+            if tabla == "ventas":
+                if venta_id is None:
+                    continue  # inexistente, o archivada tras enviarla (reenvío con `desde`)
+                entry["v"] = {"fecha": fecha, "total": total, "lineas": lines.get(venta_id, [])}
+            elif borrado or catalog[0] is None:
+                entry["d"] = 1
+            else:
+                entry["v"] = dict(zip(CATALOG_COLUMNS, catalog))
+            yield entry
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """Cabecera de un paquete (origen, destino, rango de seq y reloj del origen)"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+    if header.get("v") != BUNDLE_FORMAT:
+        raise ValueError(f"Formato de paquete no soportado: {os.path.basename(path)}")
+    return header
+
+
+def _read_entries(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        f.readline()
+        for line in f:
+            yield json.loads(line)
+
+
+def import_bundle(connections: ConnectionManager, path: str, force: bool = False,
+                  batch: int = APPLY_BATCH) -> ImportResult:
+    """Aplica un paquete de otra tienda por lotes; importar dos veces el mismo paquete no cambia nada.
+
+    Conflictos: gana la versión con mayor (reloj, tienda), igual en todas las tiendas. Los productos
+    se aplican antes que las ventas, para que las líneas encuentren su producto. Si falta un paquete
+    anterior del mismo origen se rechaza, salvo con `force`.
+    """
+    header = read_header(path)
+    origen, desde, hasta = header["origen"], header["desde"], header["hasta"]
+    conn = connections.connection()
+    if origen == store_id(conn):
+        raise ValueError("El paquete es de esta misma tienda")
+    row = conn.execute("SELECT recibido FROM replica_pares WHERE tienda = ?", (origen,)).fetchone()
+    recibido = row[0] if row else 0
+    name = os.path.basename(path)
+    if hasta <= recibido:
+        return ImportResult(name, origen, 0, 0, 0, 0)
+    if desde > recibido and not force:
+        raise ValueError(f"Falta un paquete anterior de la tienda {origen}: "
+                         f"se recibió hasta {recibido} y este empieza en {desde}")
+
+    counts = [0, 0, 0, 0]  # productos, ventas, omitidos, conflictos
+    for tabla, apply in (("productos", _apply_product), ("ventas", _apply_sale)):
+        pending: List[Dict[str, Any]] = []
+        for entry in _read_entries(path):
+            if entry["t"] == tabla:
+                pending.append(entry)
+            if len(pending) >= batch:
+                _apply_batch(connections, apply, pending, counts)
+                pending = []
+        _apply_batch(connections, apply, pending, counts)
+
+    with connections.transaction() as conn:
+        conn.execute("UPDATE replica_estado SET reloj = MAX(reloj, ?)", (header["reloj"],))
+        conn.execute('''INSERT INTO replica_pares (tienda, recibido) VALUES (?, ?)
+                     ON CONFLICT(tienda) DO UPDATE SET recibido = MAX(recibido, excluded.recibido)''', (origen, hasta))
+    return ImportResult(name, origen, *counts)
+
+
+def import_directory(connections: ConnectionManager, directory: str) -> List[ImportResult]:
+    """Importa los paquetes dirigidos a esta tienda que todavía no se aplicaron, en orden"""
+    local = store_id(connections.connection())
+    return [import_bundle(connections, path) for path in bundle_paths(directory, destino=local)]
+
+
+def _apply_batch(connections: ConnectionManager, apply, entries: List[Dict[str, Any]], counts: List[int]) -> None:
+    if not entries:
+        return
+    with connections.transaction() as conn:
+        cursor = conn.cursor()
+        # Los triggers no registran lo importado como cambio local (se restablece antes del commit)
+        cursor.execute("UPDATE replica_estado SET aplicando = 1")
+        for entry in entries:
+            counts[apply(cursor, entry)] += 1
+        # Reloj de Lamport: los cambios locales posteriores quedan por encima de lo aplicado
+        cursor.execute("UPDATE replica_estado SET aplicando = 0, reloj = MAX(reloj, ?)",
+                       (max(entry["r"] for entry in entries),))
+
+
+def _stamp(cursor: sqlite3.Cursor, tabla: str, clave: str) -> Stamp:
+    cursor.execute("SELECT reloj, tienda FROM replica_cambios WHERE tabla = ? AND clave = ?", (tabla, clave))
+    row = cursor.fetchone()
+    return Stamp(*row) if row else Stamp(0, "")
+
+
+def _record(cursor: sqlite3.Cursor, tabla: str, clave: str, fila_id: int, stamp: Stamp, borrado: bool) -> None:
+    """Guarda la versión aplicada con la marca de origen, para reenviarla a otras tiendas"""
+    cursor.execute("UPDATE replica_estado SET seq = seq + 1")
+    cursor.execute('''INSERT INTO replica_cambios (tabla, clave, fila_id, seq, reloj, tienda, borrado)
+                   SELECT ?, ?, ?, seq, ?, ?, ? FROM replica_estado WHERE true
+                   ON CONFLICT (tabla, clave) DO UPDATE SET
+                       fila_id = excluded.fila_id, seq = excluded.seq, reloj = excluded.reloj,
+                       tienda = excluded.tienda, borrado = excluded.borrado''',
+                   (tabla, clave, fila_id, stamp.reloj, stamp.tienda, int(borrado)))
+
+
+def _apply_product(cursor: sqlite3.Cursor, entry: Dict[str, Any]) -> int:
+    """Aplica una versión de producto si es más nueva que la local; devuelve el índice del contador"""
+    clave, stamp, values = entry["k"], Stamp(entry["r"], entry["s"]), entry.get("v")
+    cursor.execute("SELECT id FROM productos WHERE uid = ?", (clave,))
+    row = cursor.fetchone()
+    if row is None and values is not None:
+        # El mismo nombre creado en dos tiendas es el mismo producto: queda el uid menor en ambas
+        cursor.execute("SELECT id, uid FROM productos WHERE nombre = ?", (values["nombre"],))
+        same_name = cursor.fetchone()
+        if same_name is not None:
+            row = (same_name[0],)
+            if clave < same_name[1]:
+                cursor.execute("UPDATE productos SET uid = ? WHERE id = ?", (clave, same_name[0]))
+                cursor.execute("UPDATE OR REPLACE replica_cambios SET clave = ? WHERE tabla = 'productos' AND clave = ?",
+                               (clave, same_name[1]))
+            else:
+                clave = same_name[1]
+    if stamp <= _stamp(cursor, "productos", clave):
+        return 2
+    fila_id = row[0] if row else 0
+    conflict = False
+    if values is None:
+        cursor.execute("DELETE FROM productos WHERE uid = ?", (clave,))
+    else:
+        values = dict(values)
+        conflict = _resolve_barcode(cursor, values, stamp, fila_id)
+        try:
+            fila_id = _write_product(cursor, clave, fila_id, values)
+        except sqlite3.IntegrityError:
+            # Nombre usado por otro producto (un renombre cruzado): se aplica el resto sin el nombre
+            values.pop("nombre")
+            if not fila_id:
+                values["nombre"] = f"{entry['v']['nombre']} ({stamp.tienda})"
+            fila_id = _write_product(cursor, clave, fila_id, values)
+            conflict = True
+    _record(cursor, "productos", clave, fila_id, stamp, values is None)
+    return 3 if conflict else 0
+
+
+def _resolve_barcode(cursor: sqlite3.Cursor, values: Dict[str, Any], stamp: Stamp, fila_id: int) -> bool:
+    """Si el código de barras lo tiene otro producto, lo conserva la versión más nueva"""
+    if not values.get("codigo_barras"):
+        return False
+    cursor.execute("SELECT id, uid FROM productos WHERE codigo_barras = ? AND id <> ?", (values["codigo_barras"], fila_id))
+    other = cursor.fetchone()
+    if other is None:
+        return False
+    if stamp > _stamp(cursor, "productos", other[1]):
+        cursor.execute("UPDATE productos SET codigo_barras = NULL WHERE id = ?", (other[0],))
+    else:
+        values["codigo_barras"] = None
+    return True
+
+
+def _write_product(cursor: sqlite3.Cursor, clave: str, fila_id: int, values: Dict[str, Any]) -> int:
+    if fila_id:
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        cursor.execute(f"UPDATE productos SET {assignments} WHERE id = ?", (*values.values(), fila_id))
+        return fila_id
+    cursor.execute(f'''INSERT INTO productos (uid, cantidad, {", ".join(values)})
+                    VALUES (?, 0, {", ".join("?" for _ in values)})''', (clave, *values.values()))
+    return cursor.lastrowid
+
+
+def _apply_sale(cursor: sqlite3.Cursor, entry: Dict[str, Any]) -> int:
+    """Registra una venta de otra tienda si todavía no está; las líneas de productos desconocidos quedan con id 0"""
+    venta = entry["v"]
+    uids = [line[0] for line in venta["lineas"]]
+    cursor.execute("SELECT uid, id FROM productos WHERE uid IN (SELECT value FROM json_each(?))", (json.dumps(uids),))
+    ids = dict(cursor.fetchall())
+    lines = [(ids.get(uid, 0), *rest) for uid, *rest in venta["lineas"]]
+    if ledger.record_replicated_sale(cursor, venta["fecha"], venta["total"], entry["k"], lines) is None:
+        return 2
+    return 1
+
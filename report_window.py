@@ -0,0 +1,85 @@
+import math
+import tkinter as tk
+import ttkbootstrap as tb
+from money import Money
+from reports import SalesReport
+
+PERIODS = {"7 días": 7, "30 días": 30, "90 días": 90, "365 días": 365}
+
+
+class ReportWindow(tb.Toplevel):
+    """Ventana de reportes: más vendidos, margen, velocidad y días de stock"""
+
+    def __init__(self, parent, engine, worker):
+        super().__init__(parent)
+        self.engine = engine
+        self.worker = worker
+        self.title("Reportes de Ventas e Inventario")
+        self.geometry("900x500")
+
+        controls = tb.Frame(self, padding=10)
+        controls.pack(fill=tk.X)
+        tb.Label(controls, text="Período:").pack(side=tk.LEFT, padx=5)
+        self.period = tb.Combobox(controls, values=list(PERIODS), state="readonly", width=10)
+        self.period.set("30 días")
+        self.period.pack(side=tk.LEFT, padx=5)
+        self.period.bind("<<ComboboxSelected>>", lambda e: self.load())
+        self.summary_label = tb.Label(controls, text="Calculando...", font=("Helvetica", 10, "bold"))
+        self.summary_label.pack(side=tk.LEFT, padx=15)
+
+        columns = [
+            ("nombre", "Producto", 200),
+            ("unidades", "Unidades", 80),
+            ("ventas", "Ventas", 100),
+            ("margen", "Margen", 100),
+            ("margen_pct", "% Margen", 80),
+            ("velocidad", "Unid./día", 80),
+            ("dias_stock", "Días de stock", 100),
+            ("cambio", "vs. anterior", 100),
+        ]
+        self.tree = tb.Treeview(
+            self, columns=[c for c, _t, _w in columns], show="headings", bootstyle="info"
+        )
+        for col, text, width in columns:
+            self.tree.heading(col, text=text)
+            self.tree.column(col, anchor="center", width=width)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.load()
+
+    def load(self) -> None:
+        """Calcula el reporte en segundo plano (instantáneo si el libro no cambió)"""
+        dias = PERIODS[self.period.get()]
+        self.summary_label.config(text="Calculando...")
+        self.worker.submit(self.engine.sales_report, dias, on_done=self._show, key="report")
+
+    def _show(self, report: SalesReport) -> None:
+        if not self.winfo_exists():
+            return
+        self.summary_label.config(
+            text=f"{report.desde} a {report.hasta}:  Ventas ${Money(report.ventas)} "
+            f"({_change(report.ventas, report.ventas_anterior)} vs. período anterior)  |  "
+            f"Unidades {report.unidades}  |  Margen ${Money(report.margen)}"
+        )
+        self.tree.delete(*self.tree.get_children())
+        for p in report.productos:
+            self.tree.insert(
+                "",
+                tk.END,
+                values=(
+                    p.nombre,
+                    p.unidades,
+                    f"${Money(p.ventas)}",
+                    f"${Money(p.margen)}",
+                    f"{p.margen_pct:.1f}%",
+                    f"{p.velocidad:.2f}",
+                    "—" if math.isinf(p.dias_stock) else f"{p.dias_stock:.0f}",
+                    _change(p.ventas, p.ventas_anterior),
+                ),
+            )
+
+
+def _change(actual: float, anterior: float) -> str:
+    """Variación porcentual respecto del período anterior"""
+    if not anterior:
+        return "nuevo" if actual else "—"
+    return f"{(actual - anterior) / anterior * 100:+.1f}%"
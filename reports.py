@@ -0,0 +1,123 @@
+from datetime import date, timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from archive import SalesArchive
+from money import Cents
+
+try:
+    import numpy as np
+except ImportError:  # dependencia opcional: solo la usan los reportes
+    np = None
+
+
+class ProductReport(NamedTuple):
+    """Métricas de un producto en el período del reporte (importes en centavos)"""
+    producto_id: int
+    nombre: str
+    unidades: int
+    ventas: Cents
+    margen: Cents
+    margen_pct: float
+    velocidad: float  # unidades por día
+    dias_stock: float  # días de stock restante al ritmo actual (inf si no se vende)
+    ventas_anterior: Cents
+
+
+class SalesReport(NamedTuple):
+    """Reporte de ventas e inventario de un período comparado con el anterior (importes en centavos)"""
+    desde: str
+    hasta: str
+    dias: int
+    ventas: Cents
+    ventas_anterior: Cents
+    unidades: int
+    margen: Cents
+    productos: List[ProductReport]
+
+
+class ReportEngine:
+    """Calcula métricas de ventas con group-by vectorizados sobre lotes columnares"""
+
+    def __init__(self, db, batch_size: int = 50000, archive: Optional[SalesArchive] = None):
+        if np is None:
+            raise RuntimeError("Los reportes requieren NumPy (pip install numpy)")
+        self.db = db
+        self.batch_size = batch_size
+        # Meses cerrados que el mantenimiento pasó a archivos aparte (archive.SalesArchive)
+        self.archive = archive
+        self._cache: Dict[Tuple, SalesReport] = {}
+
+    def _fetch_columns(self, rows: Iterable[Tuple], columns: int) -> "np.ndarray":
+        """Lee filas por lotes de batch_size y las devuelve como matriz (filas x columnas)"""
+        rows = iter(rows)
+        chunks = []
+        while batch := list(islice(rows, self.batch_size)):
+            chunks.append(np.array(batch, dtype=np.float64))
+        if not chunks:
+            return np.empty((0, columns), dtype=np.float64)
+        return np.concatenate(chunks)
+
+    def sales_report(self, dias: int = 30, top: int = 50, hasta: Optional[date] = None) -> SalesReport:
+        """Reporte de los últimos `dias` días; se reutiliza mientras el libro no cambie"""
+        hasta = hasta or date.today()
+        key = (self.db.get_ledger_mark(), dias, top, hasta)
+        if key not in self._cache:
+            self._cache = {key: self._compute(dias, top, hasta)}
+        return self._cache[key]
+
+    def _compute(self, dias: int, top: int, hasta: date) -> SalesReport:
+        inicio = hasta - timedelta(days=dias - 1)
+        inicio_anterior = inicio - timedelta(days=dias)
+        # (id de línea, producto_id, cantidad, subtotal, costo de lo vendido, día relativo al inicio del período)
+        lines = self._fetch_columns(
+            self.db.iter_report_lines(inicio.isoformat(), inicio_anterior.isoformat(), hasta.isoformat(),
+                                      self.batch_size),
+            6,
+        )
+        if self.archive is not None:
+            lines = self._with_archived(lines, inicio_anterior.isoformat(), hasta.isoformat(), inicio.isoformat())
+        current = lines[:, 5] >= 0
+        ids, inverse = np.unique(lines[:, 1].astype(np.int64), return_inverse=True)
+        n = len(ids)
+        unidades = np.bincount(inverse, weights=lines[:, 2] * current, minlength=n)
+        ventas = np.bincount(inverse, weights=lines[:, 3] * current, minlength=n)
+        ventas_anterior = np.bincount(inverse, weights=lines[:, 3] * ~current, minlength=n)
+        # Costo guardado en cada línea al vender: el margen no depende de recorrer las compras
+        costo_ventas = np.bincount(inverse, weights=lines[:, 4] * current, minlength=n)
+
+        # Stock y nombre actuales de los productos vendidos (los eliminados quedan sin stock)
+        actuales = {row[0]: row for row in self.db.get_products_by_ids(ids.tolist())}
+        stock = np.array([actuales[i][2] if i in actuales else 0 for i in ids.tolist()], dtype=np.float64)
+        nombres = {producto_id: row[1] for producto_id, row in actuales.items()}
+
+        margen = ventas - costo_ventas
+        with np.errstate(divide="ignore", invalid="ignore"):
+            margen_pct = np.where(ventas > 0, margen / ventas * 100, 0.0)
+            velocidad = unidades / dias
+            dias_stock = np.where(velocidad > 0, stock / velocidad, np.inf)
+
+        ranking = np.argsort(-ventas, kind="stable")[:top]
+        productos = [
+            ProductReport(
+                int(ids[i]), nombres.get(int(ids[i]), f"ID {int(ids[i])}"), int(unidades[i]),
+                round(ventas[i]), round(margen[i]), float(margen_pct[i]),
+                float(velocidad[i]), float(dias_stock[i]), round(ventas_anterior[i]),
+            )
+            for i in ranking
+            if unidades[i] > 0 or ventas_anterior[i] > 0
+        ]
+        return SalesReport(
+            inicio.isoformat(), hasta.isoformat(), dias,
+            round(ventas.sum()), round(ventas_anterior.sum()), int(unidades.sum()), round(margen.sum()),
+            productos,
+        )
+
+    def _with_archived(self, lines: "np.ndarray", desde: str, hasta: str, referencia: str) -> "np.ndarray":
+        """Agrega las líneas del período que ya están en el archivo mensual"""
+        archived = list(self.archive.iter_sale_lines(desde, hasta, referencia))
+        if not archived:
+            return lines
+        archived = np.array(archived, dtype=np.float64)
+        # Un lote a medio archivar puede estar en ambos lados: cada línea se cuenta una vez
+        archived = archived[~np.isin(archived[:, 0], lines[:, 0])]
+        return np.concatenate([lines, archived])
@@ -1,6 +1,6 @@
 import tkinter as tk
 import ttkbootstrap as tb
-from constants import IVA_PERCENT
+from money import Cents, Money
 
 class SaleDetailsPanel(tb.Frame):
     """Panel para mostrar los detalles de la venta"""
@@ -11,19 +11,21 @@ class SaleDetailsPanel(tb.Frame):
     def _create_ui(self):
         tb.Label(self, text="Detalles de Venta", font=('Helvetica', 12, 'bold')).pack(pady=5)
         self.entries = {}
+        self.labels = {}
         fields = [
             ("Producto:", "producto"),
             ("Precio Unitario:", "precio"),
             ("Cantidad:", "cantidad"),
             ("Subtotal:", "subtotal"),
-            (f"IVA ({IVA_PERCENT*100:.0f}%):", "iva"),
+            (self._iva_label_text(), "iva"),
             ("Total:", "total")
         ]
         
         for label, key in fields:
             frame = tb.Frame(self)
             frame.pack(fill=tk.X, pady=2)
-            tb.Label(frame, text=label, width=15, anchor="w").pack(side=tk.LEFT, padx=5)
+            self.labels[key] = tb.Label(frame, text=label, width=15, anchor="w")
+            self.labels[key].pack(side=tk.LEFT, padx=5)
             entry = tb.Entry(frame, state='readonly')
             entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
             self.entries[key] = entry
@@ -33,10 +35,17 @@ class SaleDetailsPanel(tb.Frame):
             command=self.master._show_totals, width=15
         ).pack(pady=10)
     
-    def update_details(self, producto: str, precio: float, cantidad: int) -> None:
-        iva_percent = self.master.db.get_iva_percent()  # Obtener de DB
-        subtotal = precio * cantidad
-        iva = subtotal * iva_percent
+    def _iva_label_text(self) -> str:
+        return f"IVA ({self.master.db.get_iva_percent()*100:.0f}%):"
+
+    def refresh_iva(self) -> None:
+        """Actualiza la etiqueta del IVA tras un cambio de configuración"""
+        self.labels["iva"].config(text=self._iva_label_text())
+
+    def update_details(self, producto: str, precio: Cents, cantidad: int) -> None:
+        iva_percent = self.master.db.get_iva_percent()  # Caché de configuraciones
+        subtotal = Money(precio) * cantidad
+        iva = subtotal.percent(iva_percent)  # Redondeo bancario al centavo
         total = subtotal + iva
         
         for entry in self.entries.values():
@@ -44,11 +53,12 @@ class SaleDetailsPanel(tb.Frame):
             entry.delete(0, tk.END)
         
         self.entries['producto'].insert(0, producto)
-        self.entries['precio'].insert(0, f"${precio:.2f}")
+        self.entries['precio'].insert(0, f"${Money(precio)}")
         self.entries['cantidad'].insert(0, str(cantidad))
-        self.entries['subtotal'].insert(0, f"${subtotal:.2f}")
-        self.entries['iva'].insert(0, f"${iva:.2f}")
-        self.entries['total'].insert(0, f"${total:.2f}")
+        self.entries['subtotal'].insert(0, f"${subtotal}")
+        self.entries['iva'].insert(0, f"${iva}")
+        self.entries['total'].insert(0, f"${total}")
+        self.labels['iva'].config(text=f"IVA ({iva_percent*100:.0f}%):")
         
         for entry in self.entries.values():
             entry.config(state='readonly')
@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+import costing
+from connection import ConnectionManager
+from constants import IVA_PERCENT
+
+# Configuraciones conocidas: clave -> (conversor desde el texto guardado, valor por defecto)
+SETTINGS: Dict[str, Tuple[Callable[[str], Any], Any]] = {
+    "iva_percent": (float, IVA_PERCENT),
+    "metodo_costo": (str, costing.AVERAGE),
+}
+
+# Intervalo mínimo entre verificaciones de PRAGMA data_version por hilo (segundos)
+CHECK_INTERVAL = 0.5
+
+
+class SettingsCache:
+    """Caché tipada de la tabla configuraciones, invalidada por PRAGMA data_version"""
+
+    def __init__(self, connections: ConnectionManager):
+        self._connections = connections
+        self._lock = threading.Lock()
+        self._values: Optional[Dict[str, Any]] = None
+        self._local = threading.local()
+
+    def _load(self, conn) -> Dict[str, Any]:
+        values = {key: default for key, (_convert, default) in SETTINGS.items()}
+        for clave, valor in conn.execute("SELECT clave, valor FROM configuraciones"):
+            if clave in SETTINGS:
+                values[clave] = SETTINGS[clave][0](valor)
+        return values
+
+    def _check(self) -> Dict[str, Any]:
+        """Recarga si otra conexión confirmó cambios desde la última verificación de este hilo"""
+        now = time.monotonic()
+        if self._values is not None and now - getattr(self._local, "checked", 0.0) < CHECK_INTERVAL:
+            return self._values
+        conn = self._connections.connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        self._local.checked = now
+        with self._lock:
+            if self._values is None or version != getattr(self._local, "version", None):
+                values = self._load(conn)
+                if self._connections.in_transaction() and getattr(self._local, "uncommitted", False):
+                    # Incluye un set() sin confirmar que un ROLLBACK descartaría: no se guarda
+                    self._local.checked = 0.0
+                    return values
+                self._local.uncommitted = False
+                self._values = values
+            self._local.version = version
+            return self._values
+
+    def get(self, key: str) -> Any:
+        """Obtiene una configuración desde memoria"""
+        return self._check()[key]
+
+    def set(self, key: str, value: Any) -> None:
+        """Guarda una configuración y actualiza la caché"""
+        convert, _default = SETTINGS[key]
+        value = convert(str(value))
+        with self._connections.transaction() as conn:
+            conn.execute("INSERT INTO configuraciones (clave, valor) VALUES (?, ?) "
+                         "ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor", (key, str(value)))
+        with self._lock:
+            if self._connections.in_transaction():
+                # Dentro de una transacción externa que aún puede revertirse: recargar en la próxima lectura
+                self._values = None
+                self._local.uncommitted = True
+            elif self._values is not None:
+                self._values = {**self._values, key: value}
+
+    def invalidate(self) -> None:
+        """Fuerza la recarga en la próxima lectura"""
+        with self._lock:
+            self._values = None
+
+    @property
+    def iva_percent(self) -> float:
+        return self.get("iva_percent")
+
+    @property
+    def costing_method(self) -> str:
+        return self.get("metodo_costo")
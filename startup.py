@@ -0,0 +1,74 @@
+import json
+import os
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+# Versión del formato de la instantánea (una distinta se ignora y se reconstruye); 2: precios en centavos
+SNAPSHOT_FORMAT = 2
+
+
+class ProductSnapshot(NamedTuple):
+    """Primera página de productos (orden por id) tal como estaba en un token de cambios"""
+    token: int
+    total: int
+    rows: List[Tuple[int, str, int, int, float]]  # precio en centavos
+
+
+def snapshot_path(db_name: str) -> str:
+    """Archivo de la instantánea junto a la base"""
+    return f"{db_name}.inicio"
+
+
+def load_snapshot(path: str) -> Optional[ProductSnapshot]:
+    """Lee la instantánea; None si no existe o no se puede usar"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("v") != SNAPSHOT_FORMAT:
+            return None
+        return ProductSnapshot(data["token"], data["total"], [tuple(row) for row in data["rows"]])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_snapshot(path: str, snapshot: ProductSnapshot) -> None:
+    """Escribe la instantánea de forma atómica (archivo temporal y reemplazo)"""
+    temp = f"{path}.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump({"v": SNAPSHOT_FORMAT, "token": snapshot.token, "total": snapshot.total,
+                   "rows": snapshot.rows}, f, separators=(",", ":"))
+    os.replace(temp, path)
+
+
+def build_snapshot(db, limit: int) -> ProductSnapshot:
+    """Lee la primera página; el token se lee antes para que nunca sea más nuevo que las filas"""
+    token = db.get_change_token()
+    return ProductSnapshot(token, db.count_products(), db.get_products_page("id", None, limit))
+
+
+class StartupTimer:
+    """Marcas de tiempo de las fases del arranque"""
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self.marks: List[Tuple[str, float]] = []  # (fase, segundos desde el inicio)
+
+    def mark(self, phase: str) -> None:
+        self.marks.append((phase, time.perf_counter() - self.started))
+
+    def phases(self) -> List[Tuple[str, float, float]]:
+        """(fase, segundos desde el inicio, duración desde la marca anterior)"""
+        result, previous = [], 0.0
+        for phase, at in self.marks:
+            result.append((phase, at, at - previous))
+            previous = at
+        return result
+
+    @property
+    def total(self) -> float:
+        return self.marks[-1][1] if self.marks else 0.0
+
+    def report(self) -> str:
+        """Resumen de una línea, p. ej. 'Inicio 180 ms: base de datos 4 ms, interfaz 35 ms, ...'"""
+        parts = ", ".join(f"{phase} {duration * 1000:.0f} ms" for phase, _at, duration in self.phases())
+        return f"Inicio {self.total * 1000:.0f} ms: {parts}"
@@ -0,0 +1,72 @@
+import json
+import math
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional
+import ledger
+
+# Ventana de ventas con la que se estima la velocidad de cada producto (días)
+VELOCITY_DAYS = 30
+# Días de venta que debe cubrir la reposición sugerida por encima del mínimo
+COVER_DAYS = 14
+
+
+class LowStockItem(NamedTuple):
+    """Producto por debajo de su mínimo"""
+    producto_id: int
+    nombre: str
+    cantidad: int
+    stock_minimo: int
+    desde: str  # cuándo entró en alerta
+
+
+class ReorderSuggestion(NamedTuple):
+    """Reposición sugerida para un producto en alerta"""
+    producto_id: int
+    nombre: str
+    cantidad: int
+    stock_minimo: int
+    vendidas: int  # unidades vendidas en la ventana
+    diaria: float  # unidades por día
+    sugerido: int
+
+
+def low_stock(cursor: sqlite3.Cursor, product_ids: Optional[Iterable[int]] = None) -> List[LowStockItem]:
+    """Productos en alerta (todos o solo los indicados), los más antiguos primero"""
+    where, params = "", ()
+    if product_ids is not None:
+        where, params = "WHERE b.producto_id IN (SELECT value FROM json_each(?))", (json.dumps(list(product_ids)),)
+    # CROSS JOIN fija el orden: se parte de las alertas y no de todos los productos
+    cursor.execute(f"""SELECT p.id, p.nombre, p.cantidad, p.stock_minimo, b.desde
+                    FROM stock_bajo b CROSS JOIN productos p ON p.id = b.producto_id
+                    {where} ORDER BY b.desde, p.id""", params)
+    return [LowStockItem(*row) for row in cursor.fetchall()]
+
+
+def reorder_suggestions(cursor: sqlite3.Cursor, dias: int = VELOCITY_DAYS,
+                        cobertura: int = COVER_DAYS) -> List[ReorderSuggestion]:
+    """Reposición sugerida para los productos en alerta según su velocidad de venta reciente.
+
+    Se calcula en lote para todas las alertas: las líneas se numeran en orden de venta, así que basta con
+    ubicar la primera línea de la ventana y leer, por el índice de producto, solo las posteriores
+    de los productos en alerta. Se sugiere llegar al mínimo más `cobertura` días de venta y, como
+    piso, a una unidad por encima del mínimo para salir de la alerta.
+    """
+    desde = ledger.timestamp(datetime.now() - timedelta(days=dias))
+    # Sin ventas en la ventana, la primera línea es la siguiente a la última
+    cursor.execute("""SELECT COALESCE((SELECT MIN(l.id) FROM venta_lineas l WHERE l.venta_id =
+                                          (SELECT id FROM ventas WHERE fecha >= ? ORDER BY fecha LIMIT 1)),
+                                      (SELECT COALESCE(MAX(id), 0) + 1 FROM venta_lineas))""", (desde,))
+    first_line = cursor.fetchone()[0]
+    cursor.execute("""SELECT p.id, p.nombre, p.cantidad, p.stock_minimo,
+                             (SELECT COALESCE(SUM(l.cantidad), 0) FROM venta_lineas l
+                              WHERE l.producto_id = p.id AND l.id >= ?)
+                      FROM stock_bajo b CROSS JOIN productos p ON p.id = b.producto_id
+                      ORDER BY b.desde, p.id""", (first_line,))
+    suggestions = []
+    for producto_id, nombre, cantidad, minimo, vendidas in cursor.fetchall():
+        diaria = vendidas / dias
+        objetivo = max(minimo + math.ceil(diaria * cobertura), minimo + 1)
+        suggestions.append(ReorderSuggestion(producto_id, nombre, cantidad, minimo, vendidas, diaria,
+                                             max(objetivo - cantidad, 0)))
+    return suggestions
@@ -0,0 +1,30 @@
+import os
+import sys
+from typing import Callable, Iterator, List
+
+import pytest
+
+# Módulos planos en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def make_db(tmp_path) -> Iterator[Callable[[str], DatabaseManager]]:
+    """Abre bases nuevas en el directorio temporal (una por nombre) y las cierra al terminar"""
+    opened: List[DatabaseManager] = []
+
+    def make(name: str = "inventario.db") -> DatabaseManager:
+        db = DatabaseManager(str(tmp_path / name))
+        opened.append(db)
+        return db
+
+    yield make
+    for db in opened:
+        db.close()
+
+
+@pytest.fixture
+def db(make_db) -> DatabaseManager:
+    return make_db()
@@ -0,0 +1,101 @@
+from cart import CartManager
+
+
+def test_retry_reuses_ref_until_cart_changes(tmp_path):
+    carts = CartManager(str(tmp_path / "carritos.jsonl"))
+    session = carts.current
+    carts.add(1, "arroz 1kg", 1500, 2)
+
+    ref = carts.begin_checkout(session)
+    carts.fail_checkout(session)
+    # Respuesta perdida: el cajero vuelve a cobrar el mismo carrito
+    assert carts.begin_checkout(session) == ref
+    carts.fail_checkout(session)
+
+    carts.add(2, "azucar 1kg", 1200)
+    edited = carts.begin_checkout(session)
+    assert edited != ref
+    assert carts.cart.pending_lines == [(1, 2, 1500), (2, 1, 1200)]
+    carts.fail_checkout(session)
+
+    carts.remove(2)
+    assert carts.begin_checkout(session) not in (ref, edited)
+
+
+def test_line_added_during_checkout_survives(tmp_path):
+    journal = str(tmp_path / "carritos.jsonl")
+    carts = CartManager(journal)
+    session = carts.current
+    carts.add(1, "arroz 1kg", 1500, 2)
+    ref = carts.begin_checkout(session)
+
+    # El cajero sigue escaneando mientras la venta está en la base
+    carts.add(1, "arroz 1kg", 1500)
+    carts.add(2, "azucar 1kg", 1200)
+    assert carts.is_checking_out(session)
+    # Cobrar otra vez sin respuesta repite la misma venta, no una nueva
+    assert carts.begin_checkout(session) == ref
+    assert carts.cart.pending_lines == [(1, 2, 1500)]
+
+    carts.complete_checkout(session, ref)
+    carts.complete_checkout(session, ref)  # respuesta del segundo envío: ya descontado
+
+    remaining = [(line.producto_id, line.cantidad) for line in carts.cart]
+    assert remaining == [(1, 1), (2, 1)]
+    assert carts.cart.total == 1500 + 1200
+    assert carts.cart.pending_ref is None
+    carts.close()
+
+    # El diario reproduce el mismo carrito
+    replayed = CartManager(journal)
+    assert [(line.producto_id, line.cantidad) for line in replayed.cart] == remaining
+    assert replayed.pending_checkouts() == {}
+    replayed.close()
+
+
+def test_failed_checkout_with_edits_gets_new_ref():
+    carts = CartManager()
+    session = carts.current
+    carts.add(1, "arroz 1kg", 1500)
+    ref = carts.begin_checkout(session)
+    carts.add(2, "azucar 1kg", 1200)
+
+    carts.fail_checkout(session)
+
+    assert not carts.is_checking_out(session)
+    assert carts.begin_checkout(session) != ref
+    assert carts.cart.pending_lines == [(1, 1, 1500), (2, 1, 1200)]
+
+
+def test_pending_ref_survives_restart_and_clears_on_success(tmp_path):
+    journal = str(tmp_path / "carritos.jsonl")
+    carts = CartManager(journal)
+    session = carts.current
+    carts.add(1, "arroz 1kg", 1500)
+    ref = carts.begin_checkout(session)
+    carts.close()
+
+    carts = CartManager(journal)
+    assert carts.pending_checkouts() == {session: ref}
+    assert carts.begin_checkout(session) == ref
+
+    carts.complete_checkout(session, ref)
+    assert carts.pending_checkouts() == {}
+    carts.add(1, "arroz 1kg", 1500)
+    assert carts.begin_checkout(session) != ref
+    carts.close()
+
+
+def test_retried_checkout_records_one_sale(db):
+    producto_id = db.add_or_update_product("arroz 1kg", 10, 1500, 25.0)
+    carts = CartManager()
+    carts.add(producto_id, "arroz 1kg", 1500, 2)
+    lines = carts.cart.checkout_lines()
+
+    first = db.process_cart(lines, carts.begin_checkout())
+    carts.fail_checkout(carts.current)  # la respuesta se perdió
+    retried = db.process_cart(carts.cart.pending_lines, carts.begin_checkout())
+
+    assert first == retried == 3000
+    assert db.query("SELECT COUNT(*) FROM ventas").fetchone()[0] == 1
+    assert db.query("SELECT cantidad FROM productos WHERE id = ?", (producto_id,)).fetchone()[0] == 8
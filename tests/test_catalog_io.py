@@ -0,0 +1,67 @@
+import csv
+
+import pytest
+
+from catalog_io import CATALOG_FIELDS, export_catalog, import_catalog
+
+ROWS = 25
+
+
+def write_csv(path, rows) -> str:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CATALOG_FIELDS)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def catalog_csv(tmp_path) -> str:
+    """Catálogo CSV de ROWS productos con precios en pesos"""
+    return write_csv(tmp_path / "catalogo.csv",
+                     ((f"producto {i:03d}", i, f"{i}.50", 25) for i in range(1, ROWS + 1)))
+
+
+def test_import_streams_in_batches(db, catalog_csv):
+    progress = []
+
+    imported = import_catalog(db, catalog_csv, batch_size=10, progress=progress.append)
+
+    assert imported == ROWS
+    assert progress == [10, 20, 25]
+    assert db.count_products() == ROWS
+    assert db.get_product_price(db.get_product_id("producto 007")) == 750
+    # Cada fila entra como compra: el stock y su costo quedan en el libro
+    assert db.query("SELECT SUM(cantidad) FROM entradas_stock").fetchone()[0] == ROWS * (ROWS + 1) // 2
+
+
+def test_import_adds_to_existing_stock(db, catalog_csv):
+    import_catalog(db, catalog_csv)
+    import_catalog(db, catalog_csv)
+
+    assert db.count_products() == ROWS
+    assert db.query("SELECT cantidad FROM productos WHERE nombre = 'producto 003'").fetchone()[0] == 6
+
+
+def test_invalid_row_stops_after_committed_batches(db, tmp_path):
+    rows = [(f"producto {i}", 1, "2.00", 10) for i in range(1, 6)]
+    rows.insert(3, ("producto malo", 1, "no es precio", 10))
+    path = write_csv(tmp_path / "con_error.csv", rows)
+
+    with pytest.raises(ValueError, match="Línea 5"):
+        import_catalog(db, path, batch_size=2)
+
+    # El lote con la fila inválida no se aplica; los anteriores ya quedaron confirmados
+    assert db.count_products() == 2
+
+
+def test_export_import_round_trip(make_db, catalog_csv, tmp_path):
+    origen, destino = make_db("origen.db"), make_db("destino.db")
+    import_catalog(origen, catalog_csv)
+    exported = tmp_path / "exportado.jsonl"
+
+    assert export_catalog(origen, str(exported), batch_size=7) == ROWS
+    assert import_catalog(destino, str(exported)) == ROWS
+
+    copia = [row[1:] for row in destino.iter_products()]
+    assert copia == [row[1:] for row in origen.iter_products()]
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from checkout import InsufficientStockError
+from database import DatabaseManager
+
+STOCK = 5
+CASHIERS = 12
+
+
+def test_concurrent_checkouts_never_oversell(db):
+    producto_id = db.add_or_update_product("cafe 500g", STOCK, 1000, 20.0)
+    barrier = threading.Barrier(CASHIERS)
+    sold, errors = [], []
+    lock = threading.Lock()
+
+    def cashier(index: int) -> None:
+        # Cada caja con su propio DatabaseManager (sus conexiones) sobre el mismo archivo
+        register = DatabaseManager(db.db_name)
+        try:
+            barrier.wait()
+            total = register.process_cart([(producto_id, 1, 1000)], ref=f"caja-{index}")
+            with lock:
+                sold.append(total)
+        except Exception as e:  # noqa: BLE001 - se verifica el tipo abajo
+            with lock:
+                errors.append(e)
+        finally:
+            register.close()
+
+    threads = [threading.Thread(target=cashier, args=(i,)) for i in range(CASHIERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cantidad = db.query("SELECT cantidad FROM productos WHERE id = ?", (producto_id,)).fetchone()[0]
+    vendido = db.query("SELECT COALESCE(SUM(cantidad), 0) FROM venta_lineas WHERE producto_id = ?",
+                       (producto_id,)).fetchone()[0]
+    assert cantidad >= 0
+    assert vendido == STOCK - cantidad == len(sold) == STOCK
+    assert len(errors) == CASHIERS - STOCK
+    assert all(isinstance(e, InsufficientStockError) for e in errors)
+    assert all(e.shortages[0][0] == producto_id for e in errors)
+
+
+def test_cart_fails_whole_when_any_line_is_short(db):
+    arroz = db.add_or_update_product("arroz 1kg", 3, 1500, 20.0)
+    leche = db.add_or_update_product("leche 1L", 1, 900, 20.0)
+    with pytest.raises(InsufficientStockError) as error:
+        db.process_cart([(arroz, 2, 1500), (leche, 2, 900)])
+    assert [shortage[0] for shortage in error.value.shortages] == [leche]
+    stock = dict(db.query("SELECT id, cantidad FROM productos").fetchall())
+    assert stock == {arroz: 3, leche: 1}
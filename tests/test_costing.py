@@ -0,0 +1,69 @@
+import pytest
+
+import bulk_ops
+import costing
+
+# Dos compras del mismo producto a distinto costo (margen 0: el costo es el precio)
+PURCHASES = ((10, 1000), (10, 2000))
+
+
+@pytest.fixture
+def stocked(db):
+    """Base con las dos compras de PURCHASES; devuelve (db, producto_id)"""
+    for cantidad, precio in PURCHASES:
+        producto_id = db.add_or_update_product("harina 1kg", cantidad, precio, 0.0)
+    return db, producto_id
+
+
+@pytest.mark.parametrize("method, vendidas, costo", [
+    (costing.AVERAGE, 5, 7500),  # 5 x (30000 / 20)
+    (costing.FIFO, 5, 5000),  # 5 del primer lote
+    (costing.AVERAGE, 15, 22500),
+    (costing.FIFO, 15, 20000),  # 10 x 1000 + 5 x 2000
+])
+def test_cost_of_goods_sold_by_method(stocked, method, vendidas, costo):
+    db, producto_id = stocked
+    db.set_costing_method(method)
+
+    db.process_cart([(producto_id, vendidas, 2500)])
+
+    totals = db.get_totals()
+    assert totals.costo_ventas == costo
+    assert totals.inventario == 30000 - costo
+    assert db.query("SELECT SUM(costo) FROM venta_lineas").fetchone()[0] == costo
+
+
+def test_fifo_after_average_uses_remaining_lots(stocked):
+    db, producto_id = stocked
+    db.process_cart([(producto_id, 5, 2500)])  # promedio: 7500, pero consume el primer lote
+    db.set_costing_method(costing.FIFO)
+    # Al pasar a FIFO el stock se revalúa con los lotes abiertos: 5 x 1000 + 10 x 2000
+    assert db.get_totals().inventario == 25000
+
+    db.process_cart([(producto_id, 10, 2500)])
+
+    assert db.get_totals().costo_ventas == 7500 + 5 * 1000 + 5 * 2000
+    assert db.get_totals().inventario == 5 * 2000
+
+
+def test_inventory_value_rollup_matches_products(stocked):
+    db, producto_id = stocked
+    other = db.add_or_update_product("sal 500g", 6, 400, 0.0)
+
+    def assert_rollup() -> None:
+        scanned = db.query("SELECT COALESCE(SUM(valor_stock), 0) FROM productos").fetchone()[0]
+        assert db.get_totals().inventario == scanned
+
+    assert_rollup()
+    db.process_cart([(producto_id, 3, 2500), (other, 1, 500)])
+    assert_rollup()
+    db.update_product(producto_id, "harina 1kg", 12, 1000, 0.0)  # ajuste de stock hacia abajo
+    assert_rollup()
+    db.apply_bulk(bulk_ops.STOCK, 4)
+    assert_rollup()
+    db.undo_bulk()
+    assert_rollup()
+    db.delete_product(other)
+    assert_rollup()
+    db.set_costing_method(costing.FIFO)  # revalúa desde los lotes
+    assert_rollup()
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from db_worker import DatabaseWorker
+
+
+class FakeRoot:
+    """Sustituto de Tk: guarda los after() y los errores informados de los callbacks"""
+
+    def __init__(self):
+        self.scheduled = []
+        self.reported = []
+
+    def after(self, _ms, fn):
+        self.scheduled.append(fn)
+
+    def report_callback_exception(self, exc_type, value, traceback):
+        self.reported.append(value)
+
+    def run(self, timeout: float = 5.0) -> None:
+        """Ejecuta los sondeos programados hasta que el trabajador no tenga pendientes"""
+        deadline = time.monotonic() + timeout
+        while self.scheduled:
+            assert time.monotonic() < deadline, "el sondeo no terminó"
+            self.scheduled.pop(0)()
+            time.sleep(0.001)
+
+
+@pytest.fixture
+def root():
+    return FakeRoot()
+
+
+@pytest.fixture
+def worker(root):
+    worker = DatabaseWorker(root)
+    yield worker
+    worker.shutdown()
+
+
+def test_failing_callback_does_not_stop_polling(root, worker):
+    def broken(_result):
+        raise RuntimeError("falla del callback")
+
+    worker.submit(lambda: 1, on_done=broken)
+    root.run()
+    assert [str(e) for e in root.reported] == ["falla del callback"]
+
+    results = []
+    worker.submit(lambda: 2, on_done=results.append)
+    worker.submit(lambda: 3, on_done=results.append)
+    root.run()
+    assert results == [2, 3]
+    assert worker._polling is False
+
+
+def test_unhandled_error_is_reported_and_later_results_arrive(root, worker):
+    results = []
+    worker.submit(lambda: 1 / 0)
+    worker.submit(lambda: "siguiente", on_done=results.append)
+    root.run()
+    assert len(root.reported) == 1 and isinstance(root.reported[0], ZeroDivisionError)
+    assert results == ["siguiente"]
+
+
+def test_error_handler_receives_worker_exceptions(root, worker):
+    errors = []
+    worker.submit(lambda: [][0], on_error=errors.append)
+    root.run()
+    assert len(errors) == 1 and isinstance(errors[0], IndexError)
+    assert root.reported == []
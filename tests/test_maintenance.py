@@ -0,0 +1,28 @@
+import maintenance
+
+
+def test_trim_change_log_keeps_recent_entries(db):
+    for i in range(12):
+        db.add_or_update_product(f"producto {i}", 1, 100, 0.0)
+    token = db.get_change_token()
+    conn = db._connections.connection()
+    total = conn.execute("SELECT COUNT(*) FROM cambios").fetchone()[0]
+
+    detail = maintenance.trim_change_log(conn, keep=5, rows=3, pause=0.0)
+
+    assert [seq for (seq,) in conn.execute("SELECT seq FROM cambios")] == list(range(token - 4, token + 1))
+    assert detail.startswith(f"{total - 5} entradas")
+    # Un token anterior al recorte pide recargar todo; uno reciente sigue siendo incremental
+    assert db.get_changes(1).reset
+    assert not db.get_changes(token - 2).reset
+    assert maintenance.trim_change_log(conn, keep=5) == "Registro de cambios dentro del límite"
+
+
+def test_service_trims_change_log_as_a_task(db):
+    service = maintenance.MaintenanceService(db.db_name)
+    assert "registro de cambios" in service.tasks
+
+    service._execute("registro de cambios", db._connections.connection())
+
+    [status] = [s for s in service.status() if s.tarea == "registro de cambios"]
+    assert not status.error
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from connection import ConnectionManager
+from migrations import (LEGACY_DAY, MIGRATIONS, MONEY_COLUMNS, SCHEMA_VERSION, check_query_plans, migrate,
+                        schema_version)
+
+# Esquema con el que la aplicación creaba las bases antes de las migraciones: importes REAL
+BASELINE = """
+CREATE TABLE productos (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL UNIQUE,
+                        cantidad INTEGER NOT NULL, precio REAL NOT NULL, margen_ganancia REAL NOT NULL);
+CREATE TABLE totales (id INTEGER PRIMARY KEY, total_ventas REAL DEFAULT 0, total_gastado REAL DEFAULT 0);
+INSERT INTO totales (id) VALUES (1);
+CREATE TABLE configuraciones (clave TEXT PRIMARY KEY, valor TEXT);
+INSERT INTO configuraciones VALUES ('iva_percent', '0.16');
+CREATE TABLE ventas_actuales (id INTEGER PRIMARY KEY AUTOINCREMENT, producto_id INTEGER NOT NULL,
+                              cantidad INTEGER NOT NULL, precio_unitario REAL NOT NULL, subtotal REAL NOT NULL,
+                              FOREIGN KEY(producto_id) REFERENCES productos(id));
+"""
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    """Base anterior a las migraciones con datos en importes de punto flotante"""
+    path = str(tmp_path / "anterior.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE)
+    conn.executemany("INSERT INTO productos (nombre, cantidad, precio, margen_ganancia) VALUES (?, ?, ?, ?)",
+                     [("arroz 1kg", 10, 12.5, 25.0), ("leche 1L", 0, 0.1 + 0.2, 20.0), ("pan", 3, 19.99, 0.0)])
+    conn.execute("UPDATE totales SET total_ventas = 100.1, total_gastado = 40.05")
+    # Líneas repetidas del mismo producto, como las dejaba la versión anterior del carrito
+    conn.executemany("INSERT INTO ventas_actuales (producto_id, cantidad, precio_unitario, subtotal) VALUES (?, ?, ?, ?)",
+                     [(1, 1, 12.5, 12.5), (1, 2, 12.5, 25.0), (3, 1, 19.99, 19.99)])
+    conn.commit()
+    conn.close()
+    connections = ConnectionManager(path)
+    yield connections
+    connections.close()
+
+
+def _columns(conn: sqlite3.Connection, table: str):
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_baseline_migrates_to_latest_version(baseline):
+    assert migrate(baseline) == [name for name, _migration in MIGRATIONS]
+    conn = baseline.connection()
+    assert schema_version(conn) == SCHEMA_VERSION
+
+    for table, columns in MONEY_COLUMNS.items():
+        types = _columns(conn, table)
+        assert all(types[column] == "INTEGER" for column in columns), table
+    assert conn.execute("SELECT nombre, precio, typeof(precio) FROM productos ORDER BY id").fetchall() == [
+        ("arroz 1kg", 1250, "integer"), ("leche 1L", 30, "integer"), ("pan", 1999, "integer")]
+    assert conn.execute("SELECT total_ventas, total_gastado FROM resumen_diario WHERE dia = ?",
+                        (LEGACY_DAY,)).fetchone() == (10010, 4005)
+    assert conn.execute("SELECT producto_id, cantidad, subtotal FROM ventas_actuales ORDER BY producto_id").fetchall() \
+        == [(1, 3, 3750), (3, 1, 1999)]
+    assert conn.execute("SELECT valor FROM configuraciones WHERE clave = 'iva_percent'").fetchone() == ("0.16",)
+
+    # El stock existente queda en un lote al costo que se deriva del precio y el margen
+    assert conn.execute("SELECT producto_id, restante, costo_unitario FROM lotes_stock ORDER BY producto_id").fetchall() \
+        == [(1, 10, 1000), (3, 3, 1999)]
+    assert conn.execute("SELECT valor_stock FROM productos ORDER BY id").fetchall() == [(10000,), (0,), (5997,)]
+    assert conn.execute("SELECT COUNT(*) FROM replica_cambios WHERE tabla = 'productos'").fetchone() == (3,)
+    assert conn.execute("SELECT COUNT(*) FROM productos_fts WHERE nombre LIKE '%rroz%'").fetchone() == (1,)
+
+    assert check_query_plans(conn) == []
+
+
+def test_new_database_matches_migrated_baseline(baseline, db):
+    migrate(baseline)
+    migrated, new = baseline.connection(), db._connection()
+    objects = "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name"
+    assert migrated.execute(objects).fetchall() == new.execute(objects).fetchall()
+    for (table,) in new.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        assert _columns(migrated, table) == _columns(new, table), table
+    assert schema_version(new) == SCHEMA_VERSION
+    assert check_query_plans(new) == []
+
+
+def test_migrate_is_idempotent(baseline):
+    migrate(baseline)
+    assert migrate(baseline) == []
+    assert schema_version(baseline.connection()) == SCHEMA_VERSION
+
+
+def test_newer_schema_is_rejected(baseline):
+    baseline.connection().execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    with pytest.raises(RuntimeError):
+        migrate(baseline)
@@ -0,0 +1,53 @@
+import pytest
+
+from money import Money, to_cents
+
+
+@pytest.mark.parametrize("value, cents", [
+    ("12.50", 1250), (12.5, 1250), ("0.125", 12), ("0.135", 14), (7, 700), ("-3.005", -300),
+])
+def test_parse_rounds_half_even(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize("value", ["abc", "1/3", "", None])
+def test_parse_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        Money.parse(value)
+
+
+def test_money_is_exact_integer_cents():
+    with pytest.raises(TypeError):
+        Money(12.5)
+    total = sum([Money(10)] * 10)
+    assert total == Money(100) and str(total) == "1.00"
+    assert str(Money(-5)) == "-0.05"
+    # 0.1 + 0.2 en float no da 0.3; en centavos sí
+    assert Money.parse("0.1") + Money.parse("0.2") == Money.parse("0.3")
+
+
+def test_percent_and_margin_round_trip():
+    assert Money(1250).percent(0.16) == Money(200)
+    assert Money(125).percent("0.1") == Money(12)  # 12.5 al par
+    assert Money(1200).without_margin(20) == Money(1000)
+    assert Money(1000).with_margin(20) == Money(1200)
+    assert Money(1000).with_margin(-25) == Money(750)
+
+
+@pytest.mark.parametrize("margen", [-100, -100.0, "-150", -250.5])
+def test_margin_must_be_above_minus_100(margen):
+    with pytest.raises(ValueError, match="mayor que -100%"):
+        Money(1000).without_margin(margen)
+    with pytest.raises(ValueError, match="mayor que -100%"):
+        Money(1000).with_margin(margen)
+
+
+def test_database_rejects_invalid_margin_before_writing(db):
+    with pytest.raises(ValueError, match="margen"):
+        db.add_or_update_product("pan", 5, 1000, -100)
+    producto_id = db.save_product(None, "pan", 5, 1000, 25.0)
+
+    with pytest.raises(ValueError, match="margen"):
+        db.save_product(producto_id, "pan", 8, 1000, -150.0)
+
+    assert db.get_all_products() == [(producto_id, "pan", 5, 1000, 25.0)]
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import pytest
+
+from pos_client import RemoteDatabase
+from pos_server import PosServer
+
+
+@pytest.fixture
+def service(db):
+    """Servicio POS en un hilo propio sobre la base de prueba, en un puerto libre"""
+    server = PosServer(db, port=0, readers=2)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run() -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+        server.close()
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait(5)
+    yield server
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+@pytest.fixture
+def remote(service):
+    client = RemoteDatabase(port=service.port)
+    yield client
+    client.close()
+
+
+def test_settings_are_read_from_memory(remote, monkeypatch):
+    assert remote.get_iva_percent() == pytest.approx(0.19)
+    assert remote.get_costing_method() == "promedio"
+
+    def offline(*_args, **_kwargs):
+        raise AssertionError("la configuración no debe consultar el servicio")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(remote, "call", offline)
+        for _ in range(3):
+            assert remote.get_iva_percent() == pytest.approx(0.19)
+            assert remote.get_costing_method() == "promedio"
+
+
+def test_settings_follow_changes_from_other_registers(remote, service):
+    other = RemoteDatabase(port=service.port)
+    try:
+        assert remote.get_iva_percent() == pytest.approx(0.19)
+        before = remote.data_version()
+        other.update_iva_percent(0.21)
+        assert other.get_iva_percent() == pytest.approx(0.21)
+        # El sondeo de data_version (hilo de trabajo de la interfaz) trae la configuración nueva
+        assert remote.data_version() != before
+        assert remote.get_iva_percent() == pytest.approx(0.21)
+    finally:
+        other.close()
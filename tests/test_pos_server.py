@@ -0,0 +1,52 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from pos_server import READ_METHODS, PosServer
+
+
+@pytest.fixture
+def server(db):
+    db.add_or_update_product("arroz 1kg", 10, 1500, 20.0)
+    db.add_or_update_product("leche 1L", 5, 900, 20.0)
+    server = PosServer(db, readers=2)
+    yield server
+    server._readers.shutdown(wait=True)
+    server._writer.shutdown(wait=True)
+
+
+def read(server, method, *args):
+    assert method in READ_METHODS
+    return asyncio.run(server.dispatch(method, list(args), {}))
+
+
+def test_raw_sql_is_not_served(server, db):
+    assert "query" not in READ_METHODS
+    with pytest.raises(ValueError, match="Método desconocido"):
+        asyncio.run(server.dispatch("query", ["DELETE FROM productos"], {}))
+    assert db.count_products() == 2
+
+
+def test_read_connection_rejects_writes_and_pragma_changes(db):
+    # El autorizador es la segunda barrera si un método de lectura llegara a escribir
+    db.restrict_to_reads()
+    for sql in ("PRAGMA query_only = OFF", "DELETE FROM productos WHERE id = 1",
+                "UPDATE productos SET cantidad = 0", "CREATE TABLE t (x)", "BEGIN IMMEDIATE",
+                "UPDATE sqlite_master SET sql = NULL", "ATTACH DATABASE ':memory:' AS otra", "PRAGMA optimize"):
+        with pytest.raises(sqlite3.DatabaseError):
+            db.query(sql)
+    assert db.query("SELECT value FROM json_each(?)", ("[1, 2]",)).fetchall() == [(1,), (2,)]
+    assert db.query("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 3) "
+                    "SELECT SUM(x) FROM n").fetchall() == [(6,)]
+
+
+def test_reader_serves_reads(server, db):
+    db.process_cart([(2, 2, 1800)])
+    hoy = db.query("SELECT date(fecha) FROM ventas").fetchone()[0]
+    assert [row[1:4] for row in read(server, "iter_report_lines", hoy, hoy, hoy)] == [(2, 2, 3600)]
+    assert [row[1] for row in read(server, "get_products_by_ids", [2])] == ["leche 1L"]
+    assert [row[1] for row in read(server, "search_products", "leche")] == ["leche 1L"]
+    assert read(server, "get_iva_percent") == pytest.approx(0.19)
+    assert read(server, "count_products") == 2
+    assert len(read(server, "data_version")) == 5
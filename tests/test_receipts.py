@@ -0,0 +1,61 @@
+import pytest
+
+from ledger import SaleRecord
+from money import Money
+from receipts import ESCPOS, HTML, TEXT, compile_template, render
+
+SALE = SaleRecord(7, "2024-03-01 10:30:00", "caja-1", 3500,
+                  [("arroz <1kg>", 2, 1000, 2000), ("café", 1, 1500, 1500)], iva_percent=0.16)
+
+
+@pytest.mark.parametrize("text", [
+    "{cliente}\n{lineas}\n{nombre}\n{fin_lineas}\n",  # campo que no existe
+    "{nombre}\n{lineas}\n{nombre}\n{fin_lineas}\n",  # campo de línea fuera del bloque
+    "{total}\n{lineas}\n{nombre}\n{fin_lineas}\n{importe.real}\n",
+    "{total}\n{nombre}\n",  # sin bloque de líneas
+])
+def test_compile_template_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        compile_template(text)
+
+
+def test_compiled_template_formats_sale_and_lines():
+    template = compile_template("N° {venta_id}\n{lineas}\n{cantidad} {nombre}\n{fin_lineas}\nTotal {total}\n")
+
+    assert template.head(venta_id=7) == "N° 7\n"
+    assert template.line(cantidad=2, nombre="arroz") == "2 arroz\n"
+    assert template.tail(total="40.60") == "Total 40.60\n"
+
+
+def test_render_text_from_recorded_sale(db):
+    producto_id = db.add_or_update_product("arroz 1kg", 10, 1000, 20.0)
+    record = db.process_cart_record([(producto_id, 3, 1000)], ref="caja-1")
+
+    text = render(record).decode("utf-8")
+
+    assert f"Venta N° {record.venta_id}" in text
+    assert "arroz 1kg" in text
+    assert "3 x      10.00" in text
+    assert "Artículos: 3" in text
+    subtotal = Money(3000)
+    assert f"TOTAL{str(subtotal + subtotal.percent(record.iva_percent)):>35}" in text
+
+
+def test_render_formats():
+    html = render(SALE, HTML).decode("utf-8")
+    assert "arroz &lt;1kg&gt;" in html and "<1kg>" not in html
+    assert html.startswith("<!DOCTYPE html>") and "$40.60" in html
+
+    escpos = render(SALE, ESCPOS)
+    assert escpos.startswith(b"\x1b@") and escpos.endswith(b"\x1dVB\x00")
+    assert "café".encode("cp850") in escpos
+
+    with pytest.raises(ValueError):
+        render(SALE, "pdf")
+
+
+def test_template_file_overrides_default(tmp_path):
+    (tmp_path / "recibo.txt").write_text("{ref}\n{lineas}\n{nombre};{importe}\n{fin_lineas}\n{total}\n",
+                                         encoding="utf-8")
+
+    assert render(SALE, TEXT, str(tmp_path)).decode("utf-8") == "caja-1\narroz <1kg>;20.00\ncafé;15.00\n40.60\n"
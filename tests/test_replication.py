@@ -0,0 +1,120 @@
+import sqlite3
+
+import pytest
+
+from archive import SalesArchive
+
+OLD_MONTH = "2020-01"
+
+
+@pytest.fixture
+def stores(make_db):
+    """Dos tiendas, cada una con su base"""
+    return make_db("tienda_a.db"), make_db("tienda_b.db")
+
+
+def uid_of(db, nombre: str) -> str:
+    return db.query("SELECT uid FROM productos WHERE nombre = ?", (nombre,)).fetchone()[0]
+
+
+def send(origen, destino, directory):
+    """Exporta de `origen` para `destino` e importa el paquete; devuelve (paquete, resultado)"""
+    bundle = origen.export_changes(destino.get_store_id(), str(directory))
+    assert bundle is not None
+    return bundle, destino.import_changes([bundle.ruta])[0]
+
+
+def test_round_trip_copies_catalog_and_sales(stores, tmp_path):
+    a, b = stores
+    arroz = a.add_or_update_product("arroz 1kg", 10, 1500, 25.0)
+    a.add_or_update_product("azucar 1kg", 4, 1200, 20.0)
+    a.process_cart([(arroz, 2, 1500)], ref="venta-a-1")
+
+    _bundle, result = send(a, b, tmp_path / "paquetes")
+
+    assert (result.productos, result.ventas, result.conflictos) == (2, 1, 0)
+    assert uid_of(b, "arroz 1kg") == uid_of(a, "arroz 1kg")
+    assert b.get_product_price(b.get_product_id("arroz 1kg")) == 1500
+    # El stock es de la tienda de origen: la venta importada no lo descuenta
+    assert b.query("SELECT cantidad FROM productos WHERE nombre = 'arroz 1kg'").fetchone()[0] == 0
+    assert b.sale_exists("venta-a-1")
+    venta = b.query("SELECT total FROM ventas WHERE ref = 'venta-a-1'").fetchone()
+    assert venta[0] == 3000
+
+    # Sin cambios nuevos no hay paquete
+    assert a.export_changes(b.get_store_id(), str(tmp_path / "paquetes")) is None
+
+
+def test_reimporting_bundle_is_noop(stores, tmp_path):
+    a, b = stores
+    arroz = a.add_or_update_product("arroz 1kg", 10, 1500, 25.0)
+    a.process_cart([(arroz, 1, 1500)], ref="venta-a-1")
+    bundle, _result = send(a, b, tmp_path)
+    before = b.query("SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas").fetchone()
+
+    again = b.import_changes([bundle.ruta])[0]
+    forced = b.import_changes([bundle.ruta], force=True)[0]
+
+    assert (again.productos, again.ventas) == (0, 0)
+    assert (forced.productos, forced.ventas) == (0, 0)
+    assert b.query("SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas").fetchone() == before
+
+
+def test_same_name_merges_to_smaller_uid(stores, tmp_path):
+    a, b = stores
+    a.add_or_update_product("yerba 500g", 3, 900, 30.0)
+    b.add_or_update_product("yerba 500g", 7, 950, 30.0)
+    smaller = min(uid_of(a, "yerba 500g"), uid_of(b, "yerba 500g"))
+
+    send(a, b, tmp_path)
+    send(b, a, tmp_path)
+
+    for db in (a, b):
+        assert db.query("SELECT COUNT(*) FROM productos WHERE nombre = 'yerba 500g'").fetchone()[0] == 1
+        assert uid_of(db, "yerba 500g") == smaller
+    # Cada tienda conserva su propio stock
+    assert a.query("SELECT cantidad FROM productos WHERE nombre = 'yerba 500g'").fetchone()[0] == 3
+    assert b.query("SELECT cantidad FROM productos WHERE nombre = 'yerba 500g'").fetchone()[0] == 7
+
+
+def test_sale_import_is_idempotent_by_ref(stores, tmp_path):
+    a, b = stores
+    arroz = a.add_or_update_product("arroz 1kg", 10, 1500, 25.0)
+    a.process_cart([(arroz, 1, 1500)], ref="venta-a-1")
+    send(a, b, tmp_path / "primero")
+
+    a.process_cart([(arroz, 1, 1500)], ref="venta-a-2")
+
+    # Un reenvío desde el principio (p. ej. tras perder un paquete) trae la primera venta otra vez
+    resent = a.export_changes(b.get_store_id(), str(tmp_path / "reenvio"), desde=0)
+    result = b.import_changes([resent.ruta])[0]
+
+    assert result.ventas == 1
+    assert result.omitidos >= 1
+    counts = dict(b.query("SELECT ref, COUNT(*) FROM ventas GROUP BY ref").fetchall())
+    assert counts == {"venta-a-1": 1, "venta-a-2": 1}
+
+
+def test_archive_keeps_sales_not_yet_exported(stores, tmp_path):
+    a, b = stores
+    arroz = a.add_or_update_product("arroz 1kg", 10, 1500, 25.0)
+    a.process_cart([(arroz, 1, 1500)], ref="enviada")
+    send(a, b, tmp_path / "paquetes")
+    a.process_cart([(arroz, 1, 1500)], ref="pendiente")
+    with a.transaction() as conn:
+        conn.execute("UPDATE ventas SET fecha = ?", (f"{OLD_MONTH}-15 10:00:00",))
+
+    archive = SalesArchive(str(tmp_path / "archivo"))
+    conn = sqlite3.connect(a.db_name, isolation_level=None)
+    try:
+        archived = archive.archive_month(conn, OLD_MONTH, pause=0)
+    finally:
+        conn.close()
+
+    # La venta que b todavía no recibió sigue en la base y sale en el próximo paquete
+    assert archived.ventas == 1
+    assert not a.sale_exists("enviada")
+    assert a.sale_exists("pendiente")
+    _bundle, result = send(a, b, tmp_path / "paquetes")
+    assert result.ventas == 1
+    assert b.sale_exists("pendiente")
@@ -0,0 +1,68 @@
+import pytest
+
+import settings
+from constants import IVA_PERCENT
+from database import DatabaseManager
+
+
+@pytest.fixture
+def no_throttle(monkeypatch):
+    """Verifica PRAGMA data_version en cada lectura"""
+    monkeypatch.setattr(settings, "CHECK_INTERVAL", 0.0)
+
+
+def count_loads(monkeypatch, cache) -> list:
+    loads = []
+    load = cache._load
+
+    def counting(conn):
+        loads.append(conn)
+        return load(conn)
+
+    monkeypatch.setattr(cache, "_load", counting)
+    return loads
+
+
+def test_change_from_other_connection_invalidates_cache(db, no_throttle, monkeypatch):
+    assert db.get_iva_percent() == IVA_PERCENT
+    loads = count_loads(monkeypatch, db.settings)
+    conn = db._connections.connection()
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # Sin cambios de otras conexiones se lee de memoria
+    assert db.get_iva_percent() == IVA_PERCENT
+    assert loads == []
+
+    other = DatabaseManager(db.db_name)
+    try:
+        other.update_iva_percent(0.21)
+    finally:
+        other.close()
+
+    assert conn.execute("PRAGMA data_version").fetchone()[0] != version
+    assert db.get_iva_percent() == 0.21
+    assert len(loads) == 1
+
+
+def test_set_rolled_back_leaves_no_stale_value(db, no_throttle):
+    db.update_iva_percent(0.16)
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.settings.set("iva_percent", 0.5)
+            # Leer dentro de la transacción ve el valor sin confirmar; no debe quedar en la caché
+            assert db.get_iva_percent() == 0.5
+            raise RuntimeError("se revierte")
+
+    assert db.get_iva_percent() == 0.16
+    assert db.settings.get("iva_percent") == 0.16
+
+
+def test_own_change_updates_cache_without_reload(db, no_throttle, monkeypatch):
+    db.get_iva_percent()
+    loads = count_loads(monkeypatch, db.settings)
+
+    db.update_iva_percent(0.08)
+
+    assert db.get_iva_percent() == 0.08
+    assert loads == []